@@ -14,6 +14,8 @@ import sqlite3
 import os
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pythonjsonlogger.json import JsonFormatter
 from next_action_planner import (
     AutodoistMetadataSnapshot,
@@ -32,10 +34,21 @@ from next_action_planner import (
     plan_next_action_labels,
     parse_label_strategy,
 )
+from columnar_snapshot import ColumnarPlanner, ColumnarWorkspaceSnapshot, plan_columnar_next_action_labels
+from incremental_planner import IncrementalPlanner
+from loop_metrics import ApiTrafficCounter, LoopTimings
+from metrics import SyncLoopMetrics, start_metrics_server
+from scheduler import AdaptivePollScheduler, seconds_until_wakeup
+from rate_limit import RateLimitingAdapter
+from retry_queue import RetryingTaskWriter, RetryPending
+from task_writer import RestTaskWriter, SyncCommandTaskWriter, TaskUpdate
+from todoist_sync import TodoistSyncClient, WorkspaceMirror
+from webhooks import WebhookEvents, start_webhook_server
 
 STARTUP_RETRY_WINDOW_SECONDS = 600
 STARTUP_RETRY_INITIAL_DELAY_SECONDS = 5
 STARTUP_RETRY_MAX_DELAY_SECONDS = 60
+WEBHOOK_FALLBACK_DELAY_SECONDS = 900
 LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
 
 # Connect to SQLite database
@@ -90,12 +103,25 @@ def close_connection(connection):
 
 def execute_query(connection, query, *args):
     cursor = connection.cursor()
-    try:
-        value = args[0]
-        # Useful to pass None/NULL value correctly
-        cursor.execute(query, (value,))
-    except:
-        cursor.execute(query)
+    # Values are always bound as parameters, which also passes None/NULL correctly
+    cursor.execute(query, args)
+    commit_unless_in_transaction(connection, query)
+
+# Execute one SQLite query for every row of parameters
+
+
+def execute_many_query(connection, query, rows):
+    cursor = connection.cursor()
+    cursor.executemany(query, rows)
+    commit_unless_in_transaction(connection, query)
+
+# Commit right away, unless the query is part of a metadata transaction that commits later
+
+
+def commit_unless_in_transaction(connection, query):
+    if isinstance(connection, MetadataTransaction):
+        logging.debug("Query executed in transaction: {}".format(query))
+        return
 
     try:
         connection.commit()
@@ -103,67 +129,98 @@ def execute_query(connection, query, *args):
     except Exception as e:
         logging.debug(f"The error '{e}' occurred")
 
+
+class MetadataTransaction:
+    """A connection whose writes are committed together when the transaction ends.
+
+    It runs queries like the connection it wraps. The query helpers leave the
+    commit to `metadata_transaction` when they are given one.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+# Group all metadata writes into one transaction, which is rolled back if anything fails.
+# Queries that belong to the transaction have to run through the yielded object.
+
+
+@contextmanager
+def metadata_transaction(connection):
+    if isinstance(connection, MetadataTransaction):
+        # Nested use joins the transaction that is already open
+        yield connection
+        return
+
+    try:
+        yield MetadataTransaction(connection)
+    except BaseException:
+        connection.rollback()
+        logging.warning(
+            "Rolled back the metadata changes of this sync loop.",
+            extra={
+                "component": "sqlite",
+                "operation": "metadata_transaction",
+            },
+        )
+        raise
+    else:
+        connection.commit()
+
 # Pass query to select and read record. Outputs a tuple.
 
 
-def execute_read_query(connection, query):
+def execute_read_query(connection, query, *args):
     cursor = connection.cursor()
     result = None
     try:
-        cursor.execute(query)
+        cursor.execute(query, args)
         result = cursor.fetchall()
         logging.debug("Query fetched: {}".format(query))
         return result
     except Exception as e:
         logging.debug(f"The error '{e}' occurred")
 
+# Find the metadata table and id column that belong to a model
+
+
+def metadata_table(model):
+    if isinstance(model, Task):
+        return 'tasks', 'task_id'
+    if isinstance(model, Section):
+        return 'sections', 'section_id'
+    if isinstance(model, Project):
+        return 'projects', 'project_id'
+    raise TypeError(f"No metadata table for {type(model).__name__}")
+
 # Construct query and read a value
 
 
 def db_read_value(connection, model, column):
+    result = None
     try:
-        if isinstance(model, Task):
-            db_name = 'tasks'
-            goal = 'task_id'
-        elif isinstance(model, Section):
-            db_name = 'sections'
-            goal = 'section_id'
-        elif isinstance(model, Project):
-            db_name = 'projects'
-            goal = 'project_id'
+        db_name, goal = metadata_table(model)
+        query = "SELECT %s FROM %s WHERE %s = ?" % (column, db_name, goal)
 
-        query = "SELECT %s FROM %s where %s=%r" % (
-            column, db_name, goal, model.id)
-
-        result = execute_read_query(connection, query)
+        result = execute_read_query(connection, query, str(model.id))
 
     except Exception as e:
         logging.debug(f"The error '{e}' occurred")
 
     return result
 
-# Construct query and update a value
+# Construct query and update a value, adding the record if it does not exist yet
 
 
 def db_update_value(connection, model, column, value):
 
     try:
-        if isinstance(model, Task):
-            db_name = 'tasks'
-            goal = 'task_id'
-
-        elif isinstance(model, Section):
-            db_name = 'sections'
-            goal = 'section_id'
+        db_name, goal = metadata_table(model)
+        query = upsert_query(db_name, goal, column)
 
-        elif isinstance(model, Project):
-            db_name = 'projects'
-            goal = 'project_id'
-
-        query = """UPDATE %s SET %s = ? WHERE %s = %r""" % (
-            db_name, column, goal, model.id)
-
-        result = execute_query(connection, query, value)
+        result = execute_query(connection, query, str(model.id), value)
 
         return result
 
@@ -171,64 +228,97 @@ def db_update_value(connection, model, column, value):
         logging.debug(f"The error '{e}' occurred")
 
 
+# Update one column for many ids of a table, adding records that do not exist yet
+
+
+def db_update_values(connection, db_name, goal, column, values):
+    rows = [(str(model_id), value) for model_id, value in values]
+    if rows:
+        execute_many_query(connection, upsert_query(db_name, goal, column), rows)
+
+
+def upsert_query(db_name, goal, column):
+    return """
+    INSERT INTO %s (%s, %s) VALUES (?, ?)
+    ON CONFLICT(%s) DO UPDATE SET %s = excluded.%s
+    """ % (db_name, goal, column, goal, column, column)
+
+
 # Check if the id of a model exists, if not, add to database
 
 
 def db_check_existance(connection, model):
     try:
-        if isinstance(model, Task):
-            db_name = 'tasks'
-            goal = 'task_id'
-        elif isinstance(model, Section):
-            db_name = 'sections'
-            goal = 'section_id'
-        elif isinstance(model, Project):
-            db_name = 'projects'
-            goal = 'project_id'
-
-        q_check_existence = "SELECT EXISTS(SELECT 1 FROM %s WHERE %s=%r)" % (
-            db_name, goal, model.id)
-        existence_result = execute_read_query(connection, q_check_existence)
-
-        if existence_result[0][0] == 0:
-            if isinstance(model, Task):
-                q_create = """
-                INSERT INTO
-                tasks (task_id, task_type, parent_type, due_date, r_tag)
-                VALUES
-                (%r, %s, %s, %s, %i);
-                """ % (model.id, 'NULL', 'NULL', 'NULL', 0)
-
-            if isinstance(model, Section):
-                q_create = """
-                INSERT INTO
-                sections (section_id, section_type)
-                VALUES
-                (%r, %s);
-                """ % (model.id, 'NULL')
-
-            if isinstance(model, Project):
-                q_create = """
-                INSERT INTO
-                projects (project_id, project_type)
-                VALUES
-                (%r, %s);
-                """ % (model.id, 'NULL')
-
-            execute_query(connection, q_create)
+        db_name, goal = metadata_table(model)
+        execute_query(connection, insert_missing_query(db_name, goal), str(model.id))
 
     except Exception as e:
         logging.debug(f"The error '{e}' occurred")
 
+# Add every model that is not in the database yet, with one statement per table
+
+
+def db_check_existance_many(connection, models):
+    rows_by_table = {}
+    for model in models:
+        rows_by_table.setdefault(metadata_table(model), []).append((str(model.id),))
+
+    for (db_name, goal), rows in rows_by_table.items():
+        execute_many_query(connection, insert_missing_query(db_name, goal), rows)
+
+
+def insert_missing_query(db_name, goal):
+    return "INSERT INTO %s (%s) VALUES (?) ON CONFLICT(%s) DO NOTHING" % (
+        db_name, goal, goal)
+
 
 # Initialise new database tables
 
-def initialise_sqlite():
+def initialise_sqlite(journal_mode='wal', synchronous='normal'):
 
     cwd = os.getcwdb()
     db_path = os.path.join(cwd, b'metadata.sqlite')
 
     connection = create_connection(db_path)
+    # PRAGMA values cannot be bound as parameters; argparse restricts them to known choices
+    connection.execute(f"PRAGMA journal_mode = {journal_mode}")
+    connection.execute(f"PRAGMA synchronous = {synchronous}")
+    create_metadata_tables(connection)
+
+    logging.info("SQLite DB has successfully initialized! \n")
+
+    return connection
+
+# Create the metadata tables if they do not exist yet, then bring them up to date
+
+
+def create_metadata_tables(connection):
+    if _is_empty_database(connection):
+        # New files start with the tables of schema version 1, instead of
+        # creating the legacy tables only for migration 1 to rebuild them
+        connection.commit()
+        try:
+            connection.execute("BEGIN")
+            for db_name, goal, columns in METADATA_TABLES:
+                _create_text_id_table(connection, db_name, goal, columns)
+            connection.execute("PRAGMA user_version = 1")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    else:
+        # Files from before the schema versions may lack some of the tables
+        _create_legacy_metadata_tables(connection)
+
+    migrate_metadata_schema(connection)
+
+
+def _is_empty_database(connection):
+    return connection.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] == 0
+
+
+def _create_legacy_metadata_tables(connection):
 
     q_create_projects_table = """
     CREATE TABLE IF NOT EXISTS projects (
@@ -261,9 +351,128 @@ def initialise_sqlite():
     execute_query(connection, q_create_sections_table)
     execute_query(connection, q_create_tasks_table)
 
-    logging.info("SQLite DB has successfully initialized! \n")
+# Metadata tables of schema version 1: a TEXT id column with a unique index,
+# and the value columns of each table
+
+
+METADATA_TABLES = (
+    ('projects', 'project_id', (('project_type', 'TEXT'),)),
+    ('sections', 'section_id', (('section_type', 'TEXT'),)),
+    ('tasks', 'task_id', (
+        ('task_type', 'TEXT'),
+        ('parent_type', 'TEXT'),
+        ('due_date', 'TEXT'),
+        ('r_tag', 'INTEGER DEFAULT 0'),
+    )),
+)
+
+
+def _create_text_id_table(connection, db_name, goal, columns, table_name=None):
+    table_name = table_name or db_name
+    column_definitions = ',\n'.join(
+        f'{name} {definition}' for name, definition in columns)
+    connection.execute(f"""
+    CREATE TABLE {table_name} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    {goal} TEXT NOT NULL,
+    {column_definitions}
+    )
+    """)
+    if table_name == db_name:
+        _create_unique_id_index(connection, db_name, goal)
+
+
+def _create_unique_id_index(connection, db_name, goal):
+    connection.execute(
+        f"CREATE UNIQUE INDEX {db_name}_{goal}_unique ON {db_name} ({goal})")
+
+# Schema migrations, applied in order. The database stores how many of them ran
+# in PRAGMA user_version, so each migration runs exactly once per database file.
+
+
+def _migrate_to_text_ids(connection):
+    # Todoist ids are strings, but were stored in INTEGER columns and could be
+    # inserted more than once. Rebuild every table with TEXT ids and a unique
+    # index, keeping the first row per id like the lookups always did.
+    for db_name, goal, columns in METADATA_TABLES:
+        column_names = ', '.join(name for name, _ in columns)
+        _create_text_id_table(connection, db_name, goal, columns, f'{db_name}_migrated')
+        connection.execute(f"""
+        INSERT INTO {db_name}_migrated (id, {goal}, {column_names})
+        SELECT id, CAST({goal} AS TEXT), {column_names} FROM {db_name}
+        WHERE id IN (
+            SELECT MIN(id) FROM {db_name}
+            WHERE {goal} IS NOT NULL
+            GROUP BY CAST({goal} AS TEXT)
+        )
+        """)
+        connection.execute(f"DROP TABLE {db_name}")
+        connection.execute(f"ALTER TABLE {db_name}_migrated RENAME TO {db_name}")
+        _create_unique_id_index(connection, db_name, goal)
+
+
+def _create_write_retry_queue(connection):
+    # Task writes that failed, kept until a later loop sends them again or a
+    # newer write for the same task and fields replaces them
+    connection.execute("""
+    CREATE TABLE write_retry_queue (
+    task_id TEXT NOT NULL,
+    field_names TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    PRIMARY KEY (task_id, field_names)
+    )
+    """)
+    connection.execute(
+        "CREATE INDEX write_retry_queue_next_attempt_at ON write_retry_queue (next_attempt_at)")
+
+
+def _add_write_retry_queue_base(connection):
+    # The task field values a queued write was computed from, as JSON, so it
+    # is dropped instead of replayed once the task changed
+    connection.execute("ALTER TABLE write_retry_queue ADD COLUMN base TEXT")
+
+
+METADATA_MIGRATIONS = (
+    _migrate_to_text_ids,
+    _create_write_retry_queue,
+    _add_write_retry_queue_base,
+)
 
-    return connection
+
+def migrate_metadata_schema(connection):
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+
+    for target_version, migration in enumerate(
+            METADATA_MIGRATIONS[version:], start=version + 1):
+        connection.commit()
+        try:
+            connection.execute("BEGIN")
+            migration(connection)
+            connection.execute(f"PRAGMA user_version = {target_version}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            logging.error(
+                f"Could not migrate the SQLite database to schema version {target_version}",
+                extra={
+                    "component": "sqlite",
+                    "operation": "migrate_metadata_schema",
+                    "schema_version": target_version,
+                },
+            )
+            raise
+
+        logging.info(
+            f"Migrated the SQLite database to schema version {target_version}",
+            extra={
+                "component": "sqlite",
+                "operation": "migrate_metadata_schema",
+                "schema_version": target_version,
+            },
+        )
 
 
 # Makes --help text wider
@@ -439,7 +648,7 @@ def verify_label_existance(api, label_name, prompt_mode):
 # Initialisation of Autodoist
 
 
-def initialise_api(args):
+def initialise_api(args, session=None):
 
     # Check we have a API key
     if not args.api_key:
@@ -463,6 +672,30 @@ def initialise_api(args):
                 'Wrong regeneration mode. Please choose a number from 0 to 2. Check --help for more information on the available modes.')
             exit(1)
 
+    # The backoff can only lengthen the delay between syncs
+    if args.max_delay is not None and args.max_delay < max(args.delay, 0):
+        logging.error(
+            "\n\nPlease choose a maximum delay that is at least the delay between syncs (%d seconds).\n", max(args.delay, 0))
+        sys.exit(1)
+
+    # Webhook deliveries can only be trusted with the secret they are signed with
+    if args.webhook_port is not None and not args.webhook_secret:
+        logging.error(
+            "\n\nNo webhook secret set. Run Autodoist with '--webhook_secret <CLIENT_SECRET>' or set the environment variable TODOIST_CLIENT_SECRET.\n")
+        sys.exit(1)
+
+    # The fallback is the delay between full syncs when no webhook arrives
+    if args.webhook_port is not None and args.webhook_fallback < 1:
+        logging.error(
+            "\n\nPlease choose a webhook fallback of at least 1 second.\n")
+        sys.exit(1)
+
+    # Check that task updates can be sent at all
+    if args.write_concurrency < 1:
+        logging.error(
+            "\n\nPlease choose a write concurrency of at least 1.\n")
+        sys.exit(1)
+
     # Show which modes are enabled:
     modes = []
     m_num = 0
@@ -483,7 +716,7 @@ def initialise_api(args):
     # Connect to the Todoist REST API via official SDK
     logging.debug('Connecting to the Todoist API')
     try:
-        api = TodoistAPI(token=args.api_key)
+        api = TodoistAPI(token=args.api_key, session=session)
 
     except Exception as e:
         logging.error(
@@ -517,29 +750,48 @@ def initialise_api(args):
 # Update a task's content via REST API
 
 
-def update_task_content(api, task_id, content):
-    try:
-        api.update_task(task_id=task_id, content=content)
-        return 1
-    except Exception as e:
-        logging.warning(f"Failed to update task {task_id} content: {e}")
-        return 0
+def update_task_content(api, task_id, content, task_writer=None):
+    return write_task_updates(
+        api,
+        [TaskUpdate(task_id, {'content': content})],
+        'content',
+        task_writer,
+    )
 
 # Apply label updates via REST API
 
 
-def apply_label_updates(api, overview_task_ids, overview_task_labels):
-    num_updates = 0
+def apply_label_updates(api, overview_task_ids, overview_task_labels, task_writer=None):
     filtered_overview_ids = [
         k for k, v in overview_task_ids.items() if v != 0]
 
-    for task_id in filtered_overview_ids:
-        labels = overview_task_labels[task_id]
-        try:
-            api.update_task(task_id=task_id, labels=labels)
+    updates = [
+        TaskUpdate(task_id, {'labels': overview_task_labels[task_id]})
+        for task_id in filtered_overview_ids
+    ]
+    return write_task_updates(api, updates, 'labels', task_writer)
+
+# Send task updates through the configured writer and count the successful ones
+
+
+def _write_failure_level(result):
+    # A write waiting for its queued retry already logged its failure
+    return logging.DEBUG if isinstance(result.error, RetryPending) else logging.WARNING
+
+
+def write_task_updates(api, updates, field_name, task_writer=None):
+    if not updates:
+        return 0
+
+    writer = task_writer or RestTaskWriter(api)
+    num_updates = 0
+    for result in writer.write(updates):
+        if result.ok:
             num_updates += 1
-        except Exception as e:
-            logging.warning(f"Failed to update labels for task {task_id}: {e}")
+        else:
+            logging.log(
+                _write_failure_level(result),
+                f"Failed to update {field_name} for task {result.task_id}: {result.error}")
 
     return num_updates
 
@@ -600,6 +852,8 @@ def build_planner_config(args):
         ignore_suffix=args.ignore_suffix,
         hide_future=args.hide_future,
         dateformat=args.dateformat,
+        # The metrics endpoint exports planner phase times as well
+        collect_stats=args.planner_stats or args.metrics_port is not None,
     )
 
 
@@ -625,84 +879,105 @@ def build_workspace_snapshot(projects, sections, tasks):
             )
             for section in sections
         ),
-        tasks=tuple(
-            TaskSnapshot(
-                id=task.id,
-                content=task.content,
-                project_id=task.project_id,
-                section_id=task.section_id,
-                parent_id=_normalise_parent_id(task.parent_id),
-                labels=tuple(task.labels),
-                order=task.order,
-                is_completed=task.is_completed,
-                due_date=normalise_due_date(task.due),
-                is_header=task.content.startswith('*'),
-                description=task.description,
-            )
-            for task in tasks
-        ),
+        tasks=tuple(_task_snapshot(task) for task in tasks),
+    )
+
+
+def build_columnar_workspace_snapshot(projects, sections, tasks):
+    # Each task row only lives until its columns are filled in
+    workspace = build_workspace_snapshot(projects, sections, ())
+    return ColumnarWorkspaceSnapshot(
+        workspace.projects,
+        workspace.sections,
+        (_task_snapshot(task) for task in tasks),
+    )
+
+
+def _task_snapshot(task):
+    return TaskSnapshot(
+        id=task.id,
+        content=task.content,
+        project_id=task.project_id,
+        section_id=task.section_id,
+        parent_id=_normalise_parent_id(task.parent_id),
+        labels=tuple(task.labels),
+        order=task.order,
+        is_completed=task.is_completed,
+        due_date=normalise_due_date(task.due),
+        is_header=task.content.startswith('*'),
+        description=task.description,
     )
 
 
 def build_autodoist_metadata_snapshot(connection, projects, sections, tasks):
+    project_types = read_metadata_table(
+        connection, 'projects', 'project_id', ('project_type',))
+    section_types = read_metadata_table(
+        connection, 'sections', 'section_id', ('section_type',))
+    task_types = read_metadata_table(
+        connection, 'tasks', 'task_id', ('task_type', 'parent_type'))
+    missing_task_types = (None, None)
+
     return AutodoistMetadataSnapshot(
         project_strategies={
             project.id: legacy_type_to_label_strategy(
-                _read_metadata_value(connection, project, 'project_type')
+                project_types.get(project.id, (None,))[0]
             )
             for project in projects
         },
         section_strategies={
             section.id: legacy_type_to_label_strategy(
-                _read_metadata_value(connection, section, 'section_type')
+                section_types.get(section.id, (None,))[0]
             )
             for section in sections
         },
         task_strategies={
             task.id: legacy_type_to_label_strategy(
-                _read_metadata_value(connection, task, 'task_type')
+                task_types.get(task.id, missing_task_types)[0]
             )
             for task in tasks
         },
         task_parent_strategies={
             task.id: _legacy_parent_strategy(
-                _read_metadata_value(connection, task, 'parent_type')
+                task_types.get(task.id, missing_task_types)[1]
             )
             for task in tasks
         },
     )
 
+# Read the given columns of a whole metadata table with a single query
+
+
+def read_metadata_table(connection, db_name, goal, columns):
+    query = "SELECT %s, %s FROM %s" % (goal, ', '.join(columns), db_name)
+    rows = execute_read_query(connection, query) or []
+    return {row[0]: tuple(row[1:]) for row in rows}
 
-def apply_planner_metadata_commands(connection, tasks_by_id, sections_by_id, projects_by_id, commands):
+
+def apply_planner_metadata_commands(connection, commands):
+    project_types = []
+    section_types = []
+    task_types = []
+    parent_types = []
     for command in commands:
         if isinstance(command, RecordProjectStrategy):
-            db_update_value(
-                connection,
-                projects_by_id[command.project_id],
-                'project_type',
-                label_strategy_to_legacy_type(command.strategy),
-            )
+            project_types.append(
+                (command.project_id, label_strategy_to_legacy_type(command.strategy)))
         elif isinstance(command, RecordSectionStrategy):
-            db_update_value(
-                connection,
-                sections_by_id[command.section_id],
-                'section_type',
-                label_strategy_to_legacy_type(command.strategy),
-            )
+            section_types.append(
+                (command.section_id, label_strategy_to_legacy_type(command.strategy)))
         elif isinstance(command, RecordTaskStrategy):
-            db_update_value(
-                connection,
-                tasks_by_id[command.task_id],
-                'task_type',
-                label_strategy_to_legacy_type(command.strategy),
-            )
+            task_types.append(
+                (command.task_id, label_strategy_to_legacy_type(command.strategy)))
         elif isinstance(command, RecordTaskParentStrategy):
-            db_update_value(
-                connection,
-                tasks_by_id[command.task_id],
-                'parent_type',
-                _selection_strategy_to_legacy_type(command.strategy),
-            )
+            parent_types.append(
+                (command.task_id, _selection_strategy_to_legacy_type(command.strategy)))
+
+    # Commands of one type never depend on each other, so each type is written with one statement
+    db_update_values(connection, 'projects', 'project_id', 'project_type', project_types)
+    db_update_values(connection, 'sections', 'section_id', 'section_type', section_types)
+    db_update_values(connection, 'tasks', 'task_id', 'task_type', task_types)
+    db_update_values(connection, 'tasks', 'task_id', 'parent_type', parent_types)
 
 
 def apply_planner_label_changes(tasks_by_id, label_changes, overview_task_ids, overview_task_labels):
@@ -717,32 +992,31 @@ def apply_planner_label_changes(tasks_by_id, label_changes, overview_task_ids, o
         overview_task_labels[task.id] = final_labels
 
 
-def apply_planner_description_changes(api, tasks_by_id, description_changes):
-    num_updates = 0
+def apply_planner_description_changes(api, tasks_by_id, description_changes, task_writer=None):
+    pending_descriptions = {}
     for description_change in description_changes:
         task = tasks_by_id[description_change.task_id]
         if task.description == description_change.description:
             continue
+        pending_descriptions[task.id] = description_change.description
 
-        api.update_task(
-            task_id=task.id,
-            description=description_change.description,
-        )
-        task.description = description_change.description
+    updates = [
+        TaskUpdate(task_id, {'description': description})
+        for task_id, description in pending_descriptions.items()
+    ]
+    writer = task_writer or RestTaskWriter(api)
+    num_updates = 0
+    for result in writer.write(updates):
+        if not result.ok:
+            logging.log(
+                _write_failure_level(result),
+                f"Failed to update description for task {result.task_id}: {result.error}")
+            continue
+        tasks_by_id[result.task_id].description = pending_descriptions[result.task_id]
         num_updates += 1
     return num_updates
 
 
-def _read_metadata_value(connection, model, column):
-    try:
-        result = db_read_value(connection, model, column)
-        if result:
-            return result[0][0]
-    except:
-        pass
-    return None
-
-
 def _legacy_parent_strategy(value):
     if value == SelectionStrategy.SEQUENTIAL.value:
         return SelectionStrategy.SEQUENTIAL
@@ -952,32 +1226,32 @@ def check_header(api, model):
 # Logic for applying and removing headers
 
 
-def modify_task_headers(api, task, section_tasks, header_all_in_p, unheader_all_in_p, header_all_in_s, unheader_all_in_s, header_all_in_t, unheader_all_in_t):
+def modify_task_headers(api, task, task_index, header_all_in_p, unheader_all_in_p, header_all_in_s, unheader_all_in_s, header_all_in_t, unheader_all_in_t, task_writer=None):
     num_updates = 0
 
     if any([header_all_in_p, header_all_in_s]):
         if task.content[:2] != '* ':
             content = '* ' + task.content
-            num_updates += update_task_content(api, task.id, content)
+            num_updates += update_task_content(api, task.id, content, task_writer)
 
     if any([unheader_all_in_p, unheader_all_in_s]):
         if task.content[:2] == '* ':
             content = task.content[2:]
-            num_updates += update_task_content(api, task.id, content)
+            num_updates += update_task_content(api, task.id, content, task_writer)
 
     if header_all_in_t:
         if task.content[:2] != '* ':
             content = '* ' + task.content
-            num_updates += update_task_content(api, task.id, content)
+            num_updates += update_task_content(api, task.id, content, task_writer)
         num_updates += find_and_headerify_all_children(
-            api, task, section_tasks, 1)
+            api, task, task_index, 1, task_writer)
 
     if unheader_all_in_t:
         if task.content[:2] == '* ':
             content = task.content[2:]
-            num_updates += update_task_content(api, task.id, content)
+            num_updates += update_task_content(api, task.id, content, task_writer)
         num_updates += find_and_headerify_all_children(
-            api, task, section_tasks, 2)
+            api, task, task_index, 2, task_writer)
 
     return num_updates
 
@@ -1136,34 +1410,135 @@ def run_recurring_lists_logic(args, api, connection, task, task_items, task_item
     #         #               item.content)
     #         pass
 
-def find_and_headerify_all_children(api, task, section_tasks, mode):
-    num_updates = 0
-    child_tasks = list(filter(lambda x: x.parent_id == task.id, section_tasks))
+def find_and_headerify_all_children(api, task, task_index, mode, task_writer=None):
+    # Collect the whole subtree first, so a mass (un)header is written as one batch
+    updates = []
+    _collect_child_header_updates(task, task_index, mode, updates)
+    return write_task_updates(api, updates, 'content', task_writer)
+
+
+def _collect_child_header_updates(task, task_index, mode, updates):
+    # Depth-first with an explicit stack, so deep task trees cannot hit the recursion limit
+    stack = list(reversed(task_index.children(task)))
+    while stack:
+        child_task = stack.pop()
+        if mode == 1:
+            if child_task.content[:2] != '* ':
+                updates.append(
+                    TaskUpdate(child_task.id, {'content': '* ' + child_task.content}))
+
+        elif mode == 2:
+            if child_task.content[:2] == '* ':
+                updates.append(
+                    TaskUpdate(child_task.id, {'content': child_task.content[2:]}))
+
+        # Children found, go deeper
+        stack.extend(reversed(task_index.children(child_task)))
+
+# Read all projects, sections and tasks, either fully or through the delta mirror
+
+
+def fetch_workspace(api, workspace_mirror=None):
+    if workspace_mirror is not None:
+        workspace_mirror.refresh()
+        return workspace_mirror.workspace()
+
+    # Projects, sections and tasks are independent requests, so drain their
+    # paginators concurrently. Pages within one stream are cursor based and
+    # have to be read in order.
+    streams = {
+        'projects': api.get_projects,
+        'sections': api.get_sections,
+        'tasks': api.get_tasks,
+    }
+    with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+        futures = {
+            name: executor.submit(_drain_paginator, get_pages)
+            for name, get_pages in streams.items()
+        }
+
+    results = {}
+    errors = []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as error:
+            logging.error(
+                "Could not read Todoist %s: %s",
+                name,
+                error,
+                extra={
+                    "component": "sync_loop",
+                    "operation": "fetch_workspace",
+                    "stream": name,
+                    "error_type": describe_temporary_todoist_error(error),
+                })
+            errors.append(error)
 
-    if child_tasks != []:
-        for child_task in child_tasks:
-            # Children found, go deeper
-            if mode == 1:
-                if child_task.content[:2] != '* ':
-                    num_updates += update_task_content(
-                        api, child_task.id, '* ' + child_task.content)
+    if errors:
+        # Surface a permanent failure over a temporary one, so the caller
+        # only skips the loop when every failure may resolve on its own.
+        permanent_errors = [
+            error for error in errors if not is_temporary_todoist_error(error)]
+        raise (permanent_errors or errors)[0]
 
-            elif mode == 2:
-                if child_task.content[:2] == '* ':
-                    num_updates += update_task_content(
-                        api, child_task.id, child_task.content[2:])
+    return results['projects'], results['sections'], results['tasks']
 
-            num_updates += find_and_headerify_all_children(
-                api, child_task, section_tasks, mode)
 
-    return num_updates
+def _drain_paginator(get_pages):
+    # In API v3, get_*() methods return paginators that yield pages (lists)
+    return [item for page in get_pages() for item in page]
+
+# Look up sections, section tasks and child tasks without rescanning the workspace
+
+
+class WorkspaceTaskIndex:
+    """Sections and tasks of one sync loop, grouped in a single pass.
+
+    Section tasks are sorted by parent and child order, the same order the
+    sync loop processes them in. Children are only found within the section
+    of their parent.
+    """
+
+    def __init__(self, sections, tasks):
+        self._sections_by_project = {}
+        self._tasks_by_section = {}
+        self._children = {}
+        self._open_children = {}
+
+        for section in sections:
+            self._sections_by_project.setdefault(section.project_id, []).append(section)
+
+        # In API v3, IDs are strings, so don't convert parent ids to int
+        for task in sorted(tasks, key=lambda x: (x.parent_id if x.parent_id else "", x.order)):
+            section_key = (task.project_id, task.section_id)
+            self._tasks_by_section.setdefault(section_key, []).append(task)
+            if task.parent_id:
+                child_key = (task.project_id, task.section_id, task.parent_id)
+                self._children.setdefault(child_key, []).append(task)
+                if not task.is_completed:
+                    self._open_children.setdefault(child_key, []).append(task)
+
+    def sections(self, project_id):
+        return list(self._sections_by_project.get(project_id, ()))
+
+    def section_tasks(self, project_id, section_id):
+        return list(self._tasks_by_section.get((project_id, section_id), ()))
+
+    def children(self, task):
+        return list(self._children.get((task.project_id, task.section_id, task.id), ()))
+
+    def open_children(self, task):
+        return list(self._open_children.get((task.project_id, task.section_id, task.id), ()))
 
 # Contains all main autodoist functionalities
 
 
-def autodoist_magic(args, api, connection):
+def autodoist_magic(args, api, connection, workspace_mirror=None, task_writer=None, planner=None,
+                    loop_timings=None, project_ids=None):
 
     # Preallocate dictionaries and other values
+    timings = loop_timings if loop_timings is not None else LoopTimings()
     overview_task_ids = {}
     overview_task_labels = {}
     next_action_label = args.label
@@ -1172,13 +1547,40 @@ def autodoist_magic(args, api, connection):
 
     # Get all todoist info
     try:
-        # In API v3, get_*() methods return paginators that yield pages (lists)
-        all_projects = [item for page in api.get_projects() for item in page]
-        all_sections = [item for page in api.get_sections() for item in page]
-        all_tasks = [item for page in api.get_tasks() for item in page]
+        all_projects, all_sections, all_tasks = fetch_workspace(
+            api, workspace_mirror)
 
     except Exception as error:
-        logging.error(error)
+        timings.lap('fetch')
+        if not is_temporary_todoist_error(error):
+            raise
+        logging.warning(
+            "Todoist temporary failure while reading the workspace; skipping this sync loop.",
+            extra={
+                "component": "sync_loop",
+                "operation": "fetch_workspace",
+                "error_type": describe_temporary_todoist_error(error),
+            })
+        timings.skipped = True
+        return overview_task_ids, overview_task_labels, num_updates
+    timings.lap('fetch')
+
+    # Queued writes are checked against the tasks this loop fetched
+    if isinstance(task_writer, RetryingTaskWriter):
+        task_writer.observe(all_tasks)
+
+    # Check db existance of everything outside the inbox at once
+    processed_project_ids = {
+        project.id for project in all_projects if not project.is_inbox_project}
+    db_check_existance_many(connection, [
+        *(project for project in all_projects if project.id in processed_project_ids),
+        *(section for section in all_sections if section.project_id in processed_project_ids),
+        *(task for task in all_tasks if task.project_id in processed_project_ids),
+    ])
+    timings.lap('metadata_write')
+
+    # Group sections and tasks once, instead of filtering the workspace per project, section and task
+    task_index = WorkspaceTaskIndex(all_sections, all_tasks)
 
     for project in all_projects:
 
@@ -1186,47 +1588,25 @@ def autodoist_magic(args, api, connection):
         if project.is_inbox_project:
             continue
 
-        # Check db existance
-        db_check_existance(connection, project)
+        # Webhook-triggered loops only maintain the projects that changed
+        if project_ids is not None and project.id not in project_ids:
+            continue
 
         # Check if we need to (un)header entire project
         header_updates, header_all_in_p, unheader_all_in_p = check_header(
             api, project)
         num_updates += header_updates
 
-        # Get all tasks for the project
-        try:
-            project_tasks = [
-                t for t in all_tasks if t.project_id == project.id]
-        except Exception as error:
-            logging.warning(error)
-
-        # Run for both non-sectioned and sectioned tasks
-        # for s in [0,1]:
-        #     if s == 0:
-        #         sections = Section(None, None, 0, project.id)
-        #     elif s == 1:
-        #         try:
-        #             sections = api.get_sections(project_id=project.id)
-        #         except Exception as error:
-        #             print(error)
-
         # Get all sections and add the 'None' section too.
-        try:
-            sections = [s for s in all_sections if s.project_id == project.id]
-            # In API v3, Section requires: id, name, project_id, is_collapsed, order
-            # Create a fake section for tasks without a section
-            sections.insert(0, Section(id=None, name=None, project_id=project.id, is_collapsed=False, order=0))
-        except Exception as error:
-            logging.debug(error)
+        sections = task_index.sections(project.id)
+        # In API v3, Section requires: id, name, project_id, is_collapsed, order
+        # Create a fake section for tasks without a section
+        sections.insert(0, Section(id=None, name=None, project_id=project.id, is_collapsed=False, order=0))
 
         for section in sections:
 
             # Skip DB and type operations for the fake None section (tasks without a section)
             if section.id is not None:
-                # Check db existance
-                db_check_existance(connection, section)
-
                 # Check if we need to (un)header entire secion
                 header_updates, header_all_in_s, unheader_all_in_s = check_header(
                     api, section)
@@ -1236,35 +1616,22 @@ def autodoist_magic(args, api, connection):
                 header_all_in_s = False
                 unheader_all_in_s = False
 
-            # Get all tasks for the section
-            section_tasks = [x for x in project_tasks if x.section_id
-                             == section.id]
+            # Get all tasks for the section, sorted by parent_id and child order.
+            # In the past, Todoist used to screw up the tasks orders, so originally I processed parentless tasks first such that children could properly inherit porperties.
+            # With the new API this seems to be in order, but I'm keeping this just in case for now.
+            section_tasks = task_index.section_tasks(project.id, section.id)
 
-            # Change top tasks parents_id from 'None' to '0' in order to numerically sort later on
+            # Change top tasks parents_id from 'None' to '0'
             for task in section_tasks:
                 if not task.parent_id:
                     task.parent_id = 0
 
-            # Sort by parent_id and child order
-            # In the past, Todoist used to screw up the tasks orders, so originally I processed parentless tasks first such that children could properly inherit porperties.
-            # With the new API this seems to be in order, but I'm keeping this just in case for now. TODO: Could be used for optimization in the future.
-            # In API v3, IDs are strings, so don't convert to int
-            section_tasks = sorted(section_tasks, key=lambda x: (
-                x.parent_id if x.parent_id else "", x.order))
-
             # For all tasks in this section
             for task in section_tasks:
 
-                # Check db existance
-                db_check_existance(connection, task)
-
                 # Determine which child_tasks exist, both all and the ones that have not been checked yet
-                non_completed_tasks = list(
-                    filter(lambda x: not x.is_completed, section_tasks))
-                child_tasks_all = list(
-                    filter(lambda x: x.parent_id == task.id, section_tasks))
-                child_tasks = list(
-                    filter(lambda x: x.parent_id == task.id, non_completed_tasks))
+                child_tasks_all = task_index.children(task)
+                child_tasks = task_index.open_children(task)
 
                 # Check if we need to (un)header entire task tree
                 header_updates, header_all_in_t, unheader_all_in_t = check_header(
@@ -1272,8 +1639,9 @@ def autodoist_magic(args, api, connection):
                 num_updates += header_updates
 
                 # Modify headers where needed
-                num_updates += modify_task_headers(api, task, section_tasks, header_all_in_p,
-                                                   unheader_all_in_p, header_all_in_s, unheader_all_in_s, header_all_in_t, unheader_all_in_t)
+                num_updates += modify_task_headers(api, task, task_index, header_all_in_p,
+                                                   unheader_all_in_p, header_all_in_s, unheader_all_in_s, header_all_in_t, unheader_all_in_t,
+                                                   task_writer)
 
                 # TODO: Check is regeneration is still needed, now that it's part of core Todoist. Disabled for now.
                 # Logic for recurring lists
@@ -1290,41 +1658,62 @@ def autodoist_magic(args, api, connection):
                 if args.regeneration is not None or args.end:
                     run_recurring_lists_logic(
                         args, api, connection, task, child_tasks, child_tasks_all, regen_labels_id)
+    timings.lap('task_loop')
 
     if next_action_label is not None:
         tasks_by_id = {task.id: task for task in all_tasks}
-        sections_by_id = {section.id: section for section in all_sections}
-        projects_by_id = {project.id: project for project in all_projects}
-        workspace = build_workspace_snapshot(all_projects, all_sections, all_tasks)
+        if args.columnar_snapshot:
+            workspace = build_columnar_workspace_snapshot(all_projects, all_sections, all_tasks)
+        else:
+            workspace = build_workspace_snapshot(all_projects, all_sections, all_tasks)
+        timings.lap('snapshot')
         metadata = build_autodoist_metadata_snapshot(
             connection,
             all_projects,
             all_sections,
             all_tasks,
         )
-        planning_result = plan_next_action_labels(
+        timings.lap('metadata_load')
+        # The incremental planner reuses the previous loop's plan for unchanged projects
+        if planner is not None:
+            plan = planner.plan
+        elif args.columnar_snapshot:
+            plan = plan_columnar_next_action_labels
+        else:
+            plan = plan_next_action_labels
+        planning_result = plan(
             workspace,
             build_planner_config(args),
             metadata,
         )
-        apply_planner_metadata_commands(
-            connection,
-            tasks_by_id,
-            sections_by_id,
-            projects_by_id,
-            planning_result.metadata_commands,
-        )
+        timings.planner_stats = planning_result.stats
+        if args.planner_stats:
+            logging.info(
+                "Planned next action labels",
+                extra={
+                    "component": "planner",
+                    "operation": "plan",
+                    **planning_result.stats.as_log_fields(),
+                })
         apply_planner_label_changes(
             tasks_by_id,
             planning_result.label_changes,
             overview_task_ids,
             overview_task_labels,
         )
+        timings.lap('planning')
+        apply_planner_metadata_commands(
+            connection,
+            planning_result.metadata_commands,
+        )
+        timings.lap('metadata_write')
         num_updates += apply_planner_description_changes(
             api,
             tasks_by_id,
             planning_result.description_changes,
+            task_writer,
         )
+        timings.lap('description_writes')
 
     # Return all ids and corresponding labels that need to be modified
     return overview_task_ids, overview_task_labels, num_updates
@@ -1346,7 +1735,9 @@ def main():
     parser.add_argument(
         '-e', '--end', help='enable alternative end-of-day time instead of default midnight. Enter a number from 1 to 24 to define which hour is used.', type=int)
     parser.add_argument(
-        '-d', '--delay', help='specify the delay in seconds between syncs (default 5).', default=5, type=int)
+        '-d', '--delay', help='specify the delay in seconds between syncs (default 5). With --max_delay this is the shortest delay.', default=5, type=int)
+    parser.add_argument(
+        '--max_delay', help='double the delay after every sync without changes, up to this many seconds (default: same as --delay).', type=int)
     parser.add_argument(
         '-p', '--p_suffix', help='change suffix for parallel labeling (default "=").', default='=')
     parser.add_argument(
@@ -1367,6 +1758,32 @@ def main():
                         action='store_true')
     parser.add_argument('--status_url', help='URL to call after each sync loop iteration for monitoring.',
                         type=str)
+    parser.add_argument('--delta_sync', help='after the first sync, only read changed projects, sections and tasks from Todoist.',
+                        action='store_true')
+    parser.add_argument('--batch_writes', help='send task updates to Todoist in batches of up to 100 commands per request.',
+                        action='store_true')
+    parser.add_argument('--write_concurrency', help='maximum number of task updates sent to Todoist at the same time (default 1).',
+                        default=1, type=int)
+    parser.add_argument('--db_journal_mode', help='SQLite journal mode of the metadata database (default "wal").',
+                        default='wal', choices=['wal', 'delete', 'truncate', 'persist', 'memory'])
+    parser.add_argument('--db_synchronous', help='SQLite synchronous setting of the metadata database (default "normal").',
+                        default='normal', choices=['off', 'normal', 'full', 'extra'])
+    parser.add_argument('--planner_stats', help='log phase timings and counters of every next action plan.',
+                        action='store_true')
+    parser.add_argument('--columnar_snapshot', help='plan next action labels from a column-oriented workspace snapshot, which needs less memory for very large accounts. Replans every project on every sync.',
+                        action='store_true')
+    parser.add_argument('--metrics_port', help='serve Prometheus metrics on this port at /metrics.',
+                        type=int)
+    parser.add_argument('--metrics_host', help='address the metrics endpoint listens on (default "127.0.0.1").',
+                        default='127.0.0.1')
+    parser.add_argument('--webhook_port', help='receive Todoist webhooks on this port and sync when they arrive, instead of polling.',
+                        type=int)
+    parser.add_argument('--webhook_host', help='address the webhook receiver listens on (default "127.0.0.1").',
+                        default='127.0.0.1')
+    parser.add_argument('--webhook_secret', help='client secret of the Todoist app that signs the webhooks.',
+                        default=os.environ.get('TODOIST_CLIENT_SECRET'), type=str)
+    parser.add_argument('--webhook_fallback', help='with --webhook_port, seconds between full syncs when no webhook arrives (default %d).' % WEBHOOK_FALLBACK_DELAY_SECONDS,
+                        default=WEBHOOK_FALLBACK_DELAY_SECONDS, type=int)
 
     args = parser.parse_args()
 
@@ -1385,24 +1802,86 @@ def main():
 
     configure_logging(log_level)
 
-    # Initialise api
-    api = initialise_api(args)
+    # Initialise api, counting the requests of every Todoist client and
+    # keeping all of them within Todoist's per-user quota
+    session = requests.Session()
+    api_traffic = ApiTrafficCounter(session)
+    rate_limiter = RateLimitingAdapter()
+    rate_limiter.attach(session)
+    api = initialise_api(args, session)
+
+    # Optionally serve loop and API metrics to Prometheus from a background thread
+    metrics = None
+    if args.metrics_port is not None:
+        metrics = SyncLoopMetrics()
+        metrics.attach(session)
+        start_metrics_server(metrics.registry, args.metrics_port, args.metrics_host)
 
     # Initialise SQLite database
-    connection = initialise_sqlite()
+    connection = initialise_sqlite(args.db_journal_mode, args.db_synchronous)
+
+    # Keep a local workspace mirror that is updated with sync deltas, and
+    # choose how task updates are written
+    sync_client = None
+    if args.delta_sync or args.batch_writes:
+        sync_client = TodoistSyncClient(args.api_key, session=session)
+
+    workspace_mirror = None
+    if args.delta_sync:
+        workspace_mirror = WorkspaceMirror(sync_client)
+
+    if args.batch_writes:
+        task_writer = SyncCommandTaskWriter(sync_client)
+    else:
+        task_writer = RestTaskWriter(api, concurrency=args.write_concurrency)
+
+    # Failed task writes are kept in the metadata database and sent again later
+    task_writer = RetryingTaskWriter(task_writer, connection)
+
+    # Only replan the projects that changed since the previous loop, unless
+    # a columnar snapshot is used, which trades that for less memory
+    planner = ColumnarPlanner() if args.columnar_snapshot else IncrementalPlanner()
+
+    # Poll less often while nothing changes, and honour Todoist's Retry-After hints.
+    # With webhooks, a delivery ends the sleep and a slow poll catches missed events.
+    webhook_events = None
+    if args.webhook_port is not None:
+        webhook_events = WebhookEvents()
+        start_webhook_server(webhook_events, args.webhook_secret, args.webhook_port, args.webhook_host)
+        scheduler = AdaptivePollScheduler(
+            args.webhook_fallback, args.webhook_fallback, sleep=webhook_events.sleep)
+    else:
+        min_delay = max(args.delay, 0)
+        max_delay = args.max_delay if args.max_delay is not None else min_delay
+        scheduler = AdaptivePollScheduler(min_delay, max_delay)
+    scheduler.attach(session)
 
     # Start main loop
     while True:
         start_time = time.time()
-
-        # Evaluate projects, sections, and tasks
-        overview_task_ids, overview_task_labels, num_changes = autodoist_magic(
-            args, api, connection)
-
-        # Commit next action label changes via REST API
-        if args.label is not None:
-            num_changes += apply_label_updates(api, overview_task_ids,
-                                               overview_task_labels)
+        loop_timings = LoopTimings()
+        api_traffic_before = api_traffic.totals()
+        rate_limit_before = rate_limiter.totals()
+        project_ids = webhook_events.take() if webhook_events is not None else None
+
+        # All metadata written during this loop is committed at once
+        with metadata_transaction(connection) as transaction:
+            # Evaluate projects, sections, and tasks
+            overview_task_ids, overview_task_labels, num_changes = autodoist_magic(
+                args, api, transaction, workspace_mirror, task_writer, planner, loop_timings,
+                project_ids)
+
+            # Commit next action label changes via REST API
+            if args.label is not None:
+                num_changes += apply_label_updates(api, overview_task_ids,
+                                                   overview_task_labels, task_writer)
+                loop_timings.lap('label_writes')
+
+            # Retry earlier failed writes that are due and still wanted, once this
+            # loop's own writes have replaced the queued ones they supersede
+            num_changes += task_writer.drain()
+            loop_timings.lap('retry_writes')
+        loop_timings.lap('metadata_commit')
 
         if num_changes:
             if num_changes == 1:
@@ -1416,22 +1895,61 @@ def main():
 
         # Call status URL for monitoring
         call_status_url(args.status_url)
+        loop_timings.lap('status_ping')
+
+        # One record per loop, so loop latency can be charted from the logs
+        rate_limit_fields = rate_limiter.log_fields_since(rate_limit_before)
+        retry_queue_depth = task_writer.depth()
+        logging.info(
+            'Sync loop finished.',
+            extra={
+                "component": "sync_loop",
+                "operation": "loop",
+                "changes": num_changes,
+                "skipped": loop_timings.skipped,
+                "webhook_projects": len(project_ids) if project_ids is not None else None,
+                **loop_timings.as_log_fields(),
+                **api_traffic.log_fields_since(api_traffic_before),
+                **rate_limit_fields,
+                "retry_queue_depth": retry_queue_depth,
+            })
+        if metrics is not None:
+            metrics.observe_loop(loop_timings, num_changes)
+            metrics.observe_rate_limit(
+                rate_limit_fields['rate_limit_wait_seconds'], rate_limit_fields['rate_limit_retries'])
+            metrics.observe_retry_queue(retry_queue_depth)
 
         # If onetime is set, exit after first execution.
         if args.onetime:
             break
 
-        # Set a delay before next sync
+        # Wait before the next sync: shorter after changes, longer after idle loops
         end_time = time.time()
         delta_time = end_time - start_time
 
-        if args.delay - delta_time < 0:
+        # Wake up when a start date, hidden due date or end of day comes around
+        planning_result = planner.last_result
+        wake_in = seconds_until_wakeup(
+            datetime.now(),
+            planning_result.next_decision_date if planning_result is not None else None,
+            args.end,
+        )
+
+        sleep_time = scheduler.wait(delta_time, num_changes, wake_in)
+        if sleep_time:
+            logging.debug(
+                'Sleeping for %d seconds', sleep_time,
+                extra={
+                    "component": "sync_loop",
+                    "operation": "schedule",
+                    "interval_seconds": scheduler.interval,
+                    "sleep_seconds": round(sleep_time, 3),
+                    "wake_in_seconds": round(wake_in, 3) if wake_in is not None else None,
+                })
+        else:
             logging.debug(
-                'Computation time %d is larger than the specified delay %d. Sleeping skipped.', delta_time, args.delay)
-        elif args.delay >= 0:
-            sleep_time = args.delay - delta_time
-            logging.debug('Sleeping for %d seconds', sleep_time)
-            time.sleep(sleep_time)
+                'Computation time %d is larger than the sync interval %d. Sleeping skipped.',
+                delta_time, scheduler.interval)
 
         # Call status URL for monitoring (after each loop iteration)
         call_status_url(args.status_url)
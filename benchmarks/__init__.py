@@ -0,0 +1,7 @@
+"""Performance benchmarks for Autodoist.
+
+Each module can be run on its own, e.g. ``python -m benchmarks.bench_fetch``.
+``python -m benchmarks.run`` times every planning phase on workspaces from
+``benchmarks.workspace_generator`` and can write and compare JSON reports.
+Benchmarks use local stubs and never talk to Todoist.
+"""
@@ -0,0 +1,77 @@
+"""Compare the memory and planning time of row and columnar workspace snapshots.
+
+Retained memory is what each snapshot keeps alive once it is built, and peak
+memory is the most a plan allocates on top of it, both measured with
+tracemalloc. Both snapshots hold the same task content strings, so the
+difference comes from the per-task objects the columnar layout avoids.
+
+Run with: python -m benchmarks.bench_columnar_snapshot
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import date
+
+from benchmarks.bench_planner import best_of, build_snapshot, stored_metadata
+from columnar_snapshot import ColumnarWorkspaceSnapshot, plan_columnar_next_action_labels
+from next_action_planner import PlannerConfig, plan_next_action_labels
+
+
+def retained_memory(build, num_tasks):
+    gc.collect()
+    tracemalloc.start()
+    snapshot = build(num_tasks)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del snapshot
+    return retained
+
+
+def peak_planning_memory(plan, workspace, config, metadata):
+    gc.collect()
+    tracemalloc.start()
+    plan(workspace, config, metadata)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def build_columnar(num_tasks):
+    return ColumnarWorkspaceSnapshot.from_snapshot(build_snapshot(num_tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config = PlannerConfig(next_action_label='next_action', today=date.today())
+
+    print(
+        f'{"tasks":>8} {"rows MB":>8} {"columns MB":>11} {"rows peak MB":>13} {"columns peak MB":>16} '
+        f'{"rows plan":>10} {"columns plan":>13}'
+    )
+    for num_tasks in args.tasks:
+        row_memory = retained_memory(build_snapshot, num_tasks)
+        columnar_memory = retained_memory(build_columnar, num_tasks)
+
+        workspace = build_snapshot(num_tasks)
+        columnar = ColumnarWorkspaceSnapshot.from_snapshot(workspace)
+        metadata = stored_metadata(workspace, config)
+        row_peak = peak_planning_memory(plan_next_action_labels, workspace, config, metadata)
+        columnar_peak = peak_planning_memory(plan_columnar_next_action_labels, columnar, config, metadata)
+        row_time = best_of(args.repeat, plan_next_action_labels, workspace, config, metadata)
+        columnar_time = best_of(args.repeat, plan_columnar_next_action_labels, columnar, config, metadata)
+
+        print(
+            f'{num_tasks:8d} {row_memory / 2**20:8.1f} {columnar_memory / 2**20:11.1f} '
+            f'{row_peak / 2**20:13.1f} {columnar_peak / 2**20:16.1f} '
+            f'{row_time:9.3f}s {columnar_time:12.3f}s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Compare the pure-Python and NumPy actionable date filters.
+
+Both paths scan the same cached date markers; the NumPy path turns due and
+start dates into day ordinals and compares them as arrays.
+
+Run with: python -m benchmarks.bench_date_filters
+"""
+
+import argparse
+from dataclasses import replace
+from datetime import date, timedelta
+
+import next_action_planner
+from benchmarks.bench_planner import best_of, build_snapshot
+from next_action_planner import PlannerConfig
+
+CONTENTS = ('Task', 'Task start=01-01-2026', 'Task start=due-3d', 'Task start=due-2w')
+
+
+def dated_tasks(num_tasks, today):
+    return tuple(
+        replace(
+            task,
+            content=CONTENTS[index % len(CONTENTS)],
+            due_date=today + timedelta(days=index % 40 - 5) if index % 3 else None,
+        )
+        for index, task in enumerate(build_snapshot(num_tasks).tasks)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    today = date.today()
+    config = PlannerConfig(next_action_label='next_action', hide_future=7, today=today)
+
+    print(f'{"tasks":>8} {"python":>9} {"numpy":>9}')
+    for num_tasks in args.tasks:
+        tasks = dated_tasks(num_tasks, today)
+        python_time = best_of(args.repeat, next_action_planner._actionable_date_rows, tasks, config, today)
+        if next_action_planner.np is None:
+            print(f'{num_tasks:8d} {python_time:8.3f}s {"n/a":>9}')
+            continue
+        numpy_time = best_of(
+            args.repeat, next_action_planner._vectorized_actionable_date_rows, tasks, config, today)
+        print(f'{num_tasks:8d} {python_time:8.3f}s {numpy_time:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
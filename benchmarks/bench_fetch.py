@@ -0,0 +1,72 @@
+"""Compare sequential and concurrent workspace reads against a slow stub API.
+
+Every page request sleeps for a fixed latency, which stands in for the round
+trip to Todoist. The sequential baseline drains the three paginators one after
+another, the way the sync loop used to.
+
+Run with: python -m benchmarks.bench_fetch
+"""
+
+import argparse
+import time
+
+from autodoist import fetch_workspace
+
+
+class LatencyStubAPI:
+    def __init__(self, latency, pages_per_stream):
+        self.latency = latency
+        self.pages_per_stream = pages_per_stream
+
+    def _pages(self, prefix):
+        for page in range(self.pages_per_stream):
+            time.sleep(self.latency)
+            yield [f'{prefix}-{page}-{index}' for index in range(200)]
+
+    def get_projects(self):
+        return self._pages('project')
+
+    def get_sections(self):
+        return self._pages('section')
+
+    def get_tasks(self):
+        return self._pages('task')
+
+
+def fetch_sequentially(api):
+    return (
+        [item for page in api.get_projects() for item in page],
+        [item for page in api.get_sections() for item in page],
+        [item for page in api.get_tasks() for item in page],
+    )
+
+
+def measure(fetch, api, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fetch(api)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds of latency per page request (default 0.05).')
+    parser.add_argument('--pages', type=int, default=3,
+                        help='pages per stream (default 3).')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    api = LatencyStubAPI(args.latency, args.pages)
+    sequential = measure(fetch_sequentially, api, args.repeat)
+    concurrent = measure(fetch_workspace, api, args.repeat)
+
+    print(f'latency per page: {args.latency * 1000:.0f} ms, pages per stream: {args.pages}')
+    print(f'sequential: {sequential * 1000:8.1f} ms')
+    print(f'concurrent: {concurrent * 1000:8.1f} ms  ({sequential / concurrent:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Measure how long loading Autodoist metadata takes per sync loop.
+
+Compares the bulk load in `build_autodoist_metadata_snapshot` with the previous
+approach of one `db_read_value` query per project, section and task column.
+
+Run with: python -m benchmarks.bench_metadata
+"""
+
+import argparse
+import sqlite3
+import time
+
+from autodoist import (
+    build_autodoist_metadata_snapshot,
+    create_metadata_tables,
+    db_read_value,
+)
+from benchmarks.sdk_objects import make_project, make_section, make_task
+
+TASKS_PER_SECTION = 50
+SECTIONS_PER_PROJECT = 4
+
+
+def build_workspace(num_tasks):
+    num_sections = max(1, num_tasks // TASKS_PER_SECTION)
+    num_projects = max(1, num_sections // SECTIONS_PER_PROJECT)
+    projects = [make_project(f'p{index}', f'Project {index} -') for index in range(num_projects)]
+    sections = [
+        make_section(f's{index}', f'Section {index}', projects[index % num_projects].id)
+        for index in range(num_sections)
+    ]
+    tasks = [
+        make_task(
+            f't{index}',
+            f'Task {index}',
+            sections[index % num_sections].project_id,
+            section_id=sections[index % num_sections].id,
+            order=index,
+        )
+        for index in range(num_tasks)
+    ]
+    return projects, sections, tasks
+
+
+def populate(connection, projects, sections, tasks):
+    create_metadata_tables(connection)
+    connection.executemany(
+        'INSERT INTO projects (project_id, project_type) VALUES (?, ?)',
+        [(project.id, 'sss') for project in projects],
+    )
+    connection.executemany(
+        'INSERT INTO sections (section_id, section_type) VALUES (?, ?)',
+        [(section.id, 'xss') for section in sections],
+    )
+    connection.executemany(
+        'INSERT INTO tasks (task_id, task_type, parent_type, due_date, r_tag) VALUES (?, ?, ?, NULL, 0)',
+        [(task.id, None, 's') for task in tasks],
+    )
+    connection.commit()
+
+
+def read_row_by_row(connection, projects, sections, tasks):
+    for project in projects:
+        db_read_value(connection, project, 'project_type')
+    for section in sections:
+        db_read_value(connection, section, 'section_type')
+    for task in tasks:
+        db_read_value(connection, task, 'task_type')
+        db_read_value(connection, task, 'parent_type')
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[10_000, 50_000, 100_000])
+    parser.add_argument('--row-by-row-limit', type=int, default=10_000,
+                        help='skip the row-by-row baseline above this many tasks, '
+                             'since it is slow on unindexed tables (default 10000).')
+    args = parser.parse_args()
+
+    print(f'{"tasks":>8} {"bulk load":>12} {"row by row":>12}')
+    for num_tasks in args.tasks:
+        projects, sections, tasks = build_workspace(num_tasks)
+        connection = sqlite3.connect(':memory:')
+        populate(connection, projects, sections, tasks)
+
+        bulk = timed(build_autodoist_metadata_snapshot, connection, projects, sections, tasks)
+        if num_tasks <= args.row_by_row_limit:
+            row_by_row = f'{timed(read_row_by_row, connection, projects, sections, tasks):11.2f}s'
+        else:
+            row_by_row = f'{"skipped":>12}'
+        print(f'{num_tasks:8d} {bulk:11.3f}s {row_by_row}')
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
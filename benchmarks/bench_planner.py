@@ -0,0 +1,122 @@
+"""Measure next-action planning time on synthetic workspace snapshots.
+
+Both planner passes share one `WorkspaceIndex`. The benchmark reports the
+time to build that index next to the time of a full plan, which shows how
+much a second, per-pass index would add. Plans run in the steady state of a
+sync loop, where the strategies of the previous loop are already stored.
+
+The last column replans the same workspace incrementally after one task in
+one project was renamed.
+
+Run with: python -m benchmarks.bench_planner
+"""
+
+import argparse
+import time
+from dataclasses import replace
+from datetime import date
+
+from incremental_planner import plan_incrementally
+from next_action_planner import (
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    ProjectSnapshot,
+    SectionSnapshot,
+    SelectionStrategy,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    build_workspace_index,
+    plan_next_action_labels,
+)
+
+TASKS_PER_SECTION = 50
+SECTIONS_PER_PROJECT = 4
+SUBTASKS_PER_TASK = 4
+
+
+def build_snapshot(num_tasks):
+    num_sections = max(1, num_tasks // TASKS_PER_SECTION)
+    num_projects = max(1, num_sections // SECTIONS_PER_PROJECT)
+    projects = tuple(
+        ProjectSnapshot(id=f'p{index}', name=f'Project {index} -', order=index, is_inbox_project=False)
+        for index in range(num_projects)
+    )
+    sections = tuple(
+        SectionSnapshot(id=f's{index}', name=f'Section {index} =', project_id=f'p{index % num_projects}', order=index)
+        for index in range(num_sections)
+    )
+
+    tasks = []
+    parent_id = None
+    for index in range(num_tasks):
+        section = sections[(index // TASKS_PER_SECTION) % num_sections]
+        if index % SUBTASKS_PER_TASK == 0:
+            parent_id = None
+        tasks.append(TaskSnapshot(
+            id=f't{index}',
+            content=f'Task {index} -' if parent_id is None else f'Task {index}',
+            project_id=section.project_id,
+            section_id=section.id,
+            parent_id=parent_id,
+            labels=(),
+            order=index,
+        ))
+        parent_id = f't{index}'
+    return WorkspaceSnapshot(projects=projects, sections=sections, tasks=tuple(tasks))
+
+
+def stored_metadata(workspace, config):
+    """Return the metadata a first sync loop would have stored for the workspace."""
+    index = build_workspace_index(workspace, config)
+    return AutodoistMetadataSnapshot(
+        project_strategies=dict(index.project_strategies),
+        section_strategies=dict(index.section_strategies),
+        task_strategies={
+            task.id: index.task_strategies[task.id]
+            for task in index.root_tasks
+        },
+        # Every generated sub-task sits below a sequential parent
+        task_parent_strategies={
+            task.id: SelectionStrategy.SEQUENTIAL
+            for task in workspace.tasks
+            if task.parent_id is not None
+        },
+    )
+
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[10_000, 50_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    config = PlannerConfig(next_action_label='next_action', today=date.today())
+
+    print(f'{"tasks":>8} {"index":>9} {"full plan":>10} {"incremental":>12}')
+    for num_tasks in args.tasks:
+        workspace = build_snapshot(num_tasks)
+        metadata = stored_metadata(workspace, config)
+        index_time = best_of(args.repeat, build_workspace_index, workspace, config)
+        plan_time = best_of(args.repeat, plan_next_action_labels, workspace, config, metadata)
+
+        previous, _ = plan_incrementally(None, workspace, config, metadata)
+        edited_tasks = list(workspace.tasks)
+        edited_tasks[num_tasks // 2] = replace(edited_tasks[num_tasks // 2], content='Renamed')
+        edited = replace(workspace, tasks=tuple(edited_tasks))
+        incremental_time = best_of(args.repeat, plan_incrementally, previous, edited, config, metadata)
+
+        print(f'{num_tasks:8d} {index_time:8.3f}s {plan_time:9.3f}s {incremental_time:11.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measure planning right after a large project switches from sequential to parallel.
+
+Every sub-task had its parent strategy stored as sequential, so renaming the
+project from `-` to `=` makes the planner record a new parent strategy for
+each of them in a single loop.
+
+Run with: python -m benchmarks.bench_strategy_flip
+"""
+
+import argparse
+import time
+
+from next_action_planner import (
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    ProjectSnapshot,
+    RecordTaskParentStrategy,
+    SectionSnapshot,
+    SelectionStrategy,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    plan_next_action_labels,
+)
+
+SUBTASKS_PER_TASK = 10
+
+
+def build_flipped_workspace(num_tasks):
+    tasks = tuple(
+        TaskSnapshot(
+            id=f't{index}',
+            content='Task',
+            project_id='p1',
+            section_id='s1',
+            parent_id=None if index % SUBTASKS_PER_TASK == 0 else f't{index - index % SUBTASKS_PER_TASK}',
+            labels=(),
+            order=index,
+        )
+        for index in range(num_tasks)
+    )
+    workspace = WorkspaceSnapshot(
+        projects=(ProjectSnapshot(id='p1', name='Big project =', order=0, is_inbox_project=False),),
+        sections=(SectionSnapshot(id='s1', name='Next', project_id='p1', order=0),),
+        tasks=tasks,
+    )
+    metadata = AutodoistMetadataSnapshot(task_parent_strategies={
+        task.id: SelectionStrategy.SEQUENTIAL for task in tasks if task.parent_id is not None
+    })
+    return workspace, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[10_000, 50_000, 100_000])
+    args = parser.parse_args()
+
+    config = PlannerConfig(next_action_label='next_action')
+    print(f'{"tasks":>8} {"flipped":>9} {"plan":>9}')
+    for num_tasks in args.tasks:
+        workspace, metadata = build_flipped_workspace(num_tasks)
+        start = time.perf_counter()
+        result = plan_next_action_labels(workspace, config, metadata)
+        elapsed = time.perf_counter() - start
+        flipped = sum(isinstance(command, RecordTaskParentStrategy) for command in result.metadata_commands)
+        print(f'{num_tasks:8d} {flipped:9d} {elapsed:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
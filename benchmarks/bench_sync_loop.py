@@ -0,0 +1,114 @@
+"""Measure how the time of one sync loop grows with the number of tasks.
+
+Every section holds a few parentless tasks with nested sub-tasks, so the loop
+looks up children at every level. The Todoist API is replaced by a stub that
+returns the generated workspace, so only local processing is measured.
+
+Run with: python -m benchmarks.bench_sync_loop
+"""
+
+import argparse
+import sqlite3
+import time
+
+from autodoist import autodoist_magic, create_metadata_tables
+from benchmarks.sdk_objects import make_project, make_section, make_task
+
+TASKS_PER_SECTION = 50
+SECTIONS_PER_PROJECT = 4
+SUBTASKS_PER_TASK = 4
+
+
+class WorkspaceStubAPI:
+    def __init__(self, projects, sections, tasks):
+        self._projects = projects
+        self._sections = sections
+        self._tasks = tasks
+
+    def get_projects(self):
+        return iter([self._projects])
+
+    def get_sections(self):
+        return iter([self._sections])
+
+    def get_tasks(self):
+        return iter([self._tasks])
+
+    def update_task(self, **kwargs):
+        pass
+
+
+def build_workspace(num_tasks):
+    num_sections = max(1, num_tasks // TASKS_PER_SECTION)
+    num_projects = max(1, num_sections // SECTIONS_PER_PROJECT)
+    projects = [make_project(f'p{index}', f'Project {index} -') for index in range(num_projects)]
+    sections = [
+        make_section(f's{index}', f'Section {index}', projects[index % num_projects].id, order=index)
+        for index in range(num_sections)
+    ]
+
+    tasks = []
+    parent_id = None
+    for index in range(num_tasks):
+        section = sections[(index // TASKS_PER_SECTION) % num_sections]
+        # Every few tasks start a new parentless task, the others nest one level deeper
+        if index % SUBTASKS_PER_TASK == 0:
+            parent_id = None
+        task = make_task(
+            f't{index}',
+            f'Task {index}',
+            section.project_id,
+            section_id=section.id,
+            parent_id=parent_id,
+            order=index,
+        )
+        tasks.append(task)
+        parent_id = task.id
+    return projects, sections, tasks
+
+
+def run_loop(num_tasks, label):
+    projects, sections, tasks = build_workspace(num_tasks)
+    api = WorkspaceStubAPI(projects, sections, tasks)
+    args = argparse.Namespace(
+        label=label,
+        regen_label_names=('Regen_off', 'Regen_all', 'Regen_all_if_completed'),
+        regeneration=None,
+        end=None,
+        p_suffix='=',
+        s_suffix='-',
+        dateformat='%d-%m-%Y',
+        hide_future=0,
+        inbox=None,
+        all_projects=False,
+        ignore_suffix=False,
+        planner_stats=False,
+        columnar_snapshot=False,
+        metrics_port=None,
+    )
+    connection = sqlite3.connect(':memory:')
+    create_metadata_tables(connection)
+
+    start = time.perf_counter()
+    autodoist_magic(args, api, connection)
+    elapsed = time.perf_counter() - start
+
+    connection.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[2_000, 4_000, 8_000, 16_000])
+    parser.add_argument('--label', default='next_action',
+                        help='next action label to plan, or "" to only run the task loop.')
+    args = parser.parse_args()
+
+    print(f'{"tasks":>8} {"loop":>9} {"per 1k tasks":>13}')
+    for num_tasks in args.tasks:
+        elapsed = run_loop(num_tasks, args.label or None)
+        print(f'{num_tasks:8d} {elapsed:8.3f}s {elapsed / num_tasks * 1000:12.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Stress next-action planning and header updates on extreme task trees.
+
+A deep tree is one chain of sub-tasks; a wide tree is one task with many
+direct sub-tasks. Both are planned in the steady state of a sync loop, where
+parent strategies are already stored, and then fully turned into headers.
+
+Run with: python -m benchmarks.bench_task_trees
+"""
+
+import argparse
+import time
+
+from autodoist import WorkspaceTaskIndex, find_and_headerify_all_children
+from benchmarks.sdk_objects import make_task
+from next_action_planner import (
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    ProjectSnapshot,
+    SectionSnapshot,
+    SelectionStrategy,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    plan_next_action_labels,
+)
+
+
+class CountingWriter:
+    def __init__(self):
+        self.num_updates = 0
+
+    def write(self, updates):
+        self.num_updates += len(updates)
+        return []
+
+
+def deep_parent_ids(num_tasks):
+    return [None] + [f't{index - 1}' for index in range(1, num_tasks)]
+
+
+def wide_parent_ids(num_tasks):
+    return [None] + ['t0'] * (num_tasks - 1)
+
+
+def plan_tree(parent_ids):
+    workspace = WorkspaceSnapshot(
+        projects=(ProjectSnapshot(id='p1', name='Work -', order=0, is_inbox_project=False),),
+        sections=(SectionSnapshot(id='s1', name='Next', project_id='p1', order=0),),
+        tasks=tuple(
+            TaskSnapshot(
+                id=f't{index}',
+                content='Task',
+                project_id='p1',
+                section_id='s1',
+                parent_id=parent_id,
+                labels=(),
+                order=index,
+            )
+            for index, parent_id in enumerate(parent_ids)
+        ),
+    )
+    metadata = AutodoistMetadataSnapshot(task_parent_strategies={
+        task.id: SelectionStrategy.SEQUENTIAL
+        for task in workspace.tasks
+        if task.parent_id is not None
+    })
+
+    start = time.perf_counter()
+    plan_next_action_labels(workspace, PlannerConfig(next_action_label='next_action'), metadata)
+    return time.perf_counter() - start
+
+
+def headerify_tree(parent_ids):
+    tasks = [
+        make_task(f't{index}', 'Task', 'p1', section_id='s1', parent_id=parent_id, order=index)
+        for index, parent_id in enumerate(parent_ids)
+    ]
+    writer = CountingWriter()
+
+    start = time.perf_counter()
+    find_and_headerify_all_children(None, tasks[0], WorkspaceTaskIndex([], tasks), 1, writer)
+    elapsed = time.perf_counter() - start
+
+    assert writer.num_updates == len(tasks) - 1
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--depth', type=int, default=5_000)
+    parser.add_argument('--width', type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f'{"tree":>24} {"plan":>9} {"headers":>9}')
+    for name, parent_ids in (
+        (f'{args.depth} levels deep', deep_parent_ids(args.depth)),
+        (f'{args.width} children wide', wide_parent_ids(args.width)),
+    ):
+        print(f'{name:>24} {plan_tree(parent_ids):8.3f}s {headerify_tree(parent_ids):8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Measure label write time against a slow stub API at several concurrency limits.
+
+Every `update_task` call sleeps for a fixed latency, which stands in for the
+round trip to Todoist. No rate limiter is used, so the numbers show the effect
+of concurrency alone.
+
+Run with: python -m benchmarks.bench_writes
+"""
+
+import argparse
+import time
+
+from autodoist import apply_label_updates
+from task_writer import RestTaskWriter
+
+
+class LatencyStubAPI:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def update_task(self, **kwargs):
+        time.sleep(self.latency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--changes', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='seconds of latency per request (default 0.005).')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    api = LatencyStubAPI(args.latency)
+    overview_task_ids = {f't{index}': 1 for index in range(args.changes)}
+    overview_task_labels = {task_id: ['next_action'] for task_id in overview_task_ids}
+
+    print(f'{args.changes} label changes, {args.latency * 1000:.0f} ms per request')
+    baseline = None
+    for concurrency in args.concurrency:
+        writer = RestTaskWriter(api, concurrency=concurrency)
+        start = time.perf_counter()
+        apply_label_updates(api, overview_task_ids, overview_task_labels, writer)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f'concurrency {concurrency:3d}: {elapsed:7.2f} s  ({baseline / elapsed:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Run the planner and sync loop phases on generated workspaces.
+
+For every workspace size the runner reports the best wall time of each
+phase and, in a separate traced run, its peak memory above what was
+allocated before the phase started. `--json` writes the results so runs can
+be compared later with `--compare`.
+
+Run with: python -m benchmarks.run --tasks 1000 10000 100000 --json run.json
+"""
+
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from autodoist import autodoist_magic, build_workspace_snapshot, create_metadata_tables
+from benchmarks.bench_sync_loop import WorkspaceStubAPI
+from benchmarks.workspace_generator import WorkspaceShape, generate_workspace, to_sdk_objects
+from incremental_planner import plan_incrementally
+from next_action_planner import (
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    RecordProjectStrategy,
+    RecordSectionStrategy,
+    RecordTaskParentStrategy,
+    RecordTaskStrategy,
+    build_workspace_index,
+    plan_next_action_labels,
+)
+
+PHASES = ('generate', 'sdk_objects', 'snapshot', 'index', 'plan', 'incremental', 'sync_loop')
+
+
+def settled_metadata(workspace, config):
+    """Return the metadata stored after a first plan, as in a steady sync loop."""
+    stored = {
+        RecordProjectStrategy: ('project_id', {}),
+        RecordSectionStrategy: ('section_id', {}),
+        RecordTaskStrategy: ('task_id', {}),
+        RecordTaskParentStrategy: ('task_id', {}),
+    }
+    result = plan_next_action_labels(workspace, config, AutodoistMetadataSnapshot())
+    for command in result.metadata_commands:
+        key, values = stored[type(command)]
+        values[getattr(command, key)] = command.strategy
+    return AutodoistMetadataSnapshot(
+        project_strategies=stored[RecordProjectStrategy][1],
+        section_strategies=stored[RecordSectionStrategy][1],
+        task_strategies=stored[RecordTaskStrategy][1],
+        task_parent_strategies=stored[RecordTaskParentStrategy][1],
+    )
+
+
+def loop_args(label):
+    return argparse.Namespace(
+        label=label,
+        regen_label_names=('Regen_off', 'Regen_all', 'Regen_all_if_completed'),
+        regeneration=None,
+        end=None,
+        p_suffix='=',
+        s_suffix='-',
+        dateformat='%d-%m-%Y',
+        hide_future=0,
+        inbox=None,
+        all_projects=False,
+        ignore_suffix=False,
+        planner_stats=False,
+        columnar_snapshot=False,
+        metrics_port=None,
+    )
+
+
+def run_sync_loop(sdk_objects, label):
+    connection = sqlite3.connect(':memory:')
+    create_metadata_tables(connection)
+    try:
+        autodoist_magic(loop_args(label), WorkspaceStubAPI(*sdk_objects), connection)
+    finally:
+        connection.close()
+
+
+def measure(repeat, trace_memory, function, *args):
+    """Return the best time of `repeat` calls, the traced peak memory and the last result."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak -= baseline
+    return best, peak, result
+
+
+def run_size(shape, phases, repeat, trace_memory):
+    config = PlannerConfig(next_action_label=shape.label, today=shape.today, hide_future=7)
+    records = []
+
+    def record(phase, function, *args):
+        seconds, peak, result = measure(repeat, trace_memory, function, *args)
+        if phase in phases:
+            records.append({
+                'tasks': shape.tasks,
+                'phase': phase,
+                'seconds': round(seconds, 6),
+                'peak_bytes': peak,
+            })
+        return result
+
+    def skip(phase):
+        return phase not in phases
+
+    workspace = record('generate', generate_workspace, shape)
+    if not (skip('sdk_objects') and skip('snapshot') and skip('sync_loop')):
+        sdk_objects = record('sdk_objects', to_sdk_objects, workspace)
+        if not skip('snapshot'):
+            record('snapshot', build_workspace_snapshot, *sdk_objects)
+        if not skip('sync_loop'):
+            record('sync_loop', run_sync_loop, sdk_objects, shape.label)
+
+    if not skip('index'):
+        record('index', build_workspace_index, workspace, config)
+    if not (skip('plan') and skip('incremental')):
+        metadata = settled_metadata(workspace, config)
+        if not skip('plan'):
+            record('plan', plan_next_action_labels, workspace, config, metadata)
+        if not skip('incremental'):
+            previous, _ = plan_incrementally(None, workspace, config, metadata)
+            tasks = list(workspace.tasks)
+            edited = len(tasks) // 2
+            tasks[edited] = replace(tasks[edited], content=f'{tasks[edited].content} edited')
+            record('incremental', plan_incrementally,
+                   previous, replace(workspace, tasks=tuple(tasks)), config, metadata)
+
+    records.sort(key=lambda item: PHASES.index(item['phase']))
+    return records
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def print_records(records, baseline=None):
+    baseline = {(item['tasks'], item['phase']): item for item in baseline or ()}
+    header = f'{"tasks":>8} {"phase":<12} {"time":>10} {"peak MB":>9}'
+    if baseline:
+        header += f' {"vs baseline":>12}'
+    print(header)
+    for item in records:
+        peak = f'{item["peak_bytes"] / 2**20:9.1f}' if item['peak_bytes'] is not None else f'{"-":>9}'
+        line = f'{item["tasks"]:8d} {item["phase"]:<12} {item["seconds"]:9.4f}s {peak}'
+        previous = baseline.get((item['tasks'], item['phase']))
+        if previous and previous['seconds']:
+            line += f' {item["seconds"] / previous["seconds"]:11.2f}x'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--phases', nargs='+', choices=PHASES, default=list(PHASES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-depth', type=int, default=WorkspaceShape.max_depth)
+    parser.add_argument('--completed-ratio', type=float, default=WorkspaceShape.completed_ratio)
+    parser.add_argument('--date-marker-ratio', type=float, default=WorkspaceShape.date_marker_ratio)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced peak memory runs.')
+    parser.add_argument('--json', metavar='PATH', help='write the results to a JSON file.')
+    parser.add_argument('--compare', metavar='PATH', help='show times relative to an earlier JSON run.')
+    args = parser.parse_args(argv)
+
+    records = []
+    for num_tasks in args.tasks:
+        shape = WorkspaceShape(
+            tasks=num_tasks,
+            max_depth=args.max_depth,
+            completed_ratio=args.completed_ratio,
+            date_marker_ratio=args.date_marker_ratio,
+            seed=args.seed,
+        )
+        records.extend(run_size(shape, set(args.phases), args.repeat, not args.no_memory))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+    print_records(records, baseline)
+
+    if args.json:
+        report = {'run': run_metadata(), 'args': vars(args), 'results': records}
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Wrote {args.json}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
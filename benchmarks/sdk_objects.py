@@ -0,0 +1,61 @@
+"""Build Todoist SDK model objects for benchmarks without calling the API."""
+
+from datetime import datetime, timezone
+
+from todoist_api_python.models import Project, Section, Task
+
+_CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_project(id, name, order=0, is_inbox_project=False):
+    return Project(
+        id=id,
+        name=name,
+        description='',
+        order=order,
+        color='charcoal',
+        is_collapsed=False,
+        is_shared=False,
+        is_favorite=False,
+        is_archived=False,
+        can_assign_tasks=False,
+        view_style='list',
+        created_at=_CREATED_AT,
+        updated_at=_CREATED_AT,
+        is_inbox_project=is_inbox_project,
+    )
+
+
+def make_section(id, name, project_id, order=0):
+    return Section(
+        id=id,
+        name=name,
+        project_id=project_id,
+        is_collapsed=False,
+        order=order,
+    )
+
+
+def make_task(id, content, project_id, section_id=None, parent_id=None,
+              labels=None, order=0, due=None, description='', completed_at=None):
+    return Task(
+        id=id,
+        content=content,
+        description=description,
+        project_id=project_id,
+        section_id=section_id,
+        parent_id=parent_id,
+        labels=list(labels or []),
+        priority=1,
+        due=due,
+        deadline=None,
+        duration=None,
+        is_collapsed=False,
+        order=order,
+        assignee_id=None,
+        assigner_id=None,
+        completed_at=completed_at,
+        creator_id='1',
+        created_at=_CREATED_AT,
+        updated_at=_CREATED_AT,
+    )
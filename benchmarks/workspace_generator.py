@@ -0,0 +1,166 @@
+"""Seeded generator of realistic synthetic Todoist workspaces.
+
+`generate_workspace` returns a `WorkspaceSnapshot` for planner benchmarks,
+and `to_sdk_objects` turns it into Todoist SDK models for benchmarks that go
+through `autodoist_magic`. The same shape and seed always give the same
+workspace.
+"""
+
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+
+from todoist_api_python.models import Due
+
+from benchmarks.sdk_objects import make_project, make_section, make_task
+from next_action_planner import ProjectSnapshot, SectionSnapshot, TaskSnapshot, WorkspaceSnapshot
+
+_COMPLETED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# Relative weights of the name suffixes the planner understands
+DEFAULT_SUFFIX_MIX = {'': 6, ' -': 2, ' =': 2, ' --': 1, ' =-': 1, ' -=': 1, ' ===': 1}
+
+
+@dataclass(frozen=True)
+class WorkspaceShape:
+    """Size and content mix of a generated workspace."""
+
+    tasks: int = 10_000
+    projects: int | None = None
+    sections_per_project: int = 4
+    max_depth: int = 3
+    subtask_ratio: float = 0.6
+    suffix_mix: dict = field(default_factory=lambda: dict(DEFAULT_SUFFIX_MIX))
+    suffix_ratio: float = 0.3
+    date_marker_ratio: float = 0.05
+    due_ratio: float = 0.3
+    completed_ratio: float = 0.05
+    header_ratio: float = 0.02
+    labeled_ratio: float = 0.3
+    label: str = 'next_action'
+    today: date = date(2026, 1, 15)
+    seed: int = 0
+
+    @property
+    def project_count(self):
+        if self.projects is not None:
+            return self.projects
+        return max(1, self.tasks // 500)
+
+
+def generate_workspace(shape):
+    rng = random.Random(shape.seed)
+    suffixes = list(shape.suffix_mix)
+    weights = list(shape.suffix_mix.values())
+
+    def suffix():
+        return rng.choices(suffixes, weights)[0]
+
+    projects = tuple(
+        ProjectSnapshot(
+            id=f'p{index}',
+            name='Inbox' if index == 0 else f'Project {index}{suffix()}',
+            order=index,
+            is_inbox_project=index == 0,
+        )
+        for index in range(shape.project_count)
+    )
+    sections = tuple(
+        SectionSnapshot(
+            id=f's{project.id}_{index}',
+            name=f'Section {index}{suffix()}',
+            project_id=project.id,
+            order=index,
+        )
+        for project in projects
+        for index in range(rng.randint(0, shape.sections_per_project * 2))
+    )
+    section_ids = {project.id: [None] for project in projects}
+    for section in sections:
+        section_ids[section.project_id].append(section.id)
+
+    tasks = []
+    # Open task trees as (task, depth), so sub-tasks can attach below them
+    parents = []
+    for index in range(shape.tasks):
+        parent, depth = None, 0
+        if parents and rng.random() < shape.subtask_ratio:
+            parent, depth = parents[rng.randrange(len(parents))]
+            depth += 1
+        if parent is None:
+            project_id = projects[rng.randrange(len(projects))].id
+            section_id = rng.choice(section_ids[project_id])
+        else:
+            project_id, section_id = parent.project_id, parent.section_id
+
+        task = _generate_task(rng, shape, index, project_id, section_id, parent, suffix)
+        tasks.append(task)
+        if depth < shape.max_depth:
+            parents.append((task, depth))
+        # Keep recently created trees open, like real projects do
+        if len(parents) > 64:
+            parents.pop(rng.randrange(len(parents)))
+
+    return WorkspaceSnapshot(projects=projects, sections=sections, tasks=tuple(tasks))
+
+
+def _generate_task(rng, shape, index, project_id, section_id, parent, suffix):
+    is_header = rng.random() < shape.header_ratio
+    content = f'* Header {index}' if is_header else f'Task {index}'
+    if rng.random() < shape.suffix_ratio:
+        content += suffix()
+    if rng.random() < shape.date_marker_ratio:
+        if rng.random() < 0.5:
+            start = shape.today + timedelta(days=rng.randint(-30, 30))
+            content += f' start={start:%d-%m-%Y}'
+        else:
+            content += f' start=due-{rng.randint(0, 4)}{rng.choice("dw")}'
+
+    due_date = None
+    if rng.random() < shape.due_ratio:
+        due_date = shape.today + timedelta(days=rng.randint(-10, 60))
+
+    return TaskSnapshot(
+        id=f't{index}',
+        content=content,
+        project_id=project_id,
+        section_id=section_id,
+        parent_id=parent.id if parent is not None else None,
+        labels=(shape.label,) if rng.random() < shape.labeled_ratio else (),
+        order=rng.randint(0, 200),
+        is_completed=rng.random() < shape.completed_ratio,
+        due_date=due_date,
+        is_header=is_header,
+        description='',
+    )
+
+
+def to_sdk_objects(workspace):
+    """Return Todoist SDK projects, sections and tasks for a workspace snapshot."""
+    projects = [
+        make_project(project.id, project.name, order=project.order,
+                     is_inbox_project=project.is_inbox_project)
+        for project in workspace.projects
+    ]
+    sections = [
+        make_section(section.id, section.name, section.project_id, order=section.order)
+        for section in workspace.sections
+    ]
+    tasks = [
+        make_task(
+            task.id,
+            task.content,
+            task.project_id,
+            section_id=task.section_id,
+            parent_id=task.parent_id,
+            labels=task.labels,
+            order=task.order,
+            due=Due(date=task.due_date, string=task.due_date.isoformat())
+            if task.due_date is not None else None,
+            description=task.description,
+            completed_at=_COMPLETED_AT if task.is_completed else None,
+        )
+        for task in workspace.tasks
+    ]
+    return projects, sections, tasks
+
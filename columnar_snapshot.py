@@ -0,0 +1,648 @@
+"""Column-oriented workspace snapshot and planner for very large accounts.
+
+`WorkspaceSnapshot` keeps one frozen `TaskSnapshot` per task, and the planner
+keys its lookups and label tuples by task id. With 100k+ tasks those small
+objects add up. `ColumnarWorkspaceSnapshot` stores the same tasks as columns
+instead:
+
+- task ids are interned, and a task's row number is its integer index
+- project and section ids are interned into integer indexes as well
+- order, parent, project, section and due date are `array` columns
+- completion and header flags share one byte per task
+- labels are bitsets over a label dictionary
+
+Projects and sections stay plain snapshot tuples, since there are few of them.
+`plan_columnar_next_action_labels` plans straight from the columns: the task
+trees, sections and label decisions are kept per row number, and only the
+tasks whose labels change are turned back into label tuples. It returns the
+same `PlanningResult` as `plan_next_action_labels` for the same workspace.
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date
+
+import next_action_planner
+from next_action_planner import (
+    LabelChange,
+    LabelStrategy,
+    PlannerStats,
+    PlanningResult,
+    ProjectSnapshot,
+    RecordProjectStrategy,
+    RecordSectionStrategy,
+    RecordTaskStrategy,
+    SectionSnapshot,
+    SelectionStrategy,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    label_strategy_parser_for,
+    stats_phase,
+)
+# The columnar planner makes the same decisions as the row planner, so it
+# shares the row planner's helpers instead of copying them
+from next_action_planner import (
+    _child_selection,
+    _date_filter_rows,
+    _dominant_strategy,
+    _earliest_decision_date,
+    _inactive_relative_marker_description_changes_of,
+    _parentless_label_decision,
+    _record_parent_strategy,
+    _sections_for_project,
+    _strategy_metadata_commands,
+    _vectorized_date_filter_rows,
+    _with_label,
+    _without_label,
+)
+
+NO_INDEX = -1
+# Parent column value of a sub-task whose parent is not in the snapshot
+MISSING_PARENT = -2
+NO_DATE = 0
+
+_COMPLETED = 1
+_HEADER = 2
+
+# How the planner changed a task's labels, relative to the labels it has
+_ORIGINAL = 0
+_REMOVED = 1
+_APPENDED = 2
+
+
+class _Interner:
+    """Maps ids to dense integer indexes and back.
+
+    Equal ids share one string object. The reverse lookup is only needed
+    while a snapshot is built, so `freeze` drops it and `find` rebuilds it
+    on demand.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._indexes = {}
+
+    def index(self, value):
+        if value is None:
+            return NO_INDEX
+        index = self._indexes.get(value)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self._indexes[value] = index
+        return index
+
+    def freeze(self):
+        self._indexes = None
+
+    def find(self, value):
+        if self._indexes is None:
+            self._indexes = {value: index for index, value in enumerate(self.values)}
+        return self._indexes.get(value, NO_INDEX)
+
+    def value(self, index):
+        if index == NO_INDEX:
+            return None
+        return self.values[index]
+
+
+class LabelDictionary:
+    """Numbers label names so a set of labels fits in one integer bitset."""
+
+    def __init__(self):
+        self._labels = _Interner()
+
+    @property
+    def names(self):
+        return tuple(self._labels.values)
+
+    def encode(self, labels):
+        bits = 0
+        for label in labels:
+            bits |= 1 << self._labels.index(label)
+        return bits
+
+    def decode(self, bits):
+        labels = []
+        index = 0
+        while bits:
+            if bits & 1:
+                labels.append(self._labels.values[index])
+            bits >>= 1
+            index += 1
+        return tuple(labels)
+
+    def bit(self, label):
+        index = self._labels.find(label)
+        return 0 if index == NO_INDEX else 1 << index
+
+
+class ColumnarWorkspaceSnapshot:
+    """A workspace snapshot whose tasks are stored column by column.
+
+    Built in one pass over any iterable of task rows with the attributes of
+    `TaskSnapshot`. Task rows come back as `TaskSnapshot` values equal to the
+    ones the snapshot was built from, in the same order, including label order.
+    """
+
+    def __init__(self, projects=(), sections=(), tasks=()):
+        self.projects = tuple(projects)
+        self.sections = tuple(sections)
+        self.labels = LabelDictionary()
+
+        self._task_ids = _Interner()
+        self._ids = _Interner()
+        self._project_index = array('i', (self._ids.index(project.id) for project in self.projects))
+        self._section_index = array('i', (self._ids.index(section.id) for section in self.sections))
+
+        self._content = []
+        self._description = []
+        self._project = array('i')
+        self._section = array('i')
+        self._parent = array('i')
+        self._order = array('q')
+        self._due = array('i')
+        self._flags = bytearray()
+        # Falls back to a list of Python ints past 64 distinct labels
+        self._label_bits = array('Q')
+        # Label tuples that a bitset cannot reproduce, because of their order
+        # or repeated labels, are kept as they are
+        self._label_overrides = {}
+        # Parents can come after their children, so they are resolved at the end
+        parent_ids = []
+
+        for row, task in enumerate(tasks):
+            if self._task_ids.index(task.id) != row:
+                raise ValueError('Task ids in a workspace snapshot must be unique')
+            parent_ids.append(task.parent_id)
+            self._append(row, task)
+
+        self._missing_parents = {}
+        for row, parent_id in enumerate(parent_ids):
+            parent = self._task_ids.find(parent_id) if parent_id is not None else NO_INDEX
+            if parent_id is not None and parent == NO_INDEX:
+                parent = MISSING_PARENT
+                self._missing_parents[row] = parent_id
+            self._parent.append(parent)
+        self._task_ids.freeze()
+        self._ids.freeze()
+
+    @classmethod
+    def from_snapshot(cls, workspace):
+        return cls(workspace.projects, workspace.sections, workspace.tasks)
+
+    def to_snapshot(self):
+        return WorkspaceSnapshot(
+            projects=self.projects,
+            sections=self.sections,
+            tasks=tuple(self._iter_tasks()),
+        )
+
+    @property
+    def tasks(self):
+        return TaskRows(self)
+
+    def __len__(self):
+        return len(self._content)
+
+    def row_of(self, task_id):
+        """Return the row number of a task id, or -1 if it is not in the snapshot."""
+        return self._task_ids.find(task_id)
+
+    def task_id(self, row):
+        return self._task_ids.values[row]
+
+    def task(self, row):
+        return self._task_snapshot(
+            row, self._content[row], self._description[row], self._project[row], self._section[row],
+            self._parent[row], self._order[row], self._due[row], self._flags[row], self.task_labels(row))
+
+    def task_labels(self, row):
+        labels = self._label_overrides.get(row)
+        if labels is None:
+            labels = self.labels.decode(self._label_bits[row])
+        return labels
+
+    def due_dates(self):
+        """Return the due date of every task, or None, in row order."""
+        return [date.fromordinal(due) if due != NO_DATE else None for due in self._due]
+
+    def rows_with_label(self, label):
+        """Return the row numbers of tasks that carry a label."""
+        bit = self.labels.bit(label)
+        return [row for row, bits in enumerate(self._label_bits) if bits & bit]
+
+    def _iter_tasks(self):
+        # Walks all columns at once, which is cheaper than one task() per row
+        # Few label combinations repeat across many tasks, so decode each once
+        decoded = {}
+        overrides = self._label_overrides
+        columns = zip(
+            self._content, self._description, self._project, self._section,
+            self._parent, self._order, self._due, self._flags, self._label_bits,
+        )
+        for row, (content, description, project, section, parent, order, due, flags, bits) in enumerate(columns):
+            labels = overrides.get(row)
+            if labels is None:
+                labels = decoded.get(bits)
+                if labels is None:
+                    labels = decoded[bits] = self.labels.decode(bits)
+            yield self._task_snapshot(
+                row, content, description, project, section, parent, order, due, flags, labels)
+
+    def _task_snapshot(self, row, content, description, project, section, parent, order, due, flags, labels):
+        if parent == MISSING_PARENT:
+            parent_id = self._missing_parents[row]
+        else:
+            parent_id = self._task_ids.value(parent)
+        return TaskSnapshot(
+            id=self._task_ids.values[row],
+            content=content,
+            project_id=self._ids.value(project),
+            section_id=self._ids.value(section),
+            parent_id=parent_id,
+            labels=labels,
+            order=order,
+            is_completed=bool(flags & _COMPLETED),
+            due_date=date.fromordinal(due) if due != NO_DATE else None,
+            is_header=bool(flags & _HEADER),
+            description=description,
+        )
+
+    def _append(self, row, task):
+        self._content.append(task.content)
+        self._description.append(task.description)
+        self._project.append(self._ids.index(task.project_id))
+        self._section.append(self._ids.index(task.section_id))
+        self._order.append(task.order)
+        self._due.append(task.due_date.toordinal() if task.due_date is not None else NO_DATE)
+        self._flags.append(
+            (_COMPLETED if task.is_completed else 0) | (_HEADER if task.is_header else 0))
+
+        labels = tuple(task.labels)
+        bits = self.labels.encode(labels)
+        try:
+            self._label_bits.append(bits)
+        except OverflowError:
+            self._label_bits = list(self._label_bits)
+            self._label_bits.append(bits)
+        if self.labels.decode(bits) != labels:
+            self._label_overrides[row] = labels
+
+
+class TaskRows(Sequence):
+    """Read-only sequence of the task rows of a columnar snapshot."""
+
+    __slots__ = ('_snapshot',)
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return tuple(self._snapshot.task(index) for index in range(*row.indices(len(self))))
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('task row out of range')
+        return self._snapshot.task(row)
+
+    def __iter__(self):
+        return self._snapshot._iter_tasks()
+
+
+@dataclass(frozen=True, slots=True)
+class ColumnarWorkspaceIndex:
+    """Lookups and sorted orders of one columnar snapshot, by row number.
+
+    The columnar counterpart of `WorkspaceIndex`. Projects and sections come
+    with their interned index, tasks are row numbers sorted by their Todoist
+    order, and task strategies are a list in row order.
+    """
+
+    projects: tuple[tuple[ProjectSnapshot, int], ...]
+    sections_by_index: Mapping[int, SectionSnapshot]
+    sections_by_project: Mapping[str, tuple[tuple[SectionSnapshot, int], ...]]
+    rows_by_section: Mapping[tuple[int, int], list[int]]
+    children_by_row: Mapping[int, list[int]]
+    root_rows: tuple[int, ...]
+    project_strategies: Mapping[str, LabelStrategy | None]
+    section_strategies: Mapping[str, LabelStrategy | None]
+    task_strategies: list[LabelStrategy | None]
+
+
+def build_columnar_workspace_index(workspace, config, parser=None):
+    if parser is None:
+        parser = label_strategy_parser_for(config)
+    ids = workspace._ids.values
+    project_index = {project.id: index for project, index in zip(workspace.projects, workspace._project_index)}
+    projects_by_id = {project.id: project for project in workspace.projects}
+
+    rows_by_order = sorted(range(len(workspace)), key=workspace._order.__getitem__)
+    rows_by_section = {}
+    children_by_row = {}
+    root_rows = []
+    project_column = workspace._project
+    section_column = workspace._section
+    parent_column = workspace._parent
+    for row in rows_by_order:
+        rows_by_section.setdefault((project_column[row], section_column[row]), []).append(row)
+        parent = parent_column[row]
+        if parent >= 0:
+            children_by_row.setdefault(parent, []).append(row)
+        elif parent == NO_INDEX:
+            root_rows.append(row)
+
+    sections_by_project = {}
+    for section in workspace.sections:
+        sections_by_project.setdefault(section.project_id, []).append(section)
+    section_indexes = dict(zip((section.id for section in workspace.sections), workspace._section_index))
+    sectionless = {
+        (ids[project], None)
+        for project, section in rows_by_section
+        if section == NO_INDEX and project != NO_INDEX
+    }
+
+    return ColumnarWorkspaceIndex(
+        projects=tuple(
+            (project, project_index[project.id])
+            for project in sorted(projects_by_id.values(), key=lambda item: item.order)
+        ),
+        sections_by_index={
+            index: section
+            for section, index in zip(workspace.sections, workspace._section_index)
+            if section.id is not None
+        },
+        sections_by_project={
+            project.id: tuple(
+                (section, section_indexes.get(section.id, NO_INDEX))
+                for section in sorted(
+                    _sections_for_project(project, sections_by_project.get(project.id, ()), sectionless),
+                    key=lambda item: item.order,
+                )
+            )
+            for project in projects_by_id.values()
+        },
+        rows_by_section=rows_by_section,
+        children_by_row=children_by_row,
+        root_rows=tuple(root_rows),
+        project_strategies={
+            project.id: parser.parse(project.name, 3)
+            for project in workspace.projects
+        },
+        section_strategies={
+            section.id: parser.parse(section.name, 2)
+            for section in workspace.sections
+            if section.id is not None
+        },
+        task_strategies=[parser.parse(content, 1) for content in workspace._content],
+    )
+
+
+class _LabelPlan:
+    """Where the planner wants the next action label, one byte per row."""
+
+    def __init__(self, workspace, label):
+        self.state = bytearray(len(workspace))
+        bit = workspace.labels.bit(label)
+        self.original = bytearray(1 if bits & bit else 0 for bits in workspace._label_bits)
+
+    def has(self, row):
+        state = self.state[row]
+        return state == _APPENDED or (state == _ORIGINAL and self.original[row] == 1)
+
+    def add(self, row):
+        # Adding a label the task already has keeps its labels as they are
+        if not self.has(row):
+            self.state[row] = _APPENDED
+
+    def remove(self, row):
+        self.state[row] = _REMOVED
+
+    def labels(self, workspace, row, label):
+        """Return the planned labels of a row, or None if they do not change."""
+        state = self.state[row]
+        if state == _ORIGINAL or (state == _REMOVED and not self.original[row]):
+            return None
+        labels = workspace.task_labels(row)
+        planned = _without_label(labels, label)
+        if state == _APPENDED:
+            planned = _with_label(planned, label)
+        return planned if planned != labels else None
+
+
+def plan_columnar_next_action_labels(workspace, config, metadata):
+    """`plan_next_action_labels` for a `ColumnarWorkspaceSnapshot`, reading its columns."""
+    label = config.next_action_label
+    stats = PlannerStats(tasks=len(workspace)) if config.collect_stats else None
+    parser = label_strategy_parser_for(config)
+    parses_before = parser.cache_info().misses if stats is not None else 0
+
+    with stats_phase(stats, 'index'):
+        index = build_columnar_workspace_index(workspace, config, parser)
+    plan = _LabelPlan(workspace, label)
+    with stats_phase(stats, 'root_selection'):
+        metadata_commands = dict.fromkeys(_plan_parentless_rows(workspace, index, metadata, plan))
+    with stats_phase(stats, 'child_propagation'):
+        tree_tasks_visited = _propagate_child_rows(workspace, index, metadata, metadata_commands, plan)
+
+    flags = workspace._flags
+    with stats_phase(stats, 'eligibility'):
+        for row, row_flags in enumerate(flags):
+            if row_flags:
+                plan.remove(row)
+    due_dates = workspace.due_dates()
+    with stats_phase(stats, 'date_filters'):
+        _apply_columnar_date_filters(workspace, index, due_dates, config, plan)
+    with stats_phase(stats, 'next_decision'):
+        decision_date = _earliest_decision_date(zip(workspace._content, due_dates), config)
+    with stats_phase(stats, 'descriptions'):
+        description_changes = _inactive_relative_marker_description_changes_of(
+            zip(workspace._task_ids.values, workspace._content, due_dates, workspace._description),
+            config.dateformat,
+        )
+
+    with stats_phase(stats, 'label_changes'):
+        label_changes = []
+        changed_rows = []
+        for row in range(len(workspace)):
+            labels = plan.labels(workspace, row, label)
+            if labels is not None:
+                label_changes.append(LabelChange(task_id=workspace.task_id(row), labels=labels))
+                changed_rows.append(row)
+
+    if stats is not None:
+        stats.tree_tasks_visited = tree_tasks_visited
+        stats.strategies_parsed = parser.cache_info().misses - parses_before
+        for row, change in zip(changed_rows, label_changes):
+            had_label = plan.original[row] == 1
+            has_label = label in change.labels
+            if has_label and not had_label:
+                stats.labels_added += 1
+            elif had_label and not has_label:
+                stats.labels_removed += 1
+        stats.metadata_commands = len(metadata_commands)
+        stats.description_changes = len(description_changes)
+
+    return PlanningResult(
+        label_changes=tuple(label_changes),
+        description_changes=tuple(description_changes),
+        metadata_commands=tuple(metadata_commands),
+        next_decision_date=decision_date,
+        stats=stats,
+    )
+
+
+def _plan_parentless_rows(workspace, index, metadata, plan):
+    task_ids = workspace._task_ids.values
+    parent_column = workspace._parent
+    flags = workspace._flags
+    metadata_commands = []
+    metadata_commands.extend(_strategy_metadata_commands(
+        index.project_strategies, metadata.project_strategies, RecordProjectStrategy))
+    metadata_commands.extend(_strategy_metadata_commands(
+        index.section_strategies, metadata.section_strategies, RecordSectionStrategy))
+    metadata_commands.extend(_strategy_metadata_commands(
+        {
+            task_ids[row]: index.task_strategies[row]
+            for row in range(len(workspace))
+            if parent_column[row] == NO_INDEX
+        },
+        metadata.task_strategies,
+        RecordTaskStrategy,
+    ))
+
+    for project, project_index in index.projects:
+        if project.is_inbox_project:
+            continue
+
+        first_project_section_seen = False
+        project_strategy = index.project_strategies.get(project.id)
+
+        for section, section_index in index.sections_by_project[project.id]:
+            section_rows = index.rows_by_section.get((project_index, section_index), ())
+            section_strategy = index.section_strategies.get(section.id)
+            first_section_task_seen = False
+
+            for row in section_rows:
+                if parent_column[row] != NO_INDEX or flags[row] & _COMPLETED:
+                    continue
+
+                is_header = bool(flags[row] & _HEADER)
+                should_have_label = _parentless_label_decision(
+                    is_header=is_header,
+                    dominant_strategy=_dominant_strategy(
+                        index.task_strategies[row], section_strategy, project_strategy),
+                    section_labeling_disabled=section.is_labeling_disabled,
+                    first_project_section_seen=first_project_section_seen,
+                    first_section_task_seen=first_section_task_seen,
+                )
+                if should_have_label:
+                    plan.add(row)
+                elif should_have_label is not None:
+                    plan.remove(row)
+
+                if not section.is_labeling_disabled and not is_header:
+                    first_section_task_seen = True
+
+            if section_rows:
+                first_project_section_seen = True
+
+    return metadata_commands
+
+
+def _propagate_child_rows(workspace, index, metadata, metadata_commands, plan):
+    ids = workspace._ids.values
+    task_ids = workspace._task_ids.values
+    flags = workspace._flags
+    children_by_row = index.children_by_row
+    task_strategies = index.task_strategies
+    visited = 0
+
+    for root in index.root_rows:
+        if flags[root]:
+            continue
+        section_index = workspace._section[root]
+        section = index.sections_by_index.get(section_index)
+        if section is not None and section.is_labeling_disabled:
+            continue
+        project_index = workspace._project[root]
+        dominant_strategy = _dominant_strategy(
+            task_strategies[root],
+            index.section_strategies.get(ids[section_index] if section_index != NO_INDEX else None),
+            index.project_strategies.get(ids[project_index] if project_index != NO_INDEX else None),
+        )
+
+        # Same depth-first walk as the row planner's `_propagate_child_labels`
+        stack = [(root, _child_selection(dominant_strategy))]
+        while stack:
+            row, inherited_strategy = stack.pop()
+            visited += 1
+            children = children_by_row.get(row)
+            if not children:
+                continue
+
+            child_strategy = _child_selection(task_strategies[row]) or inherited_strategy
+            if child_strategy is None:
+                continue
+
+            eligible_children = [child for child in children if not flags[child]]
+            for child in eligible_children:
+                _record_parent_strategy(task_ids[child], child_strategy, metadata, metadata_commands)
+
+            parent_has_label = plan.has(row)
+            if child_strategy == SelectionStrategy.SEQUENTIAL:
+                for child in eligible_children:
+                    plan.remove(child)
+                if parent_has_label and eligible_children:
+                    plan.add(eligible_children[0])
+                    plan.remove(row)
+
+            elif child_strategy == SelectionStrategy.PARALLEL and parent_has_label:
+                plan.remove(row)
+                for child in eligible_children:
+                    plan.add(child)
+
+            stack.extend((child, child_strategy) for child in reversed(eligible_children))
+
+    return visited
+
+
+def _apply_columnar_date_filters(workspace, index, due_dates, config, plan):
+    today = config.today or date.today()
+    np = next_action_planner.np
+    if np is not None and len(workspace) >= next_action_planner.VECTORIZED_DATE_FILTER_MIN_TASKS:
+        future_start_rows, hidden_rows = _vectorized_date_filter_rows(
+            workspace._content, np.asarray(workspace._due), config, today)
+    else:
+        future_start_rows, hidden_rows = _date_filter_rows(zip(workspace._content, due_dates), config, today)
+
+    # Both filters only remove the label, so the order they run in does not matter
+    children_by_row = index.children_by_row
+    for row in future_start_rows:
+        stack = [row]
+        while stack:
+            row = stack.pop()
+            plan.remove(row)
+            stack.extend(children_by_row.get(row, ()))
+    for row in hidden_rows:
+        plan.remove(row)
+
+
+class ColumnarPlanner:
+    """Plans every sync loop from a columnar snapshot and keeps the last result.
+
+    Unlike `IncrementalPlanner` it keeps no previous workspace between loops,
+    so it replans every project on every loop.
+    """
+
+    def __init__(self):
+        self.last_result = None
+
+    def plan(self, workspace, config, metadata):
+        self.last_result = plan_columnar_next_action_labels(workspace, config, metadata)
+        return self.last_result
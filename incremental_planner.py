@@ -0,0 +1,245 @@
+"""Next-action planning that only replans the projects that changed.
+
+Every planning decision of `plan_next_action_labels` depends on one project
+only: sequential selection is decided within a project and its sections, and
+labels propagate down task trees that never leave their project. Sub-tasks
+and sections always belong to the project of their parent, as in Todoist.
+
+`plan_incrementally` therefore compares the new workspace and metadata with
+those of the previous plan, replans only the affected projects with the full
+planner, and keeps the previous decisions for every other project. The result
+is merged back into the order the full planner produces, so both give equal
+`PlanningResult` values.
+"""
+
+from dataclasses import dataclass, replace
+from datetime import date
+
+from next_action_planner import (
+    PlannerStats,
+    PlanningResult,
+    RecordProjectStrategy,
+    RecordSectionStrategy,
+    RecordTaskParentStrategy,
+    RecordTaskStrategy,
+    WorkspaceSnapshot,
+    next_decision_date,
+    plan_next_action_labels,
+    stats_phase,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class PlanningState:
+    """Everything one plan was made from, together with its result."""
+
+    workspace: WorkspaceSnapshot
+    config: object
+    metadata: object
+    result: PlanningResult
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotDelta:
+    """Projects whose planning input changed since the previous plan.
+
+    `project_ids` is None when everything has to be replanned, for example
+    after a configuration change or on a new day.
+    """
+
+    project_ids: frozenset | None
+
+    @property
+    def replans_everything(self):
+        return self.project_ids is None
+
+
+def diff_planning_input(previous, workspace, config, metadata):
+    """Return which projects need a new plan compared to the previous state."""
+    if previous is None or previous.config != config:
+        return SnapshotDelta(project_ids=None)
+
+    affected = set()
+    previous_workspace = previous.workspace
+
+    previous_projects = {project.id: project for project in previous_workspace.projects}
+    for project in workspace.projects:
+        if previous_projects.pop(project.id, None) != project:
+            affected.add(project.id)
+    affected.update(previous_projects)
+
+    previous_sections = {section.id: section for section in previous_workspace.sections}
+    section_projects = {}
+    for section in workspace.sections:
+        section_projects.setdefault(section.id, set()).add(section.project_id)
+        previous_section = previous_sections.pop(section.id, None)
+        if previous_section != section:
+            affected.add(section.project_id)
+            if previous_section is not None:
+                affected.add(previous_section.project_id)
+    for section in previous_sections.values():
+        affected.add(section.project_id)
+
+    previous_tasks = {task.id: task for task in previous_workspace.tasks}
+    task_projects = {}
+    for task in workspace.tasks:
+        task_projects.setdefault(task.id, set()).add(task.project_id)
+        previous_task = previous_tasks.pop(task.id, None)
+        if previous_task != task:
+            affected.add(task.project_id)
+            if previous_task is not None:
+                affected.add(previous_task.project_id)
+    for task in previous_tasks.values():
+        affected.add(task.project_id)
+
+    # Stored strategies decide which metadata commands are planned
+    project_projects = {project.id: {project.id} for project in workspace.projects}
+    for current, stored, projects_of in (
+        (metadata.project_strategies, previous.metadata.project_strategies, project_projects),
+        (metadata.section_strategies, previous.metadata.section_strategies, section_projects),
+        (metadata.task_strategies, previous.metadata.task_strategies, task_projects),
+        (metadata.task_parent_strategies, previous.metadata.task_parent_strategies, task_projects),
+    ):
+        for item_id, project_ids in projects_of.items():
+            if current.get(item_id) != stored.get(item_id):
+                affected.update(project_ids)
+
+    return SnapshotDelta(project_ids=frozenset(affected))
+
+
+def plan_incrementally(previous, workspace, config, metadata):
+    """Plan next-action labels, reusing the previous plan for unchanged projects.
+
+    Returns the new `PlanningState` and the `SnapshotDelta` that was replanned.
+    With `config.collect_stats` the result's stats cover the replanned
+    projects, plus the time spent diffing and merging.
+    """
+    # Date filters depend on today, so pin it to compare plans across loops
+    config = replace(config, today=config.today or date.today())
+    stats = PlannerStats() if config.collect_stats else None
+    with stats_phase(stats, 'diff'):
+        delta = diff_planning_input(previous, workspace, config, metadata)
+
+    if delta.replans_everything:
+        result = plan_next_action_labels(workspace, config, metadata)
+        return PlanningState(workspace, config, metadata, _with_stats(result, stats)), delta
+
+    if not delta.project_ids:
+        result = previous.result if stats is None else replace(previous.result, stats=stats)
+        return PlanningState(workspace, config, metadata, result), delta
+
+    affected = delta.project_ids
+    sub_workspace = WorkspaceSnapshot(
+        projects=tuple(project for project in workspace.projects if project.id in affected),
+        sections=tuple(section for section in workspace.sections if section.project_id in affected),
+        tasks=tuple(task for task in workspace.tasks if task.project_id in affected),
+    )
+    replanned = plan_next_action_labels(sub_workspace, config, metadata)
+    stats = _with_stats(replanned, stats).stats
+    with stats_phase(stats, 'merge'):
+        kept = _unaffected_result(previous, affected)
+        result = _merge_results(workspace, kept, replanned)
+        # The earliest date can sit in any project, so it is not merged
+        result = replace(result, next_decision_date=next_decision_date(workspace.tasks, config))
+
+    return PlanningState(workspace, config, metadata, replace(result, stats=stats)), delta
+
+
+class IncrementalPlanner:
+    """Keeps the previous plan between sync loops and plans incrementally."""
+
+    def __init__(self):
+        self._state = None
+        self.last_delta = None
+
+    def plan(self, workspace, config, metadata):
+        self._state, self.last_delta = plan_incrementally(
+            self._state, workspace, config, metadata)
+        return self._state.result
+
+    @property
+    def last_result(self):
+        return self._state.result if self._state is not None else None
+
+    def reset(self):
+        self._state = None
+        self.last_delta = None
+
+
+def _with_stats(result, stats):
+    # Puts the incremental phases in front of the planner's own phases
+    if stats is None:
+        return result
+    result.stats.phase_seconds = {**stats.phase_seconds, **result.stats.phase_seconds}
+    return result
+
+
+def _unaffected_result(previous, affected):
+    workspace = previous.workspace
+    project_of_section = {section.id: section.project_id for section in workspace.sections}
+    project_of_task = {task.id: task.project_id for task in workspace.tasks}
+
+    def command_project(command):
+        if isinstance(command, RecordProjectStrategy):
+            return command.project_id
+        if isinstance(command, RecordSectionStrategy):
+            return project_of_section.get(command.section_id)
+        return project_of_task.get(command.task_id)
+
+    result = previous.result
+    return PlanningResult(
+        label_changes=tuple(
+            change for change in result.label_changes
+            if project_of_task.get(change.task_id) not in affected
+        ),
+        description_changes=tuple(
+            change for change in result.description_changes
+            if project_of_task.get(change.task_id) not in affected
+        ),
+        metadata_commands=tuple(
+            command for command in result.metadata_commands
+            if command_project(command) not in affected
+        ),
+    )
+
+
+def _merge_results(workspace, kept, replanned):
+    project_positions = {project.id: position for position, project in enumerate(workspace.projects)}
+    section_positions = {section.id: position for position, section in enumerate(workspace.sections)}
+    task_positions = {task.id: position for position, task in enumerate(workspace.tasks)}
+    tasks_by_id = {task.id: task for task in workspace.tasks}
+
+    def by_task_position(change):
+        return task_positions[change.task_id]
+
+    # The full planner emits metadata commands by kind: project, section and
+    # parentless task strategies in workspace order, then parent strategies
+    # while walking task trees with their roots sorted by Todoist order.
+    def command_key(command):
+        if isinstance(command, RecordProjectStrategy):
+            return (0, project_positions[command.project_id])
+        if isinstance(command, RecordSectionStrategy):
+            return (1, section_positions[command.section_id])
+        if isinstance(command, RecordTaskStrategy):
+            return (2, task_positions[command.task_id])
+        if isinstance(command, RecordTaskParentStrategy):
+            root = _root_task(tasks_by_id, command.task_id)
+            return (3, root.order, task_positions[root.id])
+        raise TypeError(f'Unknown metadata command {command!r}')
+
+    # sorted() is stable, so commands of one task tree keep their walk order
+    return PlanningResult(
+        label_changes=tuple(sorted(
+            kept.label_changes + replanned.label_changes, key=by_task_position)),
+        description_changes=tuple(sorted(
+            kept.description_changes + replanned.description_changes, key=by_task_position)),
+        metadata_commands=tuple(sorted(
+            kept.metadata_commands + replanned.metadata_commands, key=command_key)),
+    )
+
+
+def _root_task(tasks_by_id, task_id):
+    task = tasks_by_id[task_id]
+    while task.parent_id is not None:
+        task = tasks_by_id[task.parent_id]
+    return task
@@ -0,0 +1,96 @@
+"""Per-loop latency and API traffic measurements for the sync loop.
+
+`LoopTimings` splits one sync loop into consecutive phases. `ApiTrafficCounter`
+counts the Todoist API requests sent through a `requests.Session`. The sync
+loop logs both as one structured record per loop.
+"""
+
+import threading
+import time
+
+
+class LoopTimings:
+    """Wall-clock durations of the consecutive phases of one sync loop.
+
+    Every `lap` closes a phase: it adds the time since the previous lap to
+    the named phase, so calling it after each step covers the whole loop.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._started = clock()
+        self._last_lap = self._started
+        self.phase_seconds = {}
+        # Stats of this loop's plan, when the planner collected them
+        self.planner_stats = None
+        # Set when a temporary failure made the loop skip fetching and planning
+        self.skipped = False
+
+    def lap(self, name):
+        now = self._clock()
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + now - self._last_lap
+        self._last_lap = now
+
+    @property
+    def total_seconds(self):
+        return self._last_lap - self._started
+
+    def as_log_fields(self):
+        log_fields = {
+            f'phase_{name}_seconds': round(seconds, 6)
+            for name, seconds in self.phase_seconds.items()
+        }
+        log_fields['loop_seconds'] = round(self.total_seconds, 6)
+        return log_fields
+
+
+class ApiTrafficCounter:
+    """Counts requests and body bytes of a `requests.Session` through a response hook.
+
+    Requests can be sent from writer threads, so the totals are guarded by a lock.
+    """
+
+    def __init__(self, session=None):
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._request_bytes = 0
+        self._response_bytes = 0
+        if session is not None:
+            self.attach(session)
+
+    def attach(self, session):
+        session.hooks.setdefault('response', []).append(self._on_response)
+        return session
+
+    def totals(self):
+        """Return the (calls, request bytes, response bytes) sent so far."""
+        with self._lock:
+            return self._calls, self._request_bytes, self._response_bytes
+
+    def log_fields_since(self, totals):
+        """Return the traffic since an earlier `totals()` as flat log fields."""
+        calls, request_bytes, response_bytes = self.totals()
+        return {
+            'api_calls': calls - totals[0],
+            'api_request_bytes': request_bytes - totals[1],
+            'api_response_bytes': response_bytes - totals[2],
+        }
+
+    def _on_response(self, response, *args, **kwargs):
+        request_bytes = _body_size(response.request.body if response.request is not None else None)
+        response_bytes = len(response.content or b'')
+        with self._lock:
+            self._calls += 1
+            self._request_bytes += request_bytes
+            self._response_bytes += response_bytes
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    # Streamed bodies (files, generators) are not counted
+    return 0
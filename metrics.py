@@ -0,0 +1,276 @@
+"""Prometheus text-format metrics for the long-running sync loop.
+
+A small, dependency-free registry of counters, gauges and histograms, and an
+HTTP server that serves them from a daemon thread. Updates only take a lock
+and change a few numbers, so the sync loop never waits on a scrape longer
+than it takes to render the current values.
+"""
+
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+WRITE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Todoist API collections whose next path segment is an item id
+ID_COLLECTIONS = frozenset(('tasks', 'projects', 'sections', 'labels', 'comments'))
+# Fixed routes that can follow a collection name in place of an id
+COLLECTION_ROUTES = frozenset(('archived', 'completed', 'filter', 'quick', 'search', 'shared'))
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f'{self.name} needs labels {self.label_names}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.type_name}']
+        for key in sorted(self._values):
+            lines.extend(self._render_sample(key, self._values[key]))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('Counters can only increase')
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        self._values[key] = (counts, total + value)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = [
+            f'{self.name}_bucket{_format_labels(self.label_names, key, [("le", _format_value(bound))])} {count}'
+            for bound, count in zip(self.buckets, counts)
+        ]
+        labels = _format_labels(self.label_names, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        with self.lock:
+            lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return '\n'.join(lines) + '\n'
+
+
+class SyncLoopMetrics:
+    """The metrics Autodoist exposes about its sync loop and Todoist API traffic."""
+
+    def __init__(self, registry=None, clock=time.time):
+        self.registry = registry or MetricsRegistry()
+        self._clock = clock
+        registry = self.registry
+        self.loops = registry.counter(
+            'autodoist_sync_loops_total', 'Completed sync loops.')
+        self.skipped_loops = registry.counter(
+            'autodoist_skipped_sync_loops_total',
+            'Sync loops that skipped fetching and planning after a temporary Todoist failure.')
+        self.loop_duration = registry.histogram(
+            'autodoist_sync_loop_duration_seconds', 'Wall-clock duration of a sync loop.')
+        self.loop_phase_duration = registry.histogram(
+            'autodoist_sync_loop_phase_duration_seconds',
+            'Wall-clock duration of each sync loop phase.', ('phase',))
+        self.metadata_db_duration = registry.histogram(
+            'autodoist_metadata_db_duration_seconds',
+            'Time spent reading, writing and committing the metadata database per loop.')
+        self.planner_phase_duration = registry.histogram(
+            'autodoist_planner_phase_duration_seconds',
+            'Wall-clock duration of each next action planning phase.', ('phase',))
+        self.writes_per_loop = registry.histogram(
+            'autodoist_writes_per_loop', 'Changes committed to Todoist per sync loop.',
+            buckets=WRITE_BUCKETS)
+        self.api_requests = registry.counter(
+            'autodoist_api_requests_total', 'Todoist API requests by endpoint and status.',
+            ('method', 'endpoint', 'status'))
+        self.api_rate_limited = registry.counter(
+            'autodoist_api_rate_limited_total', 'Todoist API responses with status 429.')
+        self.rate_limit_wait = registry.counter(
+            'autodoist_rate_limit_wait_seconds_total',
+            'Time Todoist API requests waited for the client-side rate limiter.')
+        self.retry_queue_depth = registry.gauge(
+            'autodoist_write_retry_queue_depth', 'Failed task writes waiting to be retried.')
+        self.last_successful_loop = registry.gauge(
+            'autodoist_last_successful_loop_timestamp_seconds',
+            'Unix time at which the last sync loop that fetched and planned the workspace finished.')
+
+    def attach(self, session):
+        """Count every response of a `requests.Session`."""
+        session.hooks.setdefault('response', []).append(self._on_response)
+        return session
+
+    def observe_loop(self, loop_timings, changes):
+        with self.registry.lock:
+            self.loops.inc()
+            self.loop_duration.observe(loop_timings.total_seconds)
+            for phase, seconds in loop_timings.phase_seconds.items():
+                self.loop_phase_duration.observe(seconds, phase=phase)
+            self.metadata_db_duration.observe(sum(
+                seconds for phase, seconds in loop_timings.phase_seconds.items()
+                if phase.startswith('metadata_')
+            ))
+            planner_stats = loop_timings.planner_stats
+            if planner_stats is not None:
+                for phase, seconds in planner_stats.phase_seconds.items():
+                    self.planner_phase_duration.observe(seconds, phase=phase)
+            self.writes_per_loop.observe(changes)
+            if loop_timings.skipped:
+                self.skipped_loops.inc()
+            else:
+                self.last_successful_loop.set(self._clock())
+
+    def observe_rate_limit(self, wait_seconds, retries):
+        """Count the rate limiter's waiting, and the 429 responses it retried.
+
+        Retried responses never reach the session's response hooks.
+        """
+        with self.registry.lock:
+            self.rate_limit_wait.inc(wait_seconds)
+            self.api_rate_limited.inc(retries)
+
+    def observe_retry_queue(self, depth):
+        with self.registry.lock:
+            self.retry_queue_depth.set(depth)
+
+    def _on_response(self, response, *args, **kwargs):
+        request = response.request
+        method = request.method if request is not None else ''
+        with self.registry.lock:
+            self.api_requests.inc(
+                method=method,
+                endpoint=endpoint_of(response.url or ''),
+                status=response.status_code,
+            )
+            if response.status_code == 429:
+                self.api_rate_limited.inc()
+
+
+def endpoint_of(url):
+    """Return the path of a URL with item ids replaced, to keep label values bounded.
+
+    Ids are the segments that follow a collection name in `ID_COLLECTIONS`,
+    other than the fixed routes in `COLLECTION_ROUTES`.
+    """
+    path = url.split('://', 1)[-1]
+    path = path.split('/', 1)[1] if '/' in path else ''
+    path = path.split('?', 1)[0]
+    segments = path.split('/')
+    for index in range(1, len(segments)):
+        segment = segments[index]
+        if segments[index - 1] in ID_COLLECTIONS and segment and segment not in COLLECTION_ROUTES:
+            segments[index] = '{id}'
+    return '/' + '/'.join(segments)
+
+
+def start_metrics_server(registry, port, host='127.0.0.1'):
+    """Serve `registry` on http://host:port/metrics from a daemon thread and return the server."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(
+                'Metrics request: ' + format, *args,
+                extra={"component": "metrics", "operation": "scrape"})
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logging.info(
+        'Serving metrics on http://%s:%d/metrics', host, server.server_address[1],
+        extra={"component": "metrics", "operation": "start"})
+    return server
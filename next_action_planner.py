@@ -1,8 +1,16 @@
 from collections.abc import Mapping
-from dataclasses import dataclass, field
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field, fields
 from datetime import date, datetime, timedelta
 from enum import StrEnum
+from functools import lru_cache
 import re
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class SelectionStrategy(StrEnum):
@@ -36,6 +44,7 @@ class PlannerConfig:
     hide_future: int = 0
     dateformat: str = '%d-%m-%Y'
     today: date | None = None
+    collect_stats: bool = False
 
 
 @dataclass(frozen=True, slots=True)
@@ -122,11 +131,73 @@ class RecordTaskParentStrategy:
     strategy: SelectionStrategy | None
 
 
+@dataclass(frozen=True, slots=True)
+class WorkspaceIndex:
+    """Lookups, sorted orders and parsed strategies of one workspace snapshot.
+
+    Built once per plan and shared by the parentless and the child planning
+    pass. Sections and tasks are sorted by their Todoist order.
+    """
+
+    projects: tuple[ProjectSnapshot, ...]
+    sections_by_id: Mapping[str, SectionSnapshot]
+    sections_by_project: Mapping[str, tuple[SectionSnapshot, ...]]
+    tasks_by_section: Mapping[tuple[str, str | None], tuple[TaskSnapshot, ...]]
+    children_by_parent: Mapping[str, tuple[TaskSnapshot, ...]]
+    root_tasks: tuple[TaskSnapshot, ...]
+    project_strategies: Mapping[str, LabelStrategy | None]
+    section_strategies: Mapping[str, LabelStrategy | None]
+    task_strategies: Mapping[str, LabelStrategy | None]
+
+
+@dataclass(slots=True)
+class PlannerStats:
+    """Phase timings and counters of one plan.
+
+    Only collected when `PlannerConfig.collect_stats` is set. Phase timings
+    are wall-clock seconds keyed by phase name, in the order the phases ran.
+    """
+
+    phase_seconds: dict[str, float] = field(default_factory=dict)
+    tasks: int = 0
+    tree_tasks_visited: int = 0
+    strategies_parsed: int = 0
+    labels_added: int = 0
+    labels_removed: int = 0
+    metadata_commands: int = 0
+    description_changes: int = 0
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - started
+
+    def as_log_fields(self):
+        """Return the stats as flat fields for structured log records."""
+        log_fields = {
+            f'phase_{name}_seconds': round(seconds, 6)
+            for name, seconds in self.phase_seconds.items()
+        }
+        log_fields['planner_seconds'] = round(sum(self.phase_seconds.values()), 6)
+        for stat in fields(self):
+            if stat.name != 'phase_seconds':
+                log_fields[stat.name] = getattr(self, stat.name)
+        return log_fields
+
+
 @dataclass(frozen=True, slots=True)
 class PlanningResult:
     label_changes: tuple[LabelChange, ...] = ()
     description_changes: tuple[DescriptionChange, ...] = ()
     metadata_commands: tuple[object, ...] = ()
+    # First day after the plan's today on which a date filter decision flips
+    # by itself, without any edit in Todoist
+    next_decision_date: date | None = None
+    # Stats describe how a result was computed, not the result itself
+    stats: PlannerStats | None = field(default=None, compare=False)
 
 
 INACTIVE_RELATIVE_ACTIONABLE_DATE_WARNING = (
@@ -205,66 +276,202 @@ def label_strategy_to_legacy_type(strategy):
     return legacy_type
 
 
-def parse_label_strategy(args, string, num):
-    if string is None:
-        return None
-    if string == 'Inbox':
-        return None
+LABEL_STRATEGY_CACHE_SIZE = 1 << 17
 
-    suffix_chars = re.escape(args.s_suffix + args.p_suffix)
-    regex = '[%s]{1,%s}$' % (suffix_chars, str(num))
-    re_ind = re.search(regex, string)
 
-    is_ignored_all_projects_project = (
-        args.all_projects
-        and num == 3
-        and args.ignore_suffix
-        and string.endswith("_ignore")
-    )
+class LabelStrategyParser:
+    """Parses suffix tags in names into label strategies for one suffix configuration.
 
-    if is_ignored_all_projects_project and not re_ind:
-        return None
+    The suffix regex is compiled once per level, and parsed names are kept in
+    a bounded LRU cache, since most names do not change between sync loops.
+    """
 
-    if args.all_projects and num == 3 and not re_ind:
-        return LabelStrategy(
-            project_selection=SelectionStrategy.SEQUENTIAL,
-            section_selection=SelectionStrategy.SEQUENTIAL,
-            task_selection=SelectionStrategy.SEQUENTIAL,
+    def __init__(self, s_suffix='-', p_suffix='=', all_projects=False, ignore_suffix=False,
+                 cache_size=LABEL_STRATEGY_CACHE_SIZE):
+        self.s_suffix = s_suffix
+        self.p_suffix = p_suffix
+        self.all_projects = all_projects
+        self.ignore_suffix = ignore_suffix
+
+        self._regexes = {num: self._compile_suffix_regex(num) for num in (1, 2, 3)}
+        self._parse_cached = lru_cache(maxsize=cache_size)(self._parse)
+
+    def parse(self, string, num):
+        if string is None:
+            return None
+        if string == 'Inbox':
+            return None
+        return self._parse_cached(string, num)
+
+    def cache_info(self):
+        return self._parse_cached.cache_info()
+
+    def _compile_suffix_regex(self, num):
+        suffix_chars = re.escape(self.s_suffix + self.p_suffix)
+        return re.compile('[%s]{1,%s}$' % (suffix_chars, str(num)))
+
+    def _parse(self, string, num):
+        regex = self._regexes.get(num) or self._compile_suffix_regex(num)
+        re_ind = regex.search(string)
+
+        is_ignored_all_projects_project = (
+            self.all_projects
+            and num == 3
+            and self.ignore_suffix
+            and string.endswith("_ignore")
         )
 
-    if not re_ind:
-        return None
+        if is_ignored_all_projects_project and not re_ind:
+            return None
 
-    selections = [
-        _selection_for_suffix(args, suffix)
-        for suffix in re_ind[0]
-    ]
-    selections = [selection for selection in selections if selection is not None]
-    if not selections:
-        return None
+        if self.all_projects and num == 3 and not re_ind:
+            return LabelStrategy(
+                project_selection=SelectionStrategy.SEQUENTIAL,
+                section_selection=SelectionStrategy.SEQUENTIAL,
+                task_selection=SelectionStrategy.SEQUENTIAL,
+            )
+
+        if not re_ind:
+            return None
+
+        selections = [
+            _selection_for_suffix(self, suffix)
+            for suffix in re_ind[0]
+        ]
+        selections = [selection for selection in selections if selection is not None]
+        if not selections:
+            return None
+
+        return _strategy_from_selections(selections, num)
+
+
+@lru_cache(maxsize=16)
+def _label_strategy_parser(s_suffix, p_suffix, all_projects, ignore_suffix):
+    return LabelStrategyParser(s_suffix, p_suffix, all_projects, ignore_suffix)
 
-    return _strategy_from_selections(selections, num)
+
+def label_strategy_parser_for(config):
+    """Return the shared parser for the suffix settings of a config or argparse namespace."""
+    return _label_strategy_parser(
+        config.s_suffix,
+        config.p_suffix,
+        bool(config.all_projects),
+        bool(config.ignore_suffix),
+    )
+
+
+def parse_label_strategy(args, string, num):
+    return label_strategy_parser_for(args).parse(string, num)
 
 
-def plan_parentless_next_action_labels(workspace, config, metadata):
+ACTIONABLE_DATE_CACHE_SIZE = 1 << 17
+# Below this many tasks building the NumPy arrays costs more than it saves
+VECTORIZED_DATE_FILTER_MIN_TASKS = 2048
+
+_ACTIONABLE_DATE_MARKER = re.compile(r'start=(?:(\d\d-\d\d-\d\d\d\d)|due-(\d+)([dw]))')
+
+
+@dataclass(frozen=True, slots=True)
+class ActionableDateMarkers:
+    """Start-date markers found in a task's content.
+
+    `start_date` is parsed from the first `start=<date>` marker, and is None
+    if that marker does not match the date format; later markers are not
+    tried. `start_days_before_due` comes from the first `start=due-<N>d` or
+    `start=due-<N>w` marker, in days.
+    """
+
+    start_date: date | None = None
+    start_days_before_due: int | None = None
+
+
+NO_ACTIONABLE_DATE_MARKERS = ActionableDateMarkers()
+
+
+@lru_cache(maxsize=ACTIONABLE_DATE_CACHE_SIZE)
+def scan_actionable_date_markers(content, dateformat):
+    """Find all actionable date markers in one pass, cached by content and date format."""
+    if 'start=' not in content:
+        return NO_ACTIONABLE_DATE_MARKERS
+
+    absolute_date = None
+    relative_days = None
+    for match in _ACTIONABLE_DATE_MARKER.finditer(content):
+        absolute, amount, unit = match.groups()
+        if absolute is not None:
+            if absolute_date is None:
+                absolute_date = absolute
+        elif relative_days is None:
+            relative_days = int(amount) if unit == 'd' else int(amount) * 7
+        if absolute_date is not None and relative_days is not None:
+            break
+
+    start_date = None
+    if absolute_date is not None:
+        try:
+            parsed = datetime.strptime(absolute_date, dateformat)
+            start_date = date(parsed.year, parsed.month, parsed.day)
+        except ValueError:
+            pass
+
+    return ActionableDateMarkers(start_date=start_date, start_days_before_due=relative_days)
+
+
+def build_workspace_index(workspace, config, parser=None):
+    if parser is None:
+        parser = label_strategy_parser_for(config)
     projects_by_id = {project.id: project for project in workspace.projects}
+    tasks_by_order = sorted(workspace.tasks, key=lambda item: item.order)
+    tasks_by_section = _tasks_by_project_section(tasks_by_order)
     sections_by_project = _sections_by_project(workspace.sections)
-    tasks_by_section = _tasks_by_project_section(workspace.tasks)
-
-    project_strategies = {
-        project.id: parse_label_strategy(config, project.name, 3)
-        for project in workspace.projects
-    }
-    section_strategies = {
-        section.id: parse_label_strategy(config, section.name, 2)
-        for section in workspace.sections
-        if section.id is not None
-    }
-    task_strategies = {
-        task.id: parse_label_strategy(config, task.content, 1)
-        for task in workspace.tasks
-        if task.parent_id is None
-    }
+
+    return WorkspaceIndex(
+        projects=tuple(sorted(projects_by_id.values(), key=lambda item: item.order)),
+        sections_by_id={
+            section.id: section
+            for section in workspace.sections
+            if section.id is not None
+        },
+        sections_by_project={
+            project.id: tuple(sorted(
+                _sections_for_project(
+                    project,
+                    sections_by_project.get(project.id, ()),
+                    tasks_by_section,
+                ),
+                key=lambda item: item.order,
+            ))
+            for project in projects_by_id.values()
+        },
+        tasks_by_section={key: tuple(tasks) for key, tasks in tasks_by_section.items()},
+        children_by_parent={
+            parent_id: tuple(children)
+            for parent_id, children in _children_by_parent(tasks_by_order).items()
+        },
+        root_tasks=tuple(task for task in tasks_by_order if task.parent_id is None),
+        project_strategies={
+            project.id: parser.parse(project.name, 3)
+            for project in workspace.projects
+        },
+        section_strategies={
+            section.id: parser.parse(section.name, 2)
+            for section in workspace.sections
+            if section.id is not None
+        },
+        task_strategies={
+            task.id: parser.parse(task.content, 1)
+            for task in workspace.tasks
+        },
+    )
+
+
+def plan_parentless_next_action_labels(workspace, config, metadata, index=None):
+    if index is None:
+        index = build_workspace_index(workspace, config)
+
+    project_strategies = index.project_strategies
+    section_strategies = index.section_strategies
+    task_strategies = index.task_strategies
 
     label_changes = []
     metadata_commands = []
@@ -274,26 +481,24 @@ def plan_parentless_next_action_labels(workspace, config, metadata):
     metadata_commands.extend(
         _strategy_metadata_commands(section_strategies, metadata.section_strategies, RecordSectionStrategy)
     )
+    # Only parentless task strategies are recorded; sub-task strategies are
+    # recorded through the parent strategy of their children instead
     metadata_commands.extend(
-        _strategy_metadata_commands(task_strategies, metadata.task_strategies, RecordTaskStrategy)
+        _strategy_metadata_commands(
+            {task.id: task_strategies[task.id] for task in workspace.tasks if task.parent_id is None},
+            metadata.task_strategies,
+            RecordTaskStrategy,
+        )
     )
 
-    for project in sorted(projects_by_id.values(), key=lambda item: item.order):
+    for project in index.projects:
         if project.is_inbox_project:
             continue
 
         first_project_section_seen = False
-        project_sections = _sections_for_project(
-            project,
-            sections_by_project.get(project.id, ()),
-            tasks_by_section,
-        )
 
-        for section in sorted(project_sections, key=lambda item: item.order):
-            section_tasks = sorted(
-                tasks_by_section.get((project.id, section.id), ()),
-                key=lambda item: item.order,
-            )
+        for section in index.sections_by_project[project.id]:
+            section_tasks = index.tasks_by_section.get((project.id, section.id), ())
             first_section_task_seen = False
 
             for task in section_tasks:
@@ -330,87 +535,112 @@ def plan_parentless_next_action_labels(workspace, config, metadata):
 
 
 def plan_next_action_labels(workspace, config, metadata):
-    parentless_result = plan_parentless_next_action_labels(workspace, config, metadata)
-    tasks_by_id = {task.id: task for task in workspace.tasks}
+    stats = PlannerStats(tasks=len(workspace.tasks)) if config.collect_stats else None
+    parser = label_strategy_parser_for(config)
+    parses_before = parser.cache_info().misses if stats is not None else 0
+
+    with stats_phase(stats, 'index'):
+        index = build_workspace_index(workspace, config, parser)
+    with stats_phase(stats, 'root_selection'):
+        parentless_result = plan_parentless_next_action_labels(workspace, config, metadata, index)
     desired_labels = {task.id: tuple(task.labels) for task in workspace.tasks}
-    metadata_commands = list(parentless_result.metadata_commands)
+    # A dict keeps insertion order and makes the duplicate check constant time
+    metadata_commands = dict.fromkeys(parentless_result.metadata_commands)
 
     for label_change in parentless_result.label_changes:
         desired_labels[label_change.task_id] = label_change.labels
 
-    children_by_parent = _children_by_parent(workspace.tasks)
-    project_strategies = {
-        project.id: parse_label_strategy(config, project.name, 3)
-        for project in workspace.projects
-    }
-    section_strategies = {
-        section.id: parse_label_strategy(config, section.name, 2)
-        for section in workspace.sections
-        if section.id is not None
-    }
-    task_strategies = {
-        task.id: parse_label_strategy(config, task.content, 1)
-        for task in workspace.tasks
-    }
-    sections_by_id = {
-        section.id: section
-        for section in workspace.sections
-        if section.id is not None
-    }
-
-    root_tasks = sorted(
-        [task for task in workspace.tasks if task.parent_id is None],
-        key=lambda task: task.order,
-    )
-    for task in root_tasks:
-        if task.is_completed or task.is_header:
-            continue
-        section = sections_by_id.get(task.section_id)
-        dominant_strategy = _dominant_strategy(
-            task_strategies.get(task.id),
-            section_strategies.get(task.section_id),
-            project_strategies.get(task.project_id),
+    children_by_parent = index.children_by_parent
+    task_strategies = index.task_strategies
+    tree_tasks_visited = 0
+
+    with stats_phase(stats, 'child_propagation'):
+        for task in index.root_tasks:
+            if task.is_completed or task.is_header:
+                continue
+            section = index.sections_by_id.get(task.section_id)
+            dominant_strategy = _dominant_strategy(
+                task_strategies.get(task.id),
+                index.section_strategies.get(task.section_id),
+                index.project_strategies.get(task.project_id),
+            )
+            tree_tasks_visited += _propagate_child_labels(
+                task=task,
+                inherited_strategy=_child_selection(dominant_strategy),
+                children_by_parent=children_by_parent,
+                desired_labels=desired_labels,
+                next_action_label=config.next_action_label,
+                metadata=metadata,
+                metadata_commands=metadata_commands,
+                task_strategies=task_strategies,
+                section_labeling_disabled=section.is_labeling_disabled if section else False,
+            )
+
+    with stats_phase(stats, 'eligibility'):
+        _remove_labels_from_ineligible_tasks(
+            workspace.tasks,
+            desired_labels,
+            config.next_action_label,
+        )
+    with stats_phase(stats, 'date_filters'):
+        _apply_actionable_date_filters(
+            workspace.tasks,
+            children_by_parent,
+            desired_labels,
+            config,
         )
-        _propagate_child_labels(
-            task=task,
-            inherited_strategy=_child_selection(dominant_strategy),
-            children_by_parent=children_by_parent,
-            desired_labels=desired_labels,
-            next_action_label=config.next_action_label,
-            metadata=metadata,
-            metadata_commands=metadata_commands,
-            task_strategies=task_strategies,
-            section_labeling_disabled=section.is_labeling_disabled if section else False,
+    with stats_phase(stats, 'next_decision'):
+        decision_date = next_decision_date(workspace.tasks, config)
+    with stats_phase(stats, 'descriptions'):
+        description_changes = _inactive_relative_marker_description_changes(
+            workspace.tasks,
+            config.dateformat,
         )
 
-    _remove_labels_from_ineligible_tasks(
-        workspace.tasks,
-        desired_labels,
-        config.next_action_label,
-    )
-    _apply_actionable_date_filters(
-        workspace.tasks,
-        children_by_parent,
-        desired_labels,
-        config,
-    )
-    description_changes = _inactive_relative_marker_description_changes(
-        workspace.tasks,
-    )
+    with stats_phase(stats, 'label_changes'):
+        label_changes = [
+            LabelChange(task_id=task.id, labels=desired_labels[task.id])
+            for task in workspace.tasks
+            if desired_labels[task.id] != task.labels
+        ]
 
-    label_changes = [
-        LabelChange(task_id=task.id, labels=desired_labels[task.id])
-        for task in workspace.tasks
-        if desired_labels[task.id] != task.labels
-    ]
+    if stats is not None:
+        stats.tree_tasks_visited = tree_tasks_visited
+        stats.strategies_parsed = parser.cache_info().misses - parses_before
+        _count_label_changes(stats, workspace.tasks, label_changes, config.next_action_label)
+        stats.metadata_commands = len(metadata_commands)
+        stats.description_changes = len(description_changes)
 
     return PlanningResult(
         label_changes=tuple(label_changes),
         description_changes=tuple(description_changes),
         metadata_commands=tuple(metadata_commands),
+        next_decision_date=decision_date,
+        stats=stats,
     )
 
 
+def stats_phase(stats, name):
+    """Time a phase into `stats`, or do nothing when stats are not collected."""
+    if stats is None:
+        return nullcontext()
+    return stats.phase(name)
+
+
+def _count_label_changes(stats, tasks, label_changes, label):
+    changed_labels = {change.task_id: change.labels for change in label_changes}
+    for task in tasks:
+        labels = changed_labels.get(task.id)
+        if labels is None:
+            continue
+        had_label = label in task.labels
+        has_label = label in labels
+        if has_label and not had_label:
+            stats.labels_added += 1
+        elif had_label and not has_label:
+            stats.labels_removed += 1
+
+
 def _sections_by_project(sections):
     result = {}
     for section in sections:
@@ -483,142 +713,226 @@ def _propagate_child_labels(
     task_strategies,
     section_labeling_disabled,
 ):
-    children = sorted(children_by_parent.get(task.id, ()), key=lambda child: child.order)
-    if not children or section_labeling_disabled:
-        return
-
-    own_strategy = task_strategies.get(task.id)
-    child_strategy = _child_selection(own_strategy) or inherited_strategy
-    if child_strategy is None:
-        return
+    if section_labeling_disabled:
+        return 0
+
+    # Walk the tree depth-first with an explicit stack, so deep trees cannot
+    # hit the recursion limit. Children are pushed in reverse, which visits
+    # them in order and finishes each subtree before its next sibling.
+    stack = [(task, inherited_strategy)]
+    visited = 0
+    while stack:
+        task, inherited_strategy = stack.pop()
+        visited += 1
+        children = children_by_parent.get(task.id, ())
+        if not children:
+            continue
 
-    eligible_children = [
-        child
-        for child in children
-        if not child.is_completed and not child.is_header
-    ]
-    for child in eligible_children:
-        _record_parent_strategy(
-            child.id,
-            child_strategy,
-            metadata,
-            metadata_commands,
-        )
+        own_strategy = task_strategies.get(task.id)
+        child_strategy = _child_selection(own_strategy) or inherited_strategy
+        if child_strategy is None:
+            continue
 
-    parent_has_label = next_action_label in desired_labels[task.id]
-    if child_strategy == SelectionStrategy.SEQUENTIAL:
+        eligible_children = [
+            child
+            for child in children
+            if not child.is_completed and not child.is_header
+        ]
         for child in eligible_children:
-            desired_labels[child.id] = _without_label(
-                desired_labels[child.id],
-                next_action_label,
-            )
-        if parent_has_label and eligible_children:
-            first_child = eligible_children[0]
-            desired_labels[first_child.id] = _with_label(
-                desired_labels[first_child.id],
-                next_action_label,
+            _record_parent_strategy(
+                child.id,
+                child_strategy,
+                metadata,
+                metadata_commands,
             )
+
+        parent_has_label = next_action_label in desired_labels[task.id]
+        if child_strategy == SelectionStrategy.SEQUENTIAL:
+            for child in eligible_children:
+                desired_labels[child.id] = _without_label(
+                    desired_labels[child.id],
+                    next_action_label,
+                )
+            if parent_has_label and eligible_children:
+                first_child = eligible_children[0]
+                desired_labels[first_child.id] = _with_label(
+                    desired_labels[first_child.id],
+                    next_action_label,
+                )
+                desired_labels[task.id] = _without_label(
+                    desired_labels[task.id],
+                    next_action_label,
+                )
+
+        elif child_strategy == SelectionStrategy.PARALLEL and parent_has_label:
             desired_labels[task.id] = _without_label(
                 desired_labels[task.id],
                 next_action_label,
             )
+            for child in eligible_children:
+                desired_labels[child.id] = _with_label(
+                    desired_labels[child.id],
+                    next_action_label,
+                )
 
-    elif child_strategy == SelectionStrategy.PARALLEL and parent_has_label:
-        desired_labels[task.id] = _without_label(
-            desired_labels[task.id],
-            next_action_label,
-        )
-        for child in eligible_children:
-            desired_labels[child.id] = _with_label(
-                desired_labels[child.id],
-                next_action_label,
-            )
+        stack.extend((child, child_strategy) for child in reversed(eligible_children))
 
-    for child in eligible_children:
-        _propagate_child_labels(
-            task=child,
-            inherited_strategy=child_strategy,
-            children_by_parent=children_by_parent,
-            desired_labels=desired_labels,
-            next_action_label=next_action_label,
-            metadata=metadata,
-            metadata_commands=metadata_commands,
-            task_strategies=task_strategies,
-            section_labeling_disabled=section_labeling_disabled,
-        )
+    return visited
 
 
 def _record_parent_strategy(task_id, strategy, metadata, metadata_commands):
     if metadata.task_parent_strategies.get(task_id) == strategy:
         return
     command = RecordTaskParentStrategy(task_id=task_id, strategy=strategy)
-    if command not in metadata_commands:
-        metadata_commands.append(command)
+    metadata_commands.setdefault(command)
 
 
 def _apply_actionable_date_filters(tasks, children_by_parent, desired_labels, config):
     today = config.today or date.today()
-    for task in tasks:
-        if _absolute_start_date_is_future(task, config.dateformat, today):
-            _remove_label_from_task_tree(
-                task,
-                children_by_parent,
-                desired_labels,
-                config.next_action_label,
-            )
-            continue
+    if np is not None and len(tasks) >= VECTORIZED_DATE_FILTER_MIN_TASKS:
+        future_start_rows, hidden_rows = _vectorized_actionable_date_rows(tasks, config, today)
+    else:
+        future_start_rows, hidden_rows = _actionable_date_rows(tasks, config, today)
+
+    # Both filters only remove the label, so the order they run in does not matter
+    for row in future_start_rows:
+        _remove_label_from_task_tree(
+            tasks[row],
+            children_by_parent,
+            desired_labels,
+            config.next_action_label,
+        )
+    for row in hidden_rows:
+        task = tasks[row]
+        desired_labels[task.id] = _without_label(
+            desired_labels[task.id],
+            config.next_action_label,
+        )
 
-        if _relative_start_date_is_future(task, today):
-            _remove_label_from_task_tree(
-                task,
-                children_by_parent,
-                desired_labels,
-                config.next_action_label,
-            )
-            continue
 
-        if _is_hidden_future_task(task, config.hide_future, today):
-            desired_labels[task.id] = _without_label(
-                desired_labels[task.id],
-                config.next_action_label,
-            )
+def _actionable_date_rows(tasks, config, today):
+    return _date_filter_rows(((task.content, task.due_date) for task in tasks), config, today)
 
 
-def _is_hidden_future_task(task, hide_future, today):
-    if hide_future <= 0 or task.due_date is None:
-        return False
-    return (task.due_date - today).days >= hide_future
+def _vectorized_actionable_date_rows(tasks, config, today):
+    due = np.fromiter(
+        (task.due_date.toordinal() if task.due_date is not None else 0 for task in tasks),
+        dtype=np.int64,
+        count=len(tasks),
+    )
+    return _vectorized_date_filter_rows([task.content for task in tasks], due, config, today)
+
+
+def _date_filter_rows(rows, config, today):
+    # `rows` yields the content and due date of every task. Returns the row
+    # numbers hidden by a future start date, and those hidden by `hide_future`.
+    future_start_rows = []
+    hidden_rows = []
+    for row, (content, due_date) in enumerate(rows):
+        markers = scan_actionable_date_markers(content, config.dateformat)
+
+        if _absolute_start_date_is_future(markers, today):
+            future_start_rows.append(row)
+        elif _relative_start_date_is_future(markers, due_date, today):
+            future_start_rows.append(row)
+        elif _is_hidden_future_task(due_date, config.hide_future, today):
+            hidden_rows.append(row)
+
+    return future_start_rows, hidden_rows
+
+
+def _vectorized_date_filter_rows(contents, due, config, today):
+    # Like `_date_filter_rows`, from task contents and due day ordinals (0 without
+    # a due date). Dates become day ordinals, so every comparison is one array operation.
+    markers = [scan_actionable_date_markers(content, config.dateformat) for content in contents]
+    count = len(contents)
+    due = due.astype(np.int64, copy=False)
+    start = np.fromiter(
+        (item.start_date.toordinal() if item.start_date is not None else 0 for item in markers),
+        dtype=np.int64,
+        count=count,
+    )
+    days_before_due = np.fromiter(
+        (item.start_days_before_due if item.start_days_before_due is not None else -1 for item in markers),
+        dtype=np.int64,
+        count=count,
+    )
+    today = today.toordinal()
+    has_due = due > 0
+
+    future_start = (start > today) | (has_due & (days_before_due >= 0) & (due - days_before_due > today))
+    hidden = has_due & (due - today >= config.hide_future) & ~future_start
+    if config.hide_future <= 0:
+        hidden[:] = False
+
+    return np.flatnonzero(future_start).tolist(), np.flatnonzero(hidden).tolist()
+
+
+def next_decision_date(tasks, config):
+    """Return the first day after today on which a date filter decision changes on its own.
+
+    Start-date markers stop hiding a task tree on their start date, and
+    `hide_future` stops hiding a task `hide_future - 1` days before it is due.
+    Returns None when no decision depends on a future day.
+    """
+    return _earliest_decision_date(((task.content, task.due_date) for task in tasks), config)
 
 
-def _absolute_start_date_is_future(task, dateformat, today):
-    match = re.search(r'start=(\d\d-\d\d-\d\d\d\d)', task.content)
-    if not match:
+def _earliest_decision_date(rows, config):
+    today = config.today or date.today()
+    hide_future = config.hide_future
+    earliest = None
+    for content, due_date in rows:
+        markers = scan_actionable_date_markers(content, config.dateformat)
+        candidates = []
+        if markers.start_date is not None:
+            candidates.append(markers.start_date)
+        if markers.start_days_before_due is not None and due_date is not None:
+            candidates.append(due_date - timedelta(days=markers.start_days_before_due))
+        if hide_future > 0 and due_date is not None:
+            candidates.append(due_date - timedelta(days=hide_future - 1))
+
+        for candidate in candidates:
+            if candidate > today and (earliest is None or candidate < earliest):
+                earliest = candidate
+
+    return earliest
+
+
+def _is_hidden_future_task(due_date, hide_future, today):
+    if hide_future <= 0 or due_date is None:
         return False
-    try:
-        parsed = datetime.strptime(match.group(1), dateformat)
-        start_date = date(parsed.year, parsed.month, parsed.day)
-    except ValueError:
+    return (due_date - today).days >= hide_future
+
+
+def _absolute_start_date_is_future(markers, today):
+    if markers.start_date is None:
         return False
-    return (today - start_date).days < 0
+    return (today - markers.start_date).days < 0
 
 
-def _relative_start_date_is_future(task, today):
-    match = re.search(r'start=due-(\d+)([dw])', task.content)
-    if not match or task.due_date is None:
+def _relative_start_date_is_future(markers, due_date, today):
+    if markers.start_days_before_due is None or due_date is None:
         return False
 
-    amount = int(match.group(1))
-    unit = match.group(2)
-    days = amount if unit == 'd' else amount * 7
-    start_date = task.due_date - timedelta(days=days)
+    start_date = due_date - timedelta(days=markers.start_days_before_due)
     return (today - start_date).days < 0
 
 
-def _inactive_relative_marker_description_changes(tasks):
+def _inactive_relative_marker_description_changes(tasks, dateformat):
+    return _inactive_relative_marker_description_changes_of(
+        ((task.id, task.content, task.due_date, task.description) for task in tasks),
+        dateformat,
+    )
+
+
+def _inactive_relative_marker_description_changes_of(rows, dateformat):
+    # `rows` yields the id, content, due date and description of every task
     changes = []
-    for task in tasks:
-        has_inactive_marker = _has_relative_start_date_marker(task) and task.due_date is None
-        description = task.description or ''
+    for task_id, content, due_date, description in rows:
+        markers = scan_actionable_date_markers(content, dateformat)
+        has_inactive_marker = markers.start_days_before_due is not None and due_date is None
+        description = description or ''
 
         if has_inactive_marker:
             new_description = _prepend_inactive_relative_marker_warning(description)
@@ -626,15 +940,11 @@ def _inactive_relative_marker_description_changes(tasks):
             new_description = _remove_inactive_relative_marker_warning(description)
 
         if new_description != description:
-            changes.append(DescriptionChange(task.id, new_description))
+            changes.append(DescriptionChange(task_id, new_description))
 
     return changes
 
 
-def _has_relative_start_date_marker(task):
-    return re.search(r'start=due-\d+[dw]', task.content) is not None
-
-
 def _prepend_inactive_relative_marker_warning(description):
     if description.startswith(INACTIVE_RELATIVE_ACTIONABLE_DATE_WARNING):
         return description
@@ -653,9 +963,11 @@ def _remove_inactive_relative_marker_warning(description):
 
 
 def _remove_label_from_task_tree(task, children_by_parent, desired_labels, label):
-    desired_labels[task.id] = _without_label(desired_labels[task.id], label)
-    for child in children_by_parent.get(task.id, ()):
-        _remove_label_from_task_tree(child, children_by_parent, desired_labels, label)
+    stack = [task]
+    while stack:
+        task = stack.pop()
+        desired_labels[task.id] = _without_label(desired_labels[task.id], label)
+        stack.extend(reversed(children_by_parent.get(task.id, ())))
 
 
 def _remove_labels_from_ineligible_tasks(tasks, desired_labels, label):
@@ -673,13 +985,34 @@ def _plan_parentless_task_labels(
     first_section_task_seen,
 ):
     labels = tuple(task.labels)
+    should_have_label = _parentless_label_decision(
+        is_header=task.is_header,
+        dominant_strategy=dominant_strategy,
+        section_labeling_disabled=section_labeling_disabled,
+        first_project_section_seen=first_project_section_seen,
+        first_section_task_seen=first_section_task_seen,
+    )
+    if should_have_label is None:
+        return labels
+    if should_have_label:
+        return _with_label(labels, next_action_label)
+    return _without_label(labels, next_action_label)
 
-    if task.is_header or section_labeling_disabled:
-        return _without_label(labels, next_action_label)
+
+def _parentless_label_decision(
+    is_header,
+    dominant_strategy,
+    section_labeling_disabled,
+    first_project_section_seen,
+    first_section_task_seen,
+):
+    # True adds the label, False removes it, and None leaves the task's labels as they are
+    if is_header or section_labeling_disabled:
+        return False
 
     dominant_type = label_strategy_to_legacy_type(dominant_strategy)
     if dominant_type is None:
-        return _without_label(labels, next_action_label)
+        return False
 
     should_have_label = False
     should_remove_stale_label = False
@@ -712,10 +1045,10 @@ def _plan_parentless_task_labels(
         should_have_label = True
 
     if should_have_label:
-        return _with_label(labels, next_action_label)
+        return True
     if should_remove_stale_label:
-        return _without_label(labels, next_action_label)
-    return labels
+        return False
+    return None
 
 
 def _with_label(labels, label):
@@ -0,0 +1,176 @@
+"""Client-side rate limiting for Todoist API requests.
+
+`RateLimitingAdapter` is mounted on the `requests.Session` that every Todoist
+client shares, so all API calls of the process draw from one `TokenBucket`.
+"""
+
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+
+from scheduler import parse_retry_after
+
+# Todoist allows each user 1000 requests per 15 minutes.
+TODOIST_REQUESTS_PER_WINDOW = 1000
+TODOIST_RATE_LIMIT_WINDOW_SECONDS = 15 * 60
+# Requests that may be sent at once. A bucket hands out at most its capacity
+# plus `rate * window` tokens in any window, so the refill rate only covers
+# the rest of the quota.
+TODOIST_BURST_REQUESTS = 50
+TODOIST_API_PREFIX = 'https://api.todoist.com/'
+
+# Pause this long after a 429 response without a readable Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 5.0
+# A 429 response multiplies the rate by this factor, down to a floor of the
+# configured rate times MIN_RATE_FACTOR. Every successful response adds
+# RATE_RECOVERY_STEP times the configured rate back.
+RATE_DECREASE_FACTOR = 0.5
+MIN_RATE_FACTOR = 1 / 16
+RATE_RECOVERY_STEP = 0.05
+# Refill arithmetic can leave a bucket a rounding error short of a token
+TOKEN_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    The bucket starts full and refills at `rate` tokens per second up to
+    `capacity`. `acquire` blocks until a token is available. `pause` empties
+    the bucket and stops the refill for a while.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_todoist_quota(cls, **kwargs):
+        """Return a bucket that never grants more than Todoist's per-user quota in any window."""
+        return cls(
+            rate=(TODOIST_REQUESTS_PER_WINDOW - TODOIST_BURST_REQUESTS) / TODOIST_RATE_LIMIT_WINDOW_SECONDS,
+            capacity=TODOIST_BURST_REQUESTS,
+            **kwargs,
+        )
+
+    def acquire(self):
+        """Take one token, waiting if needed, and return the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._refill()
+                if self._tokens >= 1 - TOKEN_EPSILON:
+                    self._tokens -= 1
+                    return waited
+                wait_seconds = max(0.0, self._updated_at - now) + (1 - self._tokens) / self.rate
+            self._sleep(wait_seconds)
+            waited += wait_seconds
+
+    def pause(self, seconds):
+        """Hand out no tokens for the next `seconds`."""
+        with self._lock:
+            now = self._refill()
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = max(self._updated_at, now + seconds)
+
+    def set_rate(self, rate):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        # During a pause `_updated_at` lies in the future and nothing refills
+        now = self._clock()
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+        return now
+
+
+class RateLimitingAdapter(HTTPAdapter):
+    """Transport adapter that sends every request of a session through one token bucket.
+
+    A 429 response pauses the bucket for the `Retry-After` time, lowers its
+    rate, and the request is sent once more; a second 429 is returned to the
+    caller. Successful responses bring the rate back up to the configured
+    rate. The totals record how long requests waited for a token.
+    """
+
+    def __init__(self, bucket=None, **kwargs):
+        super().__init__(**kwargs)
+        self.bucket = bucket or TokenBucket.for_todoist_quota()
+        self.configured_rate = self.bucket.rate
+        self._lock = threading.Lock()
+        self._wait_seconds = 0.0
+        self._waited_requests = 0
+        self._retries = 0
+
+    def attach(self, session, prefix=TODOIST_API_PREFIX):
+        session.mount(prefix, self)
+        return session
+
+    def send(self, request, **kwargs):
+        self._acquire()
+        response = super().send(request, **kwargs)
+        if response.status_code != 429:
+            self._recover_rate()
+            return response
+
+        self._back_off(response)
+        response.close()
+        self._acquire()
+        with self._lock:
+            self._retries += 1
+        response = super().send(request, **kwargs)
+        if response.status_code == 429:
+            self._back_off(response)
+        else:
+            self._recover_rate()
+        return response
+
+    def totals(self):
+        """Return the (seconds waited, requests that waited, retries) so far."""
+        with self._lock:
+            return self._wait_seconds, self._waited_requests, self._retries
+
+    def log_fields_since(self, totals):
+        """Return the waiting since an earlier `totals()` as flat log fields."""
+        wait_seconds, waited_requests, retries = self.totals()
+        return {
+            'rate_limit_wait_seconds': round(wait_seconds - totals[0], 6),
+            'rate_limit_waited_requests': waited_requests - totals[1],
+            'rate_limit_retries': retries - totals[2],
+        }
+
+    def _acquire(self):
+        waited = self.bucket.acquire()
+        if waited > 0:
+            with self._lock:
+                self._wait_seconds += waited
+                self._waited_requests += 1
+
+    def _back_off(self, response):
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        self.bucket.pause(DEFAULT_RETRY_AFTER_SECONDS if retry_after is None else retry_after)
+        with self._lock:
+            self.bucket.set_rate(max(
+                self.configured_rate * MIN_RATE_FACTOR, self.bucket.rate * RATE_DECREASE_FACTOR))
+
+    def _recover_rate(self):
+        if self.bucket.rate >= self.configured_rate:
+            return
+        with self._lock:
+            self.bucket.set_rate(min(
+                self.configured_rate, self.bucket.rate + self.configured_rate * RATE_RECOVERY_STEP))
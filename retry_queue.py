@@ -0,0 +1,249 @@
+"""Retry queue for task writes that failed.
+
+Failed updates are kept in the `write_retry_queue` table of the metadata
+database and are committed together with the rest of a sync loop's metadata,
+so they survive restarts once that loop's transaction commits. A loop that
+dies before its commit loses the failures it queued; the next loop plans
+those writes again from the tasks it fetches.
+
+Each queued update remembers the task's field values it was computed from.
+Once per loop, after the loop's own writes, queued updates that are due are
+checked against the tasks fetched in that loop and sent again with
+exponential backoff and jitter. The sync loop plans the same update again
+while it has not been applied, so a new write that repeats a queued update
+keeps its attempts and is not sent before it is due. An update is dropped
+instead when its task was deleted or completed, when the task's fields
+changed since the update was computed, when a newer, different write for the
+same task and fields replaced it, or when it runs out of attempts.
+"""
+
+import json
+import logging
+import random
+import time
+
+from task_writer import TaskUpdate, TaskWriteResult
+
+RETRY_BASE_DELAY_SECONDS = 10
+RETRY_MAX_DELAY_SECONDS = 60 * 60
+RETRY_MAX_ATTEMPTS = 10
+# Task fields the sync loop writes, remembered per loop to check queued updates against
+TRACKED_FIELDS = ('content', 'description', 'labels')
+
+
+def retry_delay(attempts, random=random.random):
+    """Return the seconds to wait before the next attempt, after `attempts` failed ones.
+
+    The delay doubles with every failed attempt up to `RETRY_MAX_DELAY_SECONDS`,
+    and a random half of it is jitter, so tasks that failed together are not
+    retried together.
+    """
+    delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + delay / 2 * random()
+
+
+class RetryPending(Exception):
+    """A write that repeats a queued update before it is due to be sent again."""
+
+
+def _field_names(update):
+    return ','.join(sorted(update.fields))
+
+
+def _payload(update):
+    return json.dumps(dict(update.fields), sort_keys=True)
+
+
+def _tracked_values(task):
+    # Copied, because the sync loop updates its local tasks before writing them
+    values = {}
+    for name in TRACKED_FIELDS:
+        value = getattr(task, name, None)
+        values[name] = list(value) if isinstance(value, (list, tuple)) else value
+    return values
+
+
+class RetryingTaskWriter:
+    """Task writer that queues failed updates and sends them again in later loops.
+
+    Wraps another task writer. Every `write` drops queued updates that a
+    different new update replaces, and queues the new updates that fail. A
+    new update equal to a queued one is sent only once the queued one is due,
+    and counts as its next attempt; until then it is reported as failed with a
+    `RetryPending` error. Other queued updates are only sent by `drain`, which
+    the sync loop calls once after its own writes.
+    Call `observe` with the tasks fetched at the start of every loop: failed
+    updates remember those tasks' field values, and `drain` checks queued
+    updates against them.
+    """
+
+    def __init__(self, writer, connection, clock=time.time, random=random.random):
+        self._writer = writer
+        self._connection = connection
+        self._clock = clock
+        self._random = random
+        self._tasks = None
+
+    def observe(self, tasks):
+        """Remember the open tasks fetched for this loop."""
+        self._tasks = {
+            task.id: _tracked_values(task)
+            for task in tasks
+            if not getattr(task, 'is_completed', False)
+        }
+
+    def write(self, updates):
+        updates = list(updates)
+        now = self._clock()
+        queued = self._queued(updates)
+
+        results = {}
+        send = []
+        for position, update in enumerate(updates):
+            row = queued.get((update.task_id, _field_names(update)))
+            if row is None:
+                send.append((position, update, 0, self._base(update)))
+                continue
+            payload, base, attempts, next_attempt_at = row
+            if payload != _payload(update):
+                self._remove(update)
+                send.append((position, update, 0, self._base(update)))
+            elif next_attempt_at > now:
+                results[position] = TaskWriteResult(update.task_id, RetryPending(
+                    f'waiting to retry after {attempts} failed attempts'))
+            else:
+                send.append((position, update, attempts, self._base(update) or base))
+
+        sent = self._writer.write([update for _, update, _, _ in send]) if send else []
+        for (position, update, attempts, base), result in zip(send, sent):
+            results[position] = result
+            if not result.ok:
+                self._record_failure(update, base, attempts + 1, result.error, now)
+            elif attempts:
+                self._remove(update)
+        return [results[position] for position in range(len(updates))]
+
+    def drain(self):
+        """Send the queued updates that are due and still wanted, and return how many succeeded.
+
+        Does nothing unless `observe` was called since the last drain, so a
+        loop that could not fetch the workspace does not replay stale updates.
+        """
+        tasks, self._tasks = self._tasks, None
+        if tasks is None:
+            return 0
+        return self._drain(tasks, self._clock())
+
+    def depth(self):
+        return self._connection.execute("SELECT COUNT(*) FROM write_retry_queue").fetchone()[0]
+
+    def _base(self, update):
+        if self._tasks is None or update.task_id not in self._tasks:
+            return None
+        values = self._tasks[update.task_id]
+        return {name: values.get(name) for name in update.fields}
+
+    def _queued(self, updates):
+        queued = {}
+        for update in updates:
+            key = (update.task_id, _field_names(update))
+            row = self._connection.execute(
+                "SELECT payload, base, attempts, next_attempt_at FROM write_retry_queue "
+                "WHERE task_id = ? AND field_names = ?",
+                key,
+            ).fetchone()
+            if row is not None:
+                payload, base, attempts, next_attempt_at = row
+                queued[key] = (payload, json.loads(base) if base is not None else None, attempts, next_attempt_at)
+        return queued
+
+    def _drain(self, tasks, now):
+        rows = self._connection.execute(
+            "SELECT task_id, payload, base, attempts FROM write_retry_queue "
+            "WHERE next_attempt_at <= ? ORDER BY next_attempt_at",
+            (now,),
+        ).fetchall()
+        if not rows:
+            return 0
+
+        queued = []
+        discarded = 0
+        for task_id, payload, base, attempts in rows:
+            update = TaskUpdate(task_id, json.loads(payload))
+            base = json.loads(base) if base is not None else None
+            if self._is_stale(update, base, tasks.get(task_id)):
+                self._remove(update)
+                discarded += 1
+            else:
+                queued.append((update, base, attempts))
+
+        updates = [update for update, _, _ in queued]
+        results = self._writer.write(updates) if updates else []
+        retried = failed = 0
+        for (update, base, attempts), result in zip(queued, results):
+            if result.ok:
+                self._remove(update)
+                retried += 1
+            else:
+                self._record_failure(update, base, attempts + 1, result.error, now)
+                failed += 1
+
+        logging.info(
+            'Retried queued task writes.',
+            extra={
+                "component": "retry_queue",
+                "operation": "drain",
+                "retried": retried,
+                "failed": failed,
+                "discarded": discarded,
+            })
+        return retried
+
+    @staticmethod
+    def _is_stale(update, base, current):
+        # Deleted and completed tasks are not fetched, so they have no current values
+        if current is None:
+            return True
+        current = {name: current.get(name) for name in update.fields}
+        # Already applied, or the task changed since the update was computed
+        return current == dict(update.fields) or (base is not None and current != base)
+
+    def _record_failure(self, update, base, attempts, error, now):
+        if attempts < RETRY_MAX_ATTEMPTS:
+            self._enqueue(update, base, error, attempts, now)
+            return
+        self._remove(update)
+        logging.warning(
+            f"Giving up on updating {_field_names(update)} for task {update.task_id} "
+            f"after {attempts} attempts: {error}",
+            extra={"component": "retry_queue", "operation": "drop", "task_id": update.task_id})
+
+    def _enqueue(self, update, base, error, attempts, now):
+        self._connection.execute(
+            """
+            INSERT INTO write_retry_queue
+                (task_id, field_names, payload, base, attempts, next_attempt_at, last_error)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (task_id, field_names) DO UPDATE SET
+                payload = excluded.payload,
+                base = excluded.base,
+                attempts = excluded.attempts,
+                next_attempt_at = excluded.next_attempt_at,
+                last_error = excluded.last_error
+            """,
+            (
+                update.task_id,
+                _field_names(update),
+                _payload(update),
+                json.dumps(base, sort_keys=True) if base is not None else None,
+                attempts,
+                now + retry_delay(attempts, self._random),
+                str(error),
+            ),
+        )
+
+    def _remove(self, update):
+        self._connection.execute(
+            "DELETE FROM write_retry_queue WHERE task_id = ? AND field_names = ?",
+            (update.task_id, _field_names(update)),
+        )
@@ -0,0 +1,141 @@
+"""Adaptive polling interval for the sync loop."""
+
+import email.utils
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_BACKOFF_FACTOR = 2.0
+# Backing off from a zero minimum interval starts at this many seconds
+MIN_BACKOFF_SECONDS = 1.0
+# Wake up this long after a date boundary, so the new day has surely begun
+WAKEUP_SLACK_SECONDS = 1.0
+
+
+def parse_retry_after(value, now=None):
+    """Return the seconds a `Retry-After` header asks to wait, or None if it cannot be read.
+
+    The header holds either a number of seconds or an HTTP date.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (retry_at - now).total_seconds())
+
+
+def seconds_until_wakeup(now, decision_date=None, end_hour=None):
+    """Return the seconds from `now` until a date-driven decision can change, or None.
+
+    `now` is a naive local datetime, because Autodoist decides what "today"
+    is in local time. The planner's `decision_date` changes a decision at its
+    local midnight. With an alternative end of day (`--end`), overdue daily
+    tasks are postponed until `end_hour`, so that hour and every midnight are
+    wakeups too.
+    """
+    midnight = datetime.min.time()
+    wakeups = []
+    if decision_date is not None:
+        wakeups.append(datetime.combine(decision_date, midnight))
+    if end_hour is not None:
+        wakeups.append(datetime.combine(now.date() + timedelta(days=1), midnight))
+        if end_hour < 24:
+            end_of_day = now.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+            if end_of_day > now:
+                wakeups.append(end_of_day)
+
+    if not wakeups:
+        return None
+    return max(0.0, (min(wakeups) - now).total_seconds()) + WAKEUP_SLACK_SECONDS
+
+
+class AdaptivePollScheduler:
+    """Chooses how long to wait between sync loops.
+
+    A loop that changed something resets the interval to `min_interval`.
+    Every idle loop multiplies it by `backoff_factor`, up to `max_interval`.
+    A `Retry-After` hint from a 429 response seen during a loop delays the
+    next loop by at least that long. With equal minimum and maximum the
+    interval is fixed, like the plain `--delay` sleep. A wakeup cuts a long
+    sleep short, so date-driven changes are not delayed by the backoff.
+
+    `sleep` may return early, for example when a webhook arrives. A
+    `Retry-After` hint is waited out with `retry_sleep` instead, which must
+    not, and the rest of the interval with `sleep`.
+    """
+
+    def __init__(self, min_interval, max_interval, backoff_factor=DEFAULT_BACKOFF_FACTOR,
+                 sleep=time.sleep, retry_sleep=time.sleep):
+        if min_interval < 0:
+            raise ValueError('min_interval must not be negative')
+        if max_interval < min_interval:
+            raise ValueError('max_interval must not be smaller than min_interval')
+        if backoff_factor < 1:
+            raise ValueError('backoff_factor must be at least 1')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.interval = min_interval
+        self._sleep = sleep
+        self._retry_sleep = retry_sleep
+        self._retry_after = None
+        self._lock = threading.Lock()
+
+    def attach(self, session):
+        """Pick up `Retry-After` hints from the 429 responses of a `requests.Session`."""
+        session.hooks.setdefault('response', []).append(self._on_response)
+        return session
+
+    def observe_retry_after(self, seconds):
+        with self._lock:
+            if self._retry_after is None or seconds > self._retry_after:
+                self._retry_after = seconds
+
+    def next_interval(self, changes):
+        """Update the interval after a loop and return it."""
+        if changes:
+            self.interval = self.min_interval
+        else:
+            backed_off = max(self.interval * self.backoff_factor, MIN_BACKOFF_SECONDS)
+            self.interval = min(self.max_interval, max(backed_off, self.min_interval))
+        return self.interval
+
+    def wait(self, loop_seconds, changes, wake_in=None):
+        """Sleep until the next loop is due and return the seconds slept.
+
+        The interval counts from the start of the loop, so the time the loop
+        took is subtracted. `wake_in` seconds from now, if given, is the
+        latest the next loop may start. A `Retry-After` hint is waited out in
+        full, even past a wakeup.
+        """
+        interval = self.next_interval(changes)
+        with self._lock:
+            retry_after, self._retry_after = self._retry_after, None
+
+        sleep_seconds = max(0.0, interval - loop_seconds)
+        if wake_in is not None:
+            sleep_seconds = min(sleep_seconds, max(0.0, wake_in))
+        retry_seconds = retry_after or 0.0
+        if retry_seconds > 0:
+            self._retry_sleep(retry_seconds)
+        if sleep_seconds > retry_seconds:
+            self._sleep(sleep_seconds - retry_seconds)
+        return max(sleep_seconds, retry_seconds)
+
+    def _on_response(self, response, *args, **kwargs):
+        if response.status_code != 429:
+            return
+        seconds = parse_retry_after(response.headers.get('Retry-After'))
+        if seconds is not None:
+            self.observe_retry_after(seconds)
@@ -0,0 +1,101 @@
+"""Writers that push task updates to Todoist.
+
+The sync loop describes every task write as a `TaskUpdate` and hands a list of
+them to a task writer, which reports a `TaskWriteResult` per update so partial
+failures can be logged per task.
+"""
+
+import uuid
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from todoist_sync import SYNC_COMMAND_BATCH_SIZE, SyncCommandError
+
+
+@dataclass(frozen=True, slots=True)
+class TaskUpdate:
+    task_id: str
+    fields: Mapping[str, object]
+
+
+@dataclass(frozen=True, slots=True)
+class TaskWriteResult:
+    task_id: str
+    error: Exception | None = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class RestTaskWriter:
+    """Sends one REST `update_task` request per task update.
+
+    Updates are independent of each other, so up to `concurrency` requests are
+    in flight at once. Results keep the order of the updates.
+    """
+
+    def __init__(self, api, concurrency=1):
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        self._api = api
+        self._concurrency = concurrency
+
+    def write(self, updates):
+        updates = list(updates)
+        if self._concurrency == 1 or len(updates) <= 1:
+            return [self._write_one(update) for update in updates]
+
+        with ThreadPoolExecutor(max_workers=self._concurrency) as executor:
+            return list(executor.map(self._write_one, updates))
+
+    def _write_one(self, update):
+        try:
+            self._api.update_task(task_id=update.task_id, **update.fields)
+        except Exception as error:
+            return TaskWriteResult(update.task_id, error)
+        return TaskWriteResult(update.task_id)
+
+
+class SyncCommandTaskWriter:
+    """Packs task updates into Sync API `item_update` command batches.
+
+    Each batch is a single HTTP request. Todoist reports a status per command,
+    which is mapped back to the task it belongs to. If the request for a batch
+    fails as a whole, every update in that batch is reported as failed.
+    """
+
+    def __init__(self, sync_client, batch_size=SYNC_COMMAND_BATCH_SIZE):
+        self._sync_client = sync_client
+        self._batch_size = batch_size
+
+    def write(self, updates):
+        updates = list(updates)
+        results = []
+        for start in range(0, len(updates), self._batch_size):
+            results.extend(self._write_batch(updates[start:start + self._batch_size]))
+        return results
+
+    def _write_batch(self, updates):
+        commands = [
+            {
+                'type': 'item_update',
+                'uuid': str(uuid.uuid4()),
+                'args': {'id': update.task_id, **update.fields},
+            }
+            for update in updates
+        ]
+        try:
+            statuses = self._sync_client.run_commands(commands)
+        except Exception as error:
+            return [TaskWriteResult(update.task_id, error) for update in updates]
+
+        results = []
+        for update, command in zip(updates, commands):
+            status = statuses.get(command['uuid'])
+            if status == 'ok':
+                results.append(TaskWriteResult(update.task_id))
+            else:
+                results.append(TaskWriteResult(update.task_id, SyncCommandError(status)))
+        return results
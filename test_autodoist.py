@@ -12,21 +12,26 @@ import argparse
 import io
 import json
 import logging
+import re
 import sqlite3
+import threading
 import requests
 from datetime import date, datetime, timedelta
-from unittest.mock import MagicMock, patch, PropertyMock
+from unittest.mock import MagicMock, call, patch, PropertyMock
 from dataclasses import dataclass, field
 from typing import Optional
 
 import pytest
 
+import next_action_planner
 from next_action_planner import (
+    ActionableDateMarkers,
     AutodoistMetadataSnapshot,
     DescriptionChange,
     INACTIVE_RELATIVE_ACTIONABLE_DATE_WARNING,
     LabelChange,
     LabelStrategy,
+    LabelStrategyParser,
     PlannerConfig,
     ProjectSnapshot,
     RecordProjectStrategy,
@@ -37,11 +42,16 @@ from next_action_planner import (
     SelectionStrategy,
     TaskSnapshot,
     WorkspaceSnapshot,
+    build_workspace_index,
+    label_strategy_parser_for,
+    scan_actionable_date_markers,
     label_strategy_to_legacy_type,
+    legacy_type_to_label_strategy,
     plan_next_action_labels,
     plan_parentless_next_action_labels,
     parse_label_strategy,
 )
+from task_writer import TaskUpdate, TaskWriteResult
 
 
 # ---------------------------------------------------------------------------
@@ -123,6 +133,11 @@ from autodoist import (
     db_check_existance, db_read_value, db_update_value,
     execute_query, execute_read_query, get_labels_with_startup_retry,
     initialise_api, verify_label_existance, configure_logging,
+    fetch_workspace, apply_label_updates, apply_planner_description_changes,
+    build_autodoist_metadata_snapshot, migrate_metadata_schema, initialise_sqlite,
+    metadata_transaction, apply_planner_metadata_commands, db_check_existance_many,
+    create_metadata_tables, WorkspaceTaskIndex, find_and_headerify_all_children,
+    METADATA_MIGRATIONS,
 )
 
 
@@ -153,8 +168,8 @@ def make_task(id, content="Task", parent_id=None, order=0, labels=None,
     )
 
 
-def create_test_db():
-    """Create an in-memory SQLite database with the autodoist schema."""
+def create_legacy_test_db():
+    """Create an in-memory SQLite database with the original, unmigrated schema."""
     conn = sqlite3.connect(":memory:")
     cursor = conn.cursor()
     cursor.execute("""
@@ -185,6 +200,13 @@ def create_test_db():
     return conn
 
 
+def create_test_db():
+    """Create an in-memory SQLite database with the autodoist schema."""
+    conn = create_legacy_test_db()
+    migrate_metadata_schema(conn)
+    return conn
+
+
 def http_error(status_code):
     response = requests.Response()
     response.status_code = status_code
@@ -337,6 +359,11 @@ class TestStartupVerification:
             label=self.LABEL,
             regeneration=None,
             end=None,
+            write_concurrency=1,
+            delay=5,
+            max_delay=None,
+            webhook_port=None,
+            webhook_secret=None,
         )
         api = MagicMock()
 
@@ -347,6 +374,81 @@ class TestStartupVerification:
         assert result is api
         verify_label.assert_called_once_with(api, self.LABEL, 1)
 
+    def test_initialise_api_rejects_write_concurrency_below_one(self):
+        args = argparse.Namespace(
+            api_key="fake",
+            label=self.LABEL,
+            regeneration=None,
+            end=None,
+            write_concurrency=0,
+            delay=5,
+            max_delay=None,
+            webhook_port=None,
+            webhook_secret=None,
+        )
+
+        with pytest.raises(SystemExit) as error:
+            initialise_api(args)
+
+        assert error.value.code == 1
+
+    @pytest.mark.parametrize("max_delay", [0, 4])
+    def test_initialise_api_rejects_max_delay_below_delay(self, max_delay):
+        args = argparse.Namespace(
+            api_key="fake",
+            label=self.LABEL,
+            regeneration=None,
+            end=None,
+            write_concurrency=1,
+            delay=5,
+            max_delay=max_delay,
+            webhook_port=None,
+            webhook_secret=None,
+        )
+
+        with pytest.raises(SystemExit) as error:
+            initialise_api(args)
+
+        assert error.value.code == 1
+
+    def test_initialise_api_requires_a_webhook_secret(self):
+        args = argparse.Namespace(
+            api_key="fake",
+            label=self.LABEL,
+            regeneration=None,
+            end=None,
+            write_concurrency=1,
+            delay=5,
+            max_delay=None,
+            webhook_port=8090,
+            webhook_secret=None,
+        )
+
+        with pytest.raises(SystemExit) as error:
+            initialise_api(args)
+
+        assert error.value.code == 1
+
+    @pytest.mark.parametrize("webhook_fallback", [-1, 0])
+    def test_initialise_api_rejects_webhook_fallback_below_one(self, webhook_fallback):
+        args = argparse.Namespace(
+            api_key="fake",
+            label=self.LABEL,
+            regeneration=None,
+            end=None,
+            write_concurrency=1,
+            delay=5,
+            max_delay=None,
+            webhook_port=8090,
+            webhook_secret="secret",
+            webhook_fallback=webhook_fallback,
+        )
+
+        with pytest.raises(SystemExit) as error:
+            initialise_api(args)
+
+        assert error.value.code == 1
+
     def test_label_creation_errors_are_not_retried(self):
         api = MagicMock()
         api.get_labels.return_value = [[]]
@@ -432,6 +534,50 @@ class TestLabelStrategyParser:
 
         assert label_strategy_to_legacy_type(strategy) == 'xsp'
 
+    def test_repeated_names_are_served_from_the_cache(self):
+        parser = LabelStrategyParser()
+
+        first = parser.parse('Project -=', 3)
+        second = parser.parse('Project -=', 3)
+        parser.parse('Project -=', 2)
+
+        assert first is second
+        assert parser.cache_info().hits == 1
+        assert parser.cache_info().misses == 2
+
+    def test_cache_size_is_bounded(self):
+        parser = LabelStrategyParser(cache_size=2)
+
+        for name in ('A -', 'B -', 'C -', 'A -'):
+            parser.parse(name, 1)
+
+        assert parser.cache_info().currsize == 2
+        assert parser.cache_info().misses == 4
+
+    def test_configs_with_the_same_suffixes_share_a_parser(self):
+        first = label_strategy_parser_for(PlannerConfig(next_action_label='a'))
+        second = label_strategy_parser_for(make_args())
+
+        assert first is second
+        assert label_strategy_parser_for(make_args(p_suffix='+')) is not first
+
+    def test_cached_results_match_the_uncached_parser(self):
+        names = ['Project -=-', 'Section =-', 'Task -', 'Project', 'Project_ignore',
+                 'Project_ignore =', 'My - Project', 'Inbox', None, '#@', 'Tail ==--']
+        for args in (make_args(), make_args(all_projects=True, ignore_suffix=True),
+                     make_args(s_suffix='#', p_suffix='@')):
+            parser = LabelStrategyParser(
+                args.s_suffix, args.p_suffix, args.all_projects, args.ignore_suffix)
+            for _ in range(2):
+                for name in names:
+                    for num in (1, 2, 3):
+                        uncached = (
+                            None if name in (None, 'Inbox')
+                            else parser._parse(name, num)
+                        )
+                        assert parser.parse(name, num) == uncached
+                        assert parse_label_strategy(args, name, num) == uncached
+
 
 # ---------------------------------------------------------------------------
 # Group 1b: TestPlannerSnapshots - Normalized planner input records
@@ -776,6 +922,54 @@ class TestChildPropagationPlanner:
             LabelChange(task_id='child-2', labels=(self.LABEL,)),
         )
 
+    def test_deep_task_tree_does_not_hit_the_recursion_limit(self):
+        depth = sys.getrecursionlimit() * 3
+        tasks = [self._task('t0', order=1)] + [
+            self._task(f't{level}', parent_id=f't{level - 1}', order=1)
+            for level in range(1, depth)
+        ]
+
+        result = self._plan(self._workspace(tuple(tasks)))
+
+        assert result.label_changes == (
+            LabelChange(task_id=f't{depth - 1}', labels=(self.LABEL,)),
+        )
+        assert [command.task_id for command in result.metadata_commands
+                if isinstance(command, RecordTaskParentStrategy)] == [
+            f't{level}' for level in range(1, depth)]
+
+    def test_strategy_flip_records_each_child_once_in_order(self):
+        children = tuple(
+            self._task(f'child-{index}', parent_id='parent', order=index)
+            for index in range(2000)
+        )
+        metadata = AutodoistMetadataSnapshot(task_parent_strategies={
+            child.id: SelectionStrategy.SEQUENTIAL for child in children
+        })
+
+        result = self._plan(
+            self._workspace((self._task('parent', order=1),) + children, project_name='Work ='),
+            metadata,
+        )
+
+        assert [command for command in result.metadata_commands
+                if isinstance(command, RecordTaskParentStrategy)] == [
+            RecordTaskParentStrategy(child.id, SelectionStrategy.PARALLEL) for child in children]
+
+    def test_parent_strategies_are_recorded_depth_first(self):
+        workspace = self._workspace((
+            self._task('root', order=1),
+            self._task('a', parent_id='root', order=1),
+            self._task('b', parent_id='root', order=2),
+            self._task('a1', parent_id='a', order=1),
+            self._task('b1', parent_id='b', order=1),
+        ), project_name='Work =')
+
+        result = self._plan(workspace)
+
+        assert [command.task_id for command in result.metadata_commands
+                if isinstance(command, RecordTaskParentStrategy)] == ['a', 'b', 'a1', 'b1']
+
     def test_sequential_child_propagation_moves_label_after_reorder(self):
         workspace = self._workspace((
             self._task('parent', labels=(self.LABEL,), order=1),
@@ -840,6 +1034,16 @@ class TestActionableDatePlanner:
     LABEL = 'next_action'
     TODAY = date(2026, 7, 2)
 
+    # Every boundary case runs through both the pure-Python and NumPy filters
+    @pytest.fixture(autouse=True, params=['python', 'numpy'])
+    def date_filter_path(self, request, monkeypatch):
+        if request.param == 'numpy':
+            pytest.importorskip('numpy')
+            monkeypatch.setattr(next_action_planner, 'VECTORIZED_DATE_FILTER_MIN_TASKS', 0)
+        else:
+            monkeypatch.setattr(next_action_planner, 'np', None)
+        return request.param
+
     def _workspace(self, tasks, project_name='Work -'):
         return WorkspaceSnapshot(
             projects=(
@@ -1208,6 +1412,275 @@ class TestActionableDatePlanner:
             LabelChange(task_id='child', labels=()),
         )
 
+    def test_vectorized_filters_match_python_filters_around_boundaries(self):
+        np = pytest.importorskip('numpy')
+        contents = (
+            'Task', 'Task start=01-07-2026', 'Task start=02-07-2026', 'Task start=03-07-2026',
+            'Task start=due-0d', 'Task start=due-1d', 'Task start=due-2w', 'Task start=31-02-2026',
+        )
+        tasks = []
+        for index in range(400):
+            parent_id = f't{index - 1}' if index % 3 else None
+            due_offset = index % 17 - 3
+            tasks.append(self._task(
+                f't{index}',
+                content=contents[index % len(contents)],
+                parent_id=parent_id,
+                labels=(self.LABEL,) if index % 2 else (),
+                order=index,
+                due_date=self.TODAY + timedelta(days=due_offset) if index % 5 else None,
+            ))
+        workspace = self._workspace(tuple(tasks))
+
+        for hide_future in (0, 1, 7, 14):
+            with patch.object(next_action_planner, 'np', None):
+                python_result = self._plan(workspace, hide_future=hide_future)
+            with patch.object(next_action_planner, 'VECTORIZED_DATE_FILTER_MIN_TASKS', 0), \
+                    patch.object(next_action_planner, 'np', np):
+                assert self._plan(workspace, hide_future=hide_future) == python_result
+
+    def test_next_decision_date_is_the_earliest_flip(self):
+        workspace = self._workspace((
+            self._task('start', content='Task start=06-07-2026', order=1),
+            self._task('relative', content='Task start=due-2d', due_date=date(2026, 7, 9), order=2),
+            self._task('hidden', due_date=date(2026, 7, 20), order=3),
+            self._task('past', content='Task start=01-07-2026', order=4),
+        ))
+
+        assert self._plan(workspace).next_decision_date == date(2026, 7, 6)
+        assert self._plan(workspace, hide_future=15).next_decision_date == date(2026, 7, 6)
+        assert self._plan(workspace, hide_future=16).next_decision_date == date(2026, 7, 5)
+
+    def test_next_decision_date_is_none_without_future_dates(self):
+        workspace = self._workspace((
+            self._task('plain', order=1),
+            self._task('started', content='Task start=02-07-2026', order=2),
+            self._task('due', due_date=date(2026, 7, 20), order=3),
+        ))
+
+        assert self._plan(workspace).next_decision_date is None
+
+    def test_labels_hold_until_the_next_decision_date(self):
+        workspace = self._workspace((
+            self._task('start', content='Task start=08-07-2026', order=1),
+            self._task('relative', content='Task start=due-3d', due_date=date(2026, 7, 12), order=2),
+            self._task('hidden', due_date=date(2026, 7, 10), order=3),
+        ), project_name='Work =')
+
+        today = self.TODAY
+        result = self._plan(workspace, today=today, hide_future=4)
+        while result.next_decision_date is not None:
+            decision_date = result.next_decision_date
+            for day in range((decision_date - today).days):
+                later = self._plan(workspace, today=today + timedelta(days=day), hide_future=4)
+                assert later.label_changes == result.label_changes
+            today = decision_date
+            next_result = self._plan(workspace, today=today, hide_future=4)
+            assert next_result.label_changes != result.label_changes
+            result = next_result
+
+        assert today == date(2026, 7, 9)
+
+
+# ---------------------------------------------------------------------------
+# Group 1f: TestActionableDateMarkers - Single-pass date marker scanner
+# ---------------------------------------------------------------------------
+
+class TestActionableDateMarkers:
+    CONTENTS = (
+        'Task',
+        'Task start=01-08-2026',
+        'Task start=31-02-2026',
+        'start=31-02-2026 start=01-08-2026',
+        'Task start=due-3d',
+        'Task start=due-2w',
+        'Task start=due-3d start=due-1w',
+        'start=01-08-2026 start=02-08-2026 start=due-1d',
+        'start=due-4w start=15-07-2026',
+        'start=due-d start=due-x5d',
+        'Task start=1-8-2026',
+        'start=due-10dstart=10-10-2026',
+    )
+
+    def _reference(self, content, dateformat):
+        start_date = None
+        absolute = re.search(r'start=(\d\d-\d\d-\d\d\d\d)', content)
+        if absolute:
+            try:
+                parsed = datetime.strptime(absolute.group(1), dateformat)
+                start_date = date(parsed.year, parsed.month, parsed.day)
+            except ValueError:
+                pass
+
+        relative_days = None
+        relative = re.search(r'start=due-(\d+)([dw])', content)
+        if relative:
+            amount = int(relative.group(1))
+            relative_days = amount if relative.group(2) == 'd' else amount * 7
+
+        return ActionableDateMarkers(start_date=start_date, start_days_before_due=relative_days)
+
+    def test_scanner_matches_separate_searches(self):
+        for dateformat in ('%d-%m-%Y', '%m-%d-%Y'):
+            for content in self.CONTENTS:
+                assert scan_actionable_date_markers(content, dateformat) == \
+                    self._reference(content, dateformat), content
+
+    def test_unchanged_content_is_served_from_the_cache(self):
+        content = 'Cached task start=due-5d'
+        scan_actionable_date_markers(content, '%d-%m-%Y')
+        hits = scan_actionable_date_markers.cache_info().hits
+
+        scan_actionable_date_markers(content, '%d-%m-%Y')
+
+        assert scan_actionable_date_markers.cache_info().hits == hits + 1
+
+
+# ---------------------------------------------------------------------------
+# Group 1g: TestWorkspaceIndex - Lookups shared by both planner passes
+# ---------------------------------------------------------------------------
+
+class TestWorkspaceIndex:
+    LABEL = 'next_action'
+
+    def _workspace(self):
+        return WorkspaceSnapshot(
+            projects=(
+                ProjectSnapshot(id='p2', name='Home =', order=2, is_inbox_project=False),
+                ProjectSnapshot(id='p1', name='Work -', order=1, is_inbox_project=False),
+            ),
+            sections=(
+                SectionSnapshot(id='s2', name='Later', project_id='p1', order=2),
+                SectionSnapshot(id='s1', name='Next =', project_id='p1', order=1),
+            ),
+            tasks=(
+                TaskSnapshot(id='c2', content='Child', project_id='p1', section_id='s1',
+                             parent_id='t1', labels=(), order=2),
+                TaskSnapshot(id='t1', content='Parent -', project_id='p1', section_id='s1',
+                             parent_id=None, labels=(), order=1),
+                TaskSnapshot(id='c1', content='Child', project_id='p1', section_id='s1',
+                             parent_id='t1', labels=(), order=1),
+                TaskSnapshot(id='t0', content='Loose', project_id='p1', section_id=None,
+                             parent_id=None, labels=(), order=3),
+            ),
+        )
+
+    def test_index_holds_sorted_orders_and_strategies(self):
+        index = build_workspace_index(
+            self._workspace(), PlannerConfig(next_action_label=self.LABEL))
+
+        assert [project.id for project in index.projects] == ['p1', 'p2']
+        assert [section.id for section in index.sections_by_project['p1']] == [None, 's1', 's2']
+        assert [task.id for task in index.children_by_parent['t1']] == ['c1', 'c2']
+        assert [task.id for task in index.root_tasks] == ['t1', 't0']
+        assert index.task_strategies['t1'] == LabelStrategy(task_selection=SelectionStrategy.SEQUENTIAL)
+        assert index.section_strategies['s1'] == LabelStrategy(
+            section_selection=SelectionStrategy.PARALLEL,
+            task_selection=SelectionStrategy.PARALLEL,
+        )
+
+    def test_names_are_parsed_once_per_plan(self, monkeypatch):
+        import next_action_planner
+        parser = LabelStrategyParser()
+        monkeypatch.setattr(next_action_planner, 'label_strategy_parser_for', lambda config: parser)
+        workspace = self._workspace()
+
+        plan_next_action_labels(
+            workspace,
+            PlannerConfig(next_action_label=self.LABEL),
+            AutodoistMetadataSnapshot(),
+        )
+
+        cache_info = parser.cache_info()
+        assert cache_info.hits + cache_info.misses == (
+            len(workspace.projects) + len(workspace.sections) + len(workspace.tasks))
+
+    def test_parentless_planner_accepts_a_prebuilt_index(self):
+        workspace = self._workspace()
+        config = PlannerConfig(next_action_label=self.LABEL)
+        metadata = AutodoistMetadataSnapshot()
+
+        assert plan_parentless_next_action_labels(
+            workspace, config, metadata, build_workspace_index(workspace, config),
+        ) == plan_parentless_next_action_labels(workspace, config, metadata)
+
+
+# ---------------------------------------------------------------------------
+# Group 1h: TestPlannerStats - Optional phase timings and counters
+# ---------------------------------------------------------------------------
+
+class TestPlannerStats:
+    LABEL = 'next_action'
+
+    def _workspace(self):
+        return WorkspaceSnapshot(
+            projects=(ProjectSnapshot(id='p1', name='Work -', order=1, is_inbox_project=False),),
+            sections=(),
+            tasks=(
+                TaskSnapshot(id='t1', content='Parent =', project_id='p1', section_id=None,
+                             parent_id=None, labels=(), order=1),
+                TaskSnapshot(id='c1', content='Child', project_id='p1', section_id=None,
+                             parent_id='t1', labels=(), order=1),
+                TaskSnapshot(id='c2', content='Child', project_id='p1', section_id=None,
+                             parent_id='t1', labels=(), order=2),
+                TaskSnapshot(id='t2', content='Later', project_id='p1', section_id=None,
+                             parent_id=None, labels=(self.LABEL,), order=2),
+            ),
+        )
+
+    def test_stats_are_not_collected_by_default(self):
+        result = plan_next_action_labels(
+            self._workspace(), PlannerConfig(next_action_label=self.LABEL), AutodoistMetadataSnapshot())
+
+        assert result.stats is None
+
+    def test_stats_count_planner_work(self):
+        config = PlannerConfig(next_action_label=self.LABEL, collect_stats=True)
+
+        result = plan_next_action_labels(self._workspace(), config, AutodoistMetadataSnapshot())
+
+        stats = result.stats
+        assert list(stats.phase_seconds) == [
+            'index', 'root_selection', 'child_propagation', 'eligibility',
+            'date_filters', 'next_decision', 'descriptions', 'label_changes',
+        ]
+        assert stats.tasks == 4
+        assert stats.tree_tasks_visited == 4
+        assert stats.labels_added == 2
+        assert stats.labels_removed == 1
+        assert stats.metadata_commands == len(result.metadata_commands)
+        assert stats.description_changes == 0
+
+    def test_stats_do_not_change_the_result(self):
+        workspace = self._workspace()
+        metadata = AutodoistMetadataSnapshot()
+
+        assert plan_next_action_labels(
+            workspace, PlannerConfig(next_action_label=self.LABEL, collect_stats=True), metadata,
+        ) == plan_next_action_labels(workspace, PlannerConfig(next_action_label=self.LABEL), metadata)
+
+    def test_parsed_strategies_are_counted_once(self, monkeypatch):
+        parser = LabelStrategyParser()
+        monkeypatch.setattr(next_action_planner, 'label_strategy_parser_for', lambda config: parser)
+        config = PlannerConfig(next_action_label=self.LABEL, collect_stats=True)
+
+        first = plan_next_action_labels(self._workspace(), config, AutodoistMetadataSnapshot())
+        second = plan_next_action_labels(self._workspace(), config, AutodoistMetadataSnapshot())
+
+        assert first.stats.strategies_parsed == 4
+        assert second.stats.strategies_parsed == 0
+
+    def test_log_fields_are_flat(self):
+        config = PlannerConfig(next_action_label=self.LABEL, collect_stats=True)
+        stats = plan_next_action_labels(self._workspace(), config, AutodoistMetadataSnapshot()).stats
+
+        fields = stats.as_log_fields()
+
+        assert fields['tasks'] == 4
+        assert fields['phase_index_seconds'] >= 0
+        assert fields['planner_seconds'] == pytest.approx(sum(stats.phase_seconds.values()), abs=1e-5)
+        assert all(not isinstance(value, dict) for value in fields.values())
+
 
 # ---------------------------------------------------------------------------
 # Group 1: TestCheckName - Suffix parsing
@@ -1579,6 +2052,535 @@ class TestGetType:
         assert ptype is None
 
 
+# ---------------------------------------------------------------------------
+# Group 4a: TestMetadataSnapshot - Loading Autodoist metadata for the planner
+# ---------------------------------------------------------------------------
+
+class TestMetadataSnapshot:
+    """Tests for build_autodoist_metadata_snapshot() with real in-memory SQLite."""
+
+    def setup_method(self):
+        self.conn = create_test_db()
+
+    def teardown_method(self):
+        self.conn.close()
+
+    def _store(self, model, **values):
+        db_check_existance(self.conn, model)
+        for column, value in values.items():
+            db_update_value(self.conn, model, column, value)
+
+    def test_snapshot_matches_single_row_reads(self):
+        project = FakeProject(id="p1", name="Work -")
+        section = FakeSection(id="s1", name="Next =", project_id="p1")
+        tasks = [
+            make_task("t1", content="Parent -"),
+            make_task("t2", parent_id="t1"),
+            make_task("t3"),
+        ]
+        self._store(project, project_type="sss")
+        self._store(section, section_type="xpp")
+        self._store(tasks[0], task_type="xxs")
+        self._store(tasks[1], parent_type="s")
+
+        metadata = build_autodoist_metadata_snapshot(
+            self.conn, [project], [section], tasks)
+
+        def read(model, column):
+            rows = db_read_value(self.conn, model, column)
+            return rows[0][0] if rows else None
+
+        assert metadata == AutodoistMetadataSnapshot(
+            project_strategies={"p1": legacy_type_to_label_strategy(read(project, "project_type"))},
+            section_strategies={"s1": legacy_type_to_label_strategy(read(section, "section_type"))},
+            task_strategies={
+                task.id: legacy_type_to_label_strategy(read(task, "task_type"))
+                for task in tasks
+            },
+            task_parent_strategies={
+                "t1": None,
+                "t2": SelectionStrategy.SEQUENTIAL,
+                "t3": None,
+            },
+        )
+        assert metadata.project_strategies["p1"].project_selection == SelectionStrategy.SEQUENTIAL
+
+    def test_unknown_items_have_no_stored_strategy(self):
+        metadata = build_autodoist_metadata_snapshot(
+            self.conn,
+            [FakeProject(id="p1", name="Work")],
+            [FakeSection(id="s1", name="Next", project_id="p1")],
+            [make_task("t1")],
+        )
+
+        assert metadata.project_strategies == {"p1": None}
+        assert metadata.section_strategies == {"s1": None}
+        assert metadata.task_strategies == {"t1": None}
+        assert metadata.task_parent_strategies == {"t1": None}
+
+
+# ---------------------------------------------------------------------------
+# Group 4b: TestMetadataSchema - Schema migrations and UPSERT writes
+# ---------------------------------------------------------------------------
+
+class TestMetadataSchema:
+    """Tests for the versioned metadata schema with real SQLite databases."""
+
+    def _legacy_db_with_rows(self):
+        conn = create_legacy_test_db()
+        conn.executemany(
+            "INSERT INTO projects (project_id, project_type) VALUES (?, ?)",
+            [("p1", "sss"), ("p1", "ppp"), ("p2", "xxp")],
+        )
+        conn.execute(
+            "INSERT INTO tasks (task_id, task_type, parent_type, due_date, r_tag) "
+            "VALUES (12345, 'xxp', NULL, NULL, 0)")
+        conn.commit()
+        return conn
+
+    def test_migration_keeps_first_row_per_id_and_stores_text_ids(self):
+        conn = self._legacy_db_with_rows()
+        try:
+            migrate_metadata_schema(conn)
+
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(METADATA_MIGRATIONS)
+            assert conn.execute(
+                "SELECT project_id, project_type FROM projects ORDER BY id").fetchall() == [
+                ("p1", "sss"), ("p2", "xxp")]
+            assert conn.execute(
+                "SELECT typeof(task_id), task_id FROM tasks").fetchall() == [("text", "12345")]
+
+            metadata = build_autodoist_metadata_snapshot(
+                conn, [], [], [make_task("12345", content="Parent =")])
+            assert metadata.task_strategies["12345"] == LabelStrategy(
+                task_selection=SelectionStrategy.PARALLEL)
+        finally:
+            conn.close()
+
+    def test_migration_runs_once(self):
+        conn = self._legacy_db_with_rows()
+        try:
+            migrate_metadata_schema(conn)
+            migrate_metadata_schema(conn)
+
+            assert conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 2
+        finally:
+            conn.close()
+
+    def test_duplicate_ids_are_rejected(self):
+        conn = create_test_db()
+        try:
+            conn.execute("INSERT INTO sections (section_id) VALUES ('s1')")
+            with pytest.raises(sqlite3.IntegrityError):
+                conn.execute("INSERT INTO sections (section_id) VALUES ('s1')")
+        finally:
+            conn.close()
+
+    def test_update_value_inserts_missing_record_then_updates_it(self):
+        conn = create_test_db()
+        task = make_task("t1")
+        try:
+            db_update_value(conn, task, "task_type", "xxs")
+            db_update_value(conn, task, "parent_type", "p")
+            db_check_existance(conn, task)
+
+            assert conn.execute(
+                "SELECT task_id, task_type, parent_type, r_tag FROM tasks").fetchall() == [
+                ("t1", "xxs", "p", 0)]
+        finally:
+            conn.close()
+
+    def test_initialise_sqlite_migrates_existing_file_in_place(self, tmp_path, monkeypatch):
+        legacy = sqlite3.connect(tmp_path / "metadata.sqlite")
+        legacy.execute(
+            "CREATE TABLE projects (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "project_id INTEGER, project_type TEXT)")
+        legacy.execute("INSERT INTO projects (project_id, project_type) VALUES (42, 'sss')")
+        legacy.commit()
+        legacy.close()
+        monkeypatch.chdir(tmp_path)
+
+        conn = initialise_sqlite()
+        try:
+            assert db_read_value(conn, FakeProject(id="42", name="Work"), "project_type") == [("sss",)]
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(METADATA_MIGRATIONS)
+        finally:
+            conn.close()
+
+    def test_new_database_starts_with_the_migrated_schema(self, tmp_path, monkeypatch):
+        def schema(conn):
+            return {
+                table: (
+                    conn.execute(f"PRAGMA table_info({table})").fetchall(),
+                    [row[1:] for row in conn.execute(f"PRAGMA index_list({table})").fetchall()],
+                )
+                for table in ("projects", "sections", "tasks", "write_retry_queue")
+            }
+
+        monkeypatch.chdir(tmp_path)
+        fresh = initialise_sqlite()
+        migrated = create_test_db()
+        try:
+            assert fresh.execute("PRAGMA user_version").fetchone()[0] == len(METADATA_MIGRATIONS)
+            assert fresh.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%_migrated'").fetchone()[0] == 0
+            assert schema(fresh) == schema(migrated)
+        finally:
+            fresh.close()
+            migrated.close()
+
+
+# ---------------------------------------------------------------------------
+# Group 4c: TestMetadataTransaction - One transaction per sync loop
+# ---------------------------------------------------------------------------
+
+class TestMetadataTransaction:
+    """Tests for grouping metadata writes, using a database file and a second reader."""
+
+    def setup_method(self):
+        self.conn = create_test_db()
+
+    def teardown_method(self):
+        self.conn.close()
+
+    def _file_connections(self, tmp_path):
+        writer = sqlite3.connect(tmp_path / "metadata.sqlite")
+        writer.execute("PRAGMA journal_mode = wal")
+        create_metadata_tables(writer)
+        reader = sqlite3.connect(tmp_path / "metadata.sqlite")
+        return writer, reader
+
+    def test_writes_are_committed_when_the_transaction_ends(self, tmp_path):
+        writer, reader = self._file_connections(tmp_path)
+        project = FakeProject(id="p1", name="Work -")
+        try:
+            with metadata_transaction(writer) as transaction:
+                db_update_value(transaction, project, "project_type", "sss")
+                assert reader.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 0
+
+            assert reader.execute("SELECT project_type FROM projects").fetchall() == [("sss",)]
+        finally:
+            writer.close()
+            reader.close()
+
+    def test_failure_rolls_back_all_writes(self):
+        project = FakeProject(id="p1", name="Work -")
+        db_update_value(self.conn, project, "project_type", "ppp")
+
+        with pytest.raises(RuntimeError):
+            with metadata_transaction(self.conn) as transaction:
+                db_update_value(transaction, project, "project_type", "sss")
+                db_check_existance(transaction, make_task("t1"))
+                raise RuntimeError("loop failed")
+
+        assert db_read_value(self.conn, project, "project_type") == [("ppp",)]
+        assert self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] == 0
+
+    def test_nested_transaction_joins_the_outer_one(self):
+        project = FakeProject(id="p1", name="Work -")
+
+        with pytest.raises(RuntimeError):
+            with metadata_transaction(self.conn) as transaction:
+                with metadata_transaction(transaction) as nested:
+                    assert nested is transaction
+                    db_update_value(nested, project, "project_type", "sss")
+                raise RuntimeError("loop failed")
+
+        assert self.conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 0
+
+    def test_queries_outside_the_transaction_object_commit_right_away(self, tmp_path):
+        writer, reader = self._file_connections(tmp_path)
+        try:
+            with metadata_transaction(writer):
+                db_update_value(writer, FakeProject(id="p1", name="Work -"), "project_type", "sss")
+                assert reader.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 1
+        finally:
+            writer.close()
+            reader.close()
+
+    def test_planner_metadata_commands_are_written_per_type(self):
+        with metadata_transaction(self.conn) as transaction:
+            apply_planner_metadata_commands(transaction, (
+                RecordProjectStrategy("p1", LabelStrategy(
+                    project_selection=SelectionStrategy.SEQUENTIAL,
+                    section_selection=SelectionStrategy.SEQUENTIAL,
+                    task_selection=SelectionStrategy.SEQUENTIAL,
+                )),
+                RecordTaskStrategy("t1", LabelStrategy(task_selection=SelectionStrategy.PARALLEL)),
+                RecordTaskParentStrategy("t1", SelectionStrategy.SEQUENTIAL),
+                RecordTaskParentStrategy("t2", SelectionStrategy.PARALLEL),
+            ))
+
+        assert self.conn.execute(
+            "SELECT project_id, project_type FROM projects").fetchall() == [("p1", "sss")]
+        assert self.conn.execute(
+            "SELECT task_id, task_type, parent_type FROM tasks ORDER BY task_id").fetchall() == [
+            ("t1", "xxp", "s"), ("t2", None, "p")]
+
+    def test_check_existance_many_keeps_existing_values(self):
+        project = FakeProject(id="p1", name="Work -")
+        db_update_value(self.conn, project, "project_type", "sss")
+
+        db_check_existance_many(self.conn, [
+            project,
+            FakeProject(id="p2", name="Home"),
+            FakeSection(id="s1", name="Next", project_id="p2"),
+            make_task("t1"),
+        ])
+
+        assert self.conn.execute(
+            "SELECT project_id, project_type FROM projects ORDER BY project_id").fetchall() == [
+            ("p1", "sss"), ("p2", None)]
+        assert self.conn.execute("SELECT section_id FROM sections").fetchall() == [("s1",)]
+        assert self.conn.execute("SELECT task_id, r_tag FROM tasks").fetchall() == [("t1", 0)]
+
+    def test_initialise_sqlite_applies_pragmas(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+
+        conn = initialise_sqlite(journal_mode="wal", synchronous="full")
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+        finally:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Group 4d: TestWorkspaceFetch - Reading Todoist state at the start of a loop
+# ---------------------------------------------------------------------------
+
+class TestWorkspaceFetch:
+    """Tests for the concurrent workspace read in fetch_workspace()."""
+
+    def test_streams_are_read_concurrently(self):
+        # Every stream waits until all three are in flight; a sequential
+        # fetch would time out on the barrier.
+        barrier = threading.Barrier(3, timeout=5)
+        project = FakeProject(id="p1", name="Work")
+        section = FakeSection(id="s1", name="Next", project_id="p1")
+        task = make_task("t1")
+
+        def pages(*items):
+            def get_pages():
+                barrier.wait()
+                return iter([list(items)])
+            return get_pages
+
+        api = MagicMock()
+        api.get_projects.side_effect = pages(project)
+        api.get_sections.side_effect = pages(section)
+        api.get_tasks.side_effect = pages(task)
+
+        assert fetch_workspace(api) == ([project], [section], [task])
+
+    def test_every_failed_stream_is_reported(self, caplog):
+        api = MagicMock()
+        api.get_projects.return_value = [[FakeProject(id="p1", name="Work")]]
+        api.get_sections.side_effect = http_error(429)
+        api.get_tasks.side_effect = http_error(401)
+
+        with caplog.at_level(logging.ERROR), \
+                pytest.raises(requests.exceptions.HTTPError) as error:
+            fetch_workspace(api)
+
+        assert error.value.response.status_code == 401
+        assert [record.stream for record in caplog.records] == [
+            "sections", "tasks"]
+
+    def test_temporary_failure_skips_sync_loop(self):
+        from autodoist import autodoist_magic
+        from loop_metrics import LoopTimings
+        api = MagicMock()
+        api.get_projects.return_value = [[FakeProject(id="p1", name="Work -")]]
+        api.get_sections.return_value = [[]]
+        api.get_tasks.side_effect = http_error(503)
+        args = TestIntegration()._make_args()
+        conn = create_test_db()
+        timings = LoopTimings()
+        try:
+            result = autodoist_magic(args, api, conn, loop_timings=timings)
+        finally:
+            conn.close()
+
+        assert result == ({}, {}, 0)
+        assert timings.skipped
+        api.update_task.assert_not_called()
+
+    def test_permanent_failure_is_raised(self):
+        from autodoist import autodoist_magic
+        api = MagicMock()
+        api.get_projects.side_effect = http_error(401)
+        api.get_sections.return_value = [[]]
+        api.get_tasks.return_value = [[]]
+        args = TestIntegration()._make_args()
+        conn = create_test_db()
+        try:
+            with pytest.raises(requests.exceptions.HTTPError):
+                autodoist_magic(args, api, conn)
+        finally:
+            conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Group 4e: TestWorkspaceTaskIndex - Per-loop lookups of sections and tasks
+# ---------------------------------------------------------------------------
+
+class TestWorkspaceTaskIndex:
+    """Tests for WorkspaceTaskIndex() lookups."""
+
+    def test_section_tasks_are_sorted_by_parent_and_order(self):
+        tasks = [
+            make_task("c2", parent_id="a", order=2, section_id="s1"),
+            make_task("b", order=2, section_id="s1"),
+            make_task("c1", parent_id="a", order=1, section_id="s1"),
+            make_task("a", order=1, section_id="s1"),
+            make_task("other", order=0, section_id="s2"),
+            make_task("unsectioned", order=0),
+        ]
+
+        index = WorkspaceTaskIndex([], tasks)
+
+        assert [task.id for task in index.section_tasks("p1", "s1")] == ["a", "b", "c1", "c2"]
+        assert [task.id for task in index.section_tasks("p1", None)] == ["unsectioned"]
+        assert index.section_tasks("p2", "s1") == []
+
+    def test_children_are_split_by_completion(self):
+        parent = make_task("a")
+        tasks = [
+            parent,
+            make_task("c1", parent_id="a", order=1),
+            make_task("c2", parent_id="a", order=2, is_completed=True),
+            make_task("g1", parent_id="c1"),
+        ]
+
+        index = WorkspaceTaskIndex([], tasks)
+
+        assert [task.id for task in index.children(parent)] == ["c1", "c2"]
+        assert [task.id for task in index.open_children(parent)] == ["c1"]
+        assert index.children(tasks[3]) == []
+
+    def test_children_in_another_section_are_ignored(self):
+        parent = make_task("a", section_id="s1")
+        index = WorkspaceTaskIndex([], [
+            parent,
+            make_task("moved", parent_id="a", section_id="s2"),
+        ])
+
+        assert index.children(parent) == []
+
+    def test_sections_are_grouped_by_project(self):
+        sections = [
+            FakeSection(id="s1", name="One", project_id="p1"),
+            FakeSection(id="s2", name="Two", project_id="p2"),
+            FakeSection(id="s3", name="Three", project_id="p1"),
+        ]
+
+        index = WorkspaceTaskIndex(sections, [])
+
+        assert [section.id for section in index.sections("p1")] == ["s1", "s3"]
+        assert index.sections("p3") == []
+
+
+# ---------------------------------------------------------------------------
+# Group 4f: TestTaskWrites - Pushing planned task changes to Todoist
+# ---------------------------------------------------------------------------
+
+class TestTaskWrites:
+    """Tests for the task write helpers used at the end of a sync loop."""
+
+    def test_label_updates_skip_net_zero_changes(self):
+        writer = MagicMock()
+        writer.write.side_effect = lambda updates: [
+            TaskWriteResult(update.task_id) for update in updates]
+
+        num_updates = apply_label_updates(
+            MagicMock(),
+            {"t1": 1, "t2": 0},
+            {"t1": ["next_action"], "t2": []},
+            writer,
+        )
+
+        [updates] = writer.write.call_args.args
+        assert updates == [TaskUpdate("t1", {"labels": ["next_action"]})]
+        assert num_updates == 1
+
+    def test_label_updates_count_only_successful_writes(self, caplog):
+        writer = MagicMock()
+        writer.write.return_value = [
+            TaskWriteResult("t1"),
+            TaskWriteResult("t2", RuntimeError("boom")),
+        ]
+
+        with caplog.at_level(logging.WARNING):
+            num_updates = apply_label_updates(
+                MagicMock(),
+                {"t1": 1, "t2": -1},
+                {"t1": ["next_action"], "t2": []},
+                writer,
+            )
+
+        assert num_updates == 1
+        assert "Failed to update labels for task t2: boom" in caplog.text
+
+    def test_failed_label_write_is_retried_from_the_queue(self):
+        from retry_queue import RetryingTaskWriter
+        from task_writer import RestTaskWriter
+        api = MagicMock()
+        api.update_task.side_effect = [RuntimeError("503"), None]
+        conn = create_test_db()
+        clock = MagicMock(return_value=1000.0)
+        try:
+            writer = RetryingTaskWriter(RestTaskWriter(api), conn, clock=clock)
+            with metadata_transaction(conn):
+                first = apply_label_updates(api, {"t1": 1}, {"t1": ["next_action"]}, writer)
+
+            clock.return_value = 2000.0
+            writer.observe([make_task("t1")])
+            with metadata_transaction(conn):
+                retried = writer.drain()
+        finally:
+            conn.close()
+
+        assert (first, retried) == (0, 1)
+        assert api.update_task.call_args_list[-1] == call(task_id="t1", labels=["next_action"])
+
+    def test_headerify_children_walks_deep_trees_depth_first(self):
+        depth = sys.getrecursionlimit() * 3
+        tasks = [make_task("root")] + [
+            make_task(f"t{level}", parent_id="root" if level == 1 else f"t{level - 1}")
+            for level in range(1, depth)
+        ]
+        tasks.append(make_task("sibling", parent_id="root", order=1))
+        writer = MagicMock()
+        writer.write.side_effect = lambda updates: [
+            TaskWriteResult(update.task_id) for update in updates]
+
+        num_updates = find_and_headerify_all_children(
+            MagicMock(), tasks[0], WorkspaceTaskIndex([], tasks), 1, writer)
+
+        [updates] = writer.write.call_args.args
+        assert [update.task_id for update in updates] == [
+            f"t{level}" for level in range(1, depth)] + ["sibling"]
+        assert updates[0] == TaskUpdate("t1", {"content": "* Task"})
+        assert num_updates == depth
+
+    def test_failed_description_write_keeps_local_description(self):
+        task = make_task("t1")
+        task.description = "Old"
+        writer = MagicMock()
+        writer.write.return_value = [TaskWriteResult("t1", RuntimeError("boom"))]
+
+        num_updates = apply_planner_description_changes(
+            MagicMock(),
+            {"t1": task},
+            (DescriptionChange("t1", "New"),),
+            writer,
+        )
+
+        assert num_updates == 0
+        assert task.description == "Old"
+
+
 # ---------------------------------------------------------------------------
 # Group 5: TestIntegration - End-to-end autodoist_magic
 # ---------------------------------------------------------------------------
@@ -1605,6 +2607,9 @@ class TestIntegration:
             end=None,
             hide_future=0,
             dateformat="%d-%m-%Y",
+            planner_stats=False,
+            columnar_snapshot=False,
+            metrics_port=None,
         )
         defaults.update(overrides)
         return argparse.Namespace(**defaults)
@@ -1894,6 +2899,153 @@ class TestIntegration:
         finally:
             conn.close()
 
+    def test_sync_loop_reads_workspace_from_delta_mirror(self):
+        """With a workspace mirror, the sync loop plans from mirrored items only."""
+        project = FakeProject(id="p1", name="Work -")
+        tasks = [
+            make_task("t1", project_id="p1", order=0),
+            make_task("t2", project_id="p1", order=1),
+        ]
+        mirror = MagicMock()
+        mirror.workspace.return_value = ([project], [], tasks)
+        api = self._make_api([], [], [])
+        conn = create_test_db()
+        try:
+            from autodoist import autodoist_magic
+            ids, labels, _ = autodoist_magic(
+                self._make_args(), api, conn, workspace_mirror=mirror)
+        finally:
+            conn.close()
+
+        mirror.refresh.assert_called_once_with()
+        api.get_tasks.assert_not_called()
+        assert ids == {"t1": 1}
+        assert labels == {"t1": [self.LABEL]}
+
+    def test_sync_loop_with_incremental_planner_replans_changed_projects_only(self):
+        """Once labels and metadata are settled, a loop only replans the edited project."""
+        from autodoist import autodoist_magic
+        from incremental_planner import IncrementalPlanner
+        projects = [FakeProject(id="p1", name="Work -"), FakeProject(id="p2", name="Home -")]
+        tasks = [
+            make_task("t1", project_id="p1", order=0),
+            make_task("t2", project_id="p2", order=0),
+        ]
+        planner = IncrementalPlanner()
+        conn = create_test_db()
+
+        def run_loop():
+            with metadata_transaction(conn) as transaction:
+                return autodoist_magic(
+                    self._make_args(), self._make_api(projects, [], tasks), transaction, planner=planner)
+
+        try:
+            first_ids, _, _ = run_loop()
+            run_loop()
+            tasks[1].content = "Renamed"
+            third_ids, _, _ = run_loop()
+        finally:
+            conn.close()
+
+        assert first_ids == {"t1": 1, "t2": 1}
+        assert planner.last_delta.project_ids == frozenset({"p2"})
+        assert third_ids == {}
+        assert [task.labels for task in tasks] == [[self.LABEL], [self.LABEL]]
+
+    def test_webhook_loop_maintains_headers_of_affected_projects_only(self):
+        """A loop triggered by webhooks for p2 leaves the header markers of p1 alone."""
+        from autodoist import autodoist_magic
+        projects = [FakeProject(id="p1", name="Work -"), FakeProject(id="p2", name="Home -")]
+        tasks = [
+            make_task("t1", content="** Plan", project_id="p1", order=0),
+            make_task("t2", content="** Pack", project_id="p2", order=0),
+        ]
+        api = self._make_api(projects, [], tasks)
+        conn = create_test_db()
+        try:
+            autodoist_magic(self._make_args(label=None), api, conn, project_ids=frozenset({"p2"}))
+        finally:
+            conn.close()
+
+        assert {call.kwargs["task_id"] for call in api.update_task.call_args_list} == {"t2"}
+        assert tasks[0].content == "** Plan"
+
+    def test_columnar_snapshot_plans_the_same_labels(self):
+        """--columnar_snapshot plans from columns and labels tasks like the row snapshot."""
+        def make_workspace():
+            projects = [FakeProject(id="p1", name="Work -"), FakeProject(id="p2", name="Home =")]
+            sections = [FakeSection(id="s1", name="Errands", project_id="p1")]
+            tasks = [
+                make_task("t1", project_id="p1", section_id="s1", order=1),
+                make_task("t2", content="Trip -", project_id="p1", order=0),
+                make_task("t3", parent_id="t2", project_id="p1", order=0),
+                make_task("t4", parent_id="t2", project_id="p1", order=1, labels=[self.LABEL]),
+                make_task("t5", project_id="p2", order=0),
+            ]
+            return projects, sections, tasks
+
+        (row_ids, row_labels, _), _ = self._run(*make_workspace())
+        (ids, labels, _), tasks = self._run(*make_workspace(), columnar_snapshot=True)
+
+        assert (ids, labels) == (row_ids, row_labels)
+        assert [task.id for task in tasks if self.LABEL in task.labels] == ["t3", "t5"]
+
+    def test_sync_loop_logs_planner_stats_when_enabled(self, caplog):
+        """--planner_stats adds one structured planner record per loop."""
+        from autodoist import autodoist_magic
+        from incremental_planner import IncrementalPlanner
+        projects = [FakeProject(id="p1", name="Work -")]
+        tasks = [make_task("t1", project_id="p1", order=0), make_task("t2", project_id="p1", order=1)]
+        conn = create_test_db()
+        try:
+            with caplog.at_level(logging.INFO):
+                autodoist_magic(
+                    self._make_args(planner_stats=True),
+                    self._make_api(projects, [], tasks),
+                    conn,
+                    planner=IncrementalPlanner(),
+                )
+        finally:
+            conn.close()
+
+        records = [record for record in caplog.records if getattr(record, "component", None) == "planner"]
+        assert len(records) == 1
+        record = records[0]
+        assert record.operation == "plan"
+        assert record.tasks == 2
+        assert record.labels_added == 1
+        assert record.phase_diff_seconds >= 0
+        assert record.phase_child_propagation_seconds >= 0
+
+    def test_sync_loop_laps_every_phase(self):
+        """A loop reports fetch, metadata, planning and write phases to its timings."""
+        from autodoist import autodoist_magic
+        from loop_metrics import LoopTimings
+        projects = [FakeProject(id="p1", name="Work -")]
+        tasks = [make_task("t1", project_id="p1", order=0)]
+        timings = LoopTimings()
+        conn = create_test_db()
+        try:
+            autodoist_magic(
+                self._make_args(), self._make_api(projects, [], tasks), conn, loop_timings=timings)
+        finally:
+            conn.close()
+
+        assert list(timings.phase_seconds) == [
+            "fetch", "metadata_write", "task_loop", "snapshot", "metadata_load",
+            "planning", "description_writes",
+        ]
+        assert timings.total_seconds == pytest.approx(sum(timings.phase_seconds.values()))
+
+    def test_sync_loop_does_not_log_planner_stats_by_default(self, caplog):
+        projects = [FakeProject(id="p1", name="Work -")]
+        tasks = [make_task("t1", project_id="p1", order=0)]
+
+        with caplog.at_level(logging.INFO):
+            self._run(projects, [], tasks)
+
+        assert not [record for record in caplog.records if getattr(record, "component", None) == "planner"]
+
     def test_sync_loop_exposes_planner_final_label_sets(self):
         """Todoist label writes use the planner's final label set for changed tasks."""
         project = FakeProject(id="p1", name="Work")
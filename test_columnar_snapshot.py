@@ -0,0 +1,181 @@
+"""Tests for the column-oriented workspace snapshot and its planner.
+
+Run with: python -m pytest test_columnar_snapshot.py -v
+"""
+
+import random
+from dataclasses import replace
+from datetime import date
+
+import pytest
+
+import next_action_planner
+from columnar_snapshot import (
+    ColumnarPlanner,
+    ColumnarWorkspaceSnapshot,
+    plan_columnar_next_action_labels,
+)
+from next_action_planner import (
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    ProjectSnapshot,
+    SectionSnapshot,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    plan_next_action_labels,
+)
+from test_incremental_planner import LABEL, TODAY, RandomWorkspace
+
+
+def make_task(task_id, **overrides):
+    defaults = dict(
+        id=task_id,
+        content=f'Task {task_id}',
+        project_id='p1',
+        section_id=None,
+        parent_id=None,
+        labels=(),
+        order=1,
+        is_completed=False,
+        due_date=None,
+        is_header=False,
+        description='',
+    )
+    defaults.update(overrides)
+    return TaskSnapshot(**defaults)
+
+
+class TestColumnarWorkspaceSnapshot:
+    def _workspace(self):
+        return WorkspaceSnapshot(
+            projects=(ProjectSnapshot(id='p1', name='Project -', order=1, is_inbox_project=False),),
+            sections=(SectionSnapshot(id='s1', name='Section', project_id='p1', order=1),),
+            tasks=(
+                make_task('t1', section_id='s1', labels=('next_action', 'home'), order=3),
+                make_task('t2', parent_id='t1', labels=('home', 'next_action'), order=1,
+                          due_date=date(2026, 3, 20), is_completed=True),
+                make_task('t3', parent_id='missing', labels=('home', 'home'), is_header=True,
+                          content='* Header', description='Notes'),
+                make_task('t4', project_id='p2', order=-2),
+            ),
+        )
+
+    def test_rows_round_trip_to_equal_task_snapshots(self):
+        workspace = self._workspace()
+
+        columnar = ColumnarWorkspaceSnapshot.from_snapshot(workspace)
+
+        assert len(columnar) == 4
+        assert tuple(columnar.tasks) == workspace.tasks
+        assert columnar.to_snapshot() == workspace
+        assert columnar.tasks[-1] == workspace.tasks[-1]
+        assert columnar.tasks[1:3] == workspace.tasks[1:3]
+
+    def test_labels_are_encoded_against_one_dictionary(self):
+        columnar = ColumnarWorkspaceSnapshot.from_snapshot(self._workspace())
+
+        assert columnar.labels.names == ('next_action', 'home')
+        assert columnar.rows_with_label('home') == [0, 1, 2]
+        assert columnar.rows_with_label('next_action') == [0, 1]
+        assert columnar.rows_with_label('unknown') == []
+
+    def test_ids_are_interned_to_row_numbers(self):
+        columnar = ColumnarWorkspaceSnapshot.from_snapshot(self._workspace())
+
+        assert columnar.row_of('t3') == 2
+        assert columnar.task_id(2) == 't3'
+        assert columnar.row_of('p1') == -1
+        assert columnar.row_of('missing') == -1
+
+    def test_parents_after_their_children_and_missing_parents_round_trip(self):
+        tasks = (
+            make_task('t1', parent_id='t2'),
+            make_task('t2'),
+            make_task('t3', parent_id='gone'),
+        )
+
+        columnar = ColumnarWorkspaceSnapshot(tasks=iter(tasks))
+
+        assert tuple(columnar.tasks) == tasks
+
+    def test_duplicate_task_ids_are_rejected(self):
+        with pytest.raises(ValueError):
+            ColumnarWorkspaceSnapshot(tasks=(make_task('t1'), make_task('t1')))
+
+    def test_row_index_out_of_range(self):
+        columnar = ColumnarWorkspaceSnapshot(tasks=(make_task('t1'),))
+
+        with pytest.raises(IndexError):
+            columnar.tasks[1]
+
+
+class TestColumnarPlanner:
+    @pytest.fixture(params=['python', 'numpy'])
+    def date_filter_path(self, request, monkeypatch):
+        if request.param == 'numpy':
+            pytest.importorskip('numpy')
+            monkeypatch.setattr(next_action_planner, 'VECTORIZED_DATE_FILTER_MIN_TASKS', 0)
+        return request.param
+
+    def _workspace(self, seed):
+        rng = random.Random(seed)
+        model = RandomWorkspace(rng, num_tasks=80)
+        # Mix label orders so some rows cannot be rebuilt from the bitset alone
+        for task in list(model.tasks.values())[::3]:
+            model.tasks[task.id] = replace(task, labels=task.labels + ('waiting',) + task.labels[::-1])
+        tasks = list(model.tasks.values())
+        # Children before their parents, and a sub-task whose parent is gone
+        rng.shuffle(tasks)
+        tasks.append(make_task('orphan', parent_id='gone', labels=(LABEL,)))
+        workspace = WorkspaceSnapshot(model.snapshot().projects, model.snapshot().sections, tuple(tasks))
+        return workspace, model.metadata_snapshot()
+
+    @pytest.mark.parametrize('seed', range(20))
+    def test_plan_matches_the_row_planner(self, seed, date_filter_path):
+        workspace, metadata = self._workspace(seed)
+        config = PlannerConfig(next_action_label=LABEL, hide_future=7, today=TODAY)
+
+        expected = plan_next_action_labels(workspace, config, metadata)
+        columnar = ColumnarWorkspaceSnapshot.from_snapshot(workspace)
+
+        assert plan_columnar_next_action_labels(columnar, config, metadata) == expected
+
+    def test_plan_matches_after_labels_are_reordered(self):
+        # Removing and adding the label back moves it to the end of the tuple
+        workspace = WorkspaceSnapshot(
+            projects=(ProjectSnapshot(id='p1', name='Project', order=1, is_inbox_project=False),),
+            tasks=(
+                make_task('t1', content='Task -', labels=(LABEL, 'home')),
+                make_task('t2', parent_id='t1', labels=(LABEL, 'home', LABEL)),
+                make_task('t3', parent_id='t1', labels=(LABEL,)),
+            ),
+        )
+        metadata = AutodoistMetadataSnapshot()
+        config = PlannerConfig(next_action_label=LABEL, today=TODAY)
+
+        expected = plan_next_action_labels(workspace, config, metadata)
+
+        assert expected.label_changes
+        assert plan_columnar_next_action_labels(
+            ColumnarWorkspaceSnapshot.from_snapshot(workspace), config, metadata) == expected
+
+    def test_stats_match_the_row_planner(self):
+        workspace, metadata = self._workspace(0)
+        config = PlannerConfig(next_action_label=LABEL, today=TODAY, collect_stats=True)
+
+        expected = plan_next_action_labels(workspace, config, metadata).stats
+        stats = plan_columnar_next_action_labels(
+            ColumnarWorkspaceSnapshot.from_snapshot(workspace), config, metadata).stats
+
+        assert list(stats.phase_seconds) == list(expected.phase_seconds)
+        assert replace(stats, phase_seconds={}) == replace(expected, phase_seconds={})
+
+    def test_columnar_planner_keeps_the_last_result(self):
+        workspace, metadata = self._workspace(1)
+        config = PlannerConfig(next_action_label=LABEL, today=TODAY)
+        planner = ColumnarPlanner()
+
+        result = planner.plan(ColumnarWorkspaceSnapshot.from_snapshot(workspace), config, metadata)
+
+        assert planner.last_result is result
+        assert result == plan_next_action_labels(workspace, config, metadata)
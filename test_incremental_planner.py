@@ -0,0 +1,281 @@
+"""Tests for incremental next-action planning.
+
+The main check is differential: randomized edit sequences are applied to a
+workspace, and after every edit the incremental planner must return exactly
+what the full planner returns for the same input.
+
+Run with: python -m pytest test_incremental_planner.py -v
+"""
+
+import random
+from dataclasses import replace
+from datetime import date, timedelta
+
+import pytest
+
+from incremental_planner import IncrementalPlanner, plan_incrementally
+from next_action_planner import (
+    INACTIVE_RELATIVE_ACTIONABLE_DATE_WARNING,
+    AutodoistMetadataSnapshot,
+    PlannerConfig,
+    ProjectSnapshot,
+    RecordProjectStrategy,
+    RecordSectionStrategy,
+    RecordTaskParentStrategy,
+    RecordTaskStrategy,
+    SectionSnapshot,
+    TaskSnapshot,
+    WorkspaceSnapshot,
+    plan_next_action_labels,
+)
+
+LABEL = 'next_action'
+TODAY = date(2026, 3, 14)
+NAME_SUFFIXES = ('', ' -', ' =', ' --', ' =-', ' -=', ' ===', ' -=-')
+CONTENTS = (
+    'Task', 'Task -', 'Task =', '* Header', 'Task start=01-01-2026',
+    'Task start=01-12-2026', 'Task start=due-3d', 'Task start=due-2w',
+)
+
+
+class RandomWorkspace:
+    """A mutable workspace model that produces snapshots and random edits."""
+
+    def __init__(self, rng, num_projects=4, num_tasks=40):
+        self.rng = rng
+        self.next_id = 0
+        self.projects = {}
+        self.sections = {}
+        self.tasks = {}
+        self.metadata = {
+            'project_strategies': {},
+            'section_strategies': {},
+            'task_strategies': {},
+            'task_parent_strategies': {},
+        }
+
+        for index in range(num_projects):
+            project_id = f'p{index}'
+            self.projects[project_id] = ProjectSnapshot(
+                id=project_id,
+                name=f'Project {index}{rng.choice(NAME_SUFFIXES)}',
+                order=rng.randint(0, 5),
+                is_inbox_project=index == 0,
+            )
+            for _ in range(rng.randint(0, 3)):
+                self.add_section(project_id)
+        for _ in range(num_tasks):
+            self.add_task()
+
+    def new_id(self, prefix):
+        self.next_id += 1
+        return f'{prefix}{self.next_id}'
+
+    def add_section(self, project_id):
+        section_id = self.new_id('s')
+        self.sections[section_id] = SectionSnapshot(
+            id=section_id,
+            name=f'Section{self.rng.choice(NAME_SUFFIXES)}',
+            project_id=project_id,
+            order=self.rng.randint(0, 5),
+            is_labeling_disabled=self.rng.random() < 0.15,
+        )
+
+    def add_task(self):
+        rng = self.rng
+        parent = rng.choice(list(self.tasks.values())) if self.tasks and rng.random() < 0.5 else None
+        if parent is not None:
+            project_id, section_id = parent.project_id, parent.section_id
+        else:
+            project_id = rng.choice(list(self.projects))
+            section_ids = [s.id for s in self.sections.values() if s.project_id == project_id]
+            section_id = rng.choice(section_ids + [None])
+
+        task_id = self.new_id('t')
+        content = rng.choice(CONTENTS)
+        self.tasks[task_id] = TaskSnapshot(
+            id=task_id,
+            content=content,
+            project_id=project_id,
+            section_id=section_id,
+            parent_id=parent.id if parent else None,
+            labels=(LABEL,) if rng.random() < 0.3 else (),
+            order=rng.randint(0, 8),
+            is_completed=rng.random() < 0.1,
+            due_date=TODAY + timedelta(days=rng.randint(-5, 30)) if rng.random() < 0.4 else None,
+            is_header=content.startswith('*'),
+            description=INACTIVE_RELATIVE_ACTIONABLE_DATE_WARNING if rng.random() < 0.1 else '',
+        )
+
+    def subtree_ids(self, task_id):
+        ids = [task_id]
+        for task in self.tasks.values():
+            if task.parent_id == task_id:
+                ids.extend(self.subtree_ids(task.id))
+        return ids
+
+    def snapshot(self):
+        return WorkspaceSnapshot(
+            projects=tuple(self.projects.values()),
+            sections=tuple(self.sections.values()),
+            tasks=tuple(self.tasks.values()),
+        )
+
+    def metadata_snapshot(self):
+        return AutodoistMetadataSnapshot(**{
+            name: dict(values) for name, values in self.metadata.items()
+        })
+
+    def apply_result(self, result):
+        """Apply a plan like a sync loop does, with some writes failing."""
+        for change in result.label_changes:
+            if change.task_id in self.tasks and self.rng.random() < 0.9:
+                self.tasks[change.task_id] = replace(self.tasks[change.task_id], labels=change.labels)
+        for change in result.description_changes:
+            if change.task_id in self.tasks and self.rng.random() < 0.9:
+                self.tasks[change.task_id] = replace(
+                    self.tasks[change.task_id], description=change.description)
+        if self.rng.random() < 0.9:
+            for command in result.metadata_commands:
+                if isinstance(command, RecordProjectStrategy):
+                    self.metadata['project_strategies'][command.project_id] = command.strategy
+                elif isinstance(command, RecordSectionStrategy):
+                    self.metadata['section_strategies'][command.section_id] = command.strategy
+                elif isinstance(command, RecordTaskStrategy):
+                    self.metadata['task_strategies'][command.task_id] = command.strategy
+                elif isinstance(command, RecordTaskParentStrategy):
+                    self.metadata['task_parent_strategies'][command.task_id] = command.strategy
+
+    def random_edit(self):
+        rng = self.rng
+        edit = rng.choice((
+            'complete', 'content', 'labels', 'order', 'add', 'delete',
+            'rename_project', 'rename_section', 'move', 'due', 'add_section',
+            'delete_section', 'nothing',
+        ))
+        task = rng.choice(list(self.tasks.values())) if self.tasks else None
+
+        if edit == 'add' or task is None:
+            self.add_task()
+        elif edit == 'complete':
+            self.tasks[task.id] = replace(task, is_completed=not task.is_completed)
+        elif edit == 'content':
+            content = rng.choice(CONTENTS)
+            self.tasks[task.id] = replace(task, content=content, is_header=content.startswith('*'))
+        elif edit == 'labels':
+            labels = () if LABEL in task.labels else (LABEL,)
+            self.tasks[task.id] = replace(task, labels=labels)
+        elif edit == 'order':
+            self.tasks[task.id] = replace(task, order=rng.randint(0, 8))
+        elif edit == 'due':
+            due_date = None if task.due_date else TODAY + timedelta(days=rng.randint(-3, 20))
+            self.tasks[task.id] = replace(task, due_date=due_date)
+        elif edit == 'delete':
+            for task_id in self.subtree_ids(task.id):
+                del self.tasks[task_id]
+        elif edit == 'move' and task.parent_id is None:
+            project_id = rng.choice(list(self.projects))
+            section_ids = [s.id for s in self.sections.values() if s.project_id == project_id]
+            section_id = rng.choice(section_ids + [None])
+            for task_id in self.subtree_ids(task.id):
+                self.tasks[task_id] = replace(
+                    self.tasks[task_id], project_id=project_id, section_id=section_id)
+        elif edit == 'rename_project':
+            project = rng.choice(list(self.projects.values()))
+            self.projects[project.id] = replace(
+                project, name=f'Project{rng.choice(NAME_SUFFIXES)}', order=rng.randint(0, 5))
+        elif edit == 'rename_section' and self.sections:
+            section = rng.choice(list(self.sections.values()))
+            self.sections[section.id] = replace(
+                section,
+                name=f'Section{rng.choice(NAME_SUFFIXES)}',
+                is_labeling_disabled=rng.random() < 0.15,
+            )
+        elif edit == 'add_section':
+            self.add_section(rng.choice(list(self.projects)))
+        elif edit == 'delete_section' and self.sections:
+            section = rng.choice(list(self.sections.values()))
+            del self.sections[section.id]
+            for task in list(self.tasks.values()):
+                if task.section_id == section.id and task.id in self.tasks:
+                    for task_id in self.subtree_ids(task.id):
+                        del self.tasks[task_id]
+
+
+class TestIncrementalPlanner:
+    def _config(self, **overrides):
+        defaults = dict(next_action_label=LABEL, hide_future=7, today=TODAY)
+        defaults.update(overrides)
+        return PlannerConfig(**defaults)
+
+    @pytest.mark.parametrize('seed', range(25))
+    def test_matches_full_planner_over_random_edit_sequences(self, seed):
+        rng = random.Random(seed)
+        model = RandomWorkspace(rng)
+        planner = IncrementalPlanner()
+        config = self._config()
+
+        for step in range(40):
+            for _ in range(rng.randint(0, 3)):
+                model.random_edit()
+            if rng.random() < 0.05:
+                config = self._config(today=config.today + timedelta(days=1))
+
+            workspace = model.snapshot()
+            metadata = model.metadata_snapshot()
+            expected = plan_next_action_labels(workspace, config, metadata)
+
+            assert planner.plan(workspace, config, metadata) == expected, (
+                f'seed {seed}, step {step}, replanned {planner.last_delta}')
+            model.apply_result(expected)
+
+    def test_unchanged_input_replans_nothing(self):
+        model = RandomWorkspace(random.Random(1))
+        workspace = model.snapshot()
+        metadata = model.metadata_snapshot()
+        config = self._config()
+
+        state, _ = plan_incrementally(None, workspace, config, metadata)
+        next_state, delta = plan_incrementally(state, workspace, config, metadata)
+
+        assert delta.project_ids == frozenset()
+        assert next_state.result is state.result
+
+    def test_only_the_edited_project_is_replanned(self):
+        model = RandomWorkspace(random.Random(2))
+        config = self._config()
+        state, _ = plan_incrementally(None, model.snapshot(), config, model.metadata_snapshot())
+
+        task = next(task for task in model.tasks.values() if task.project_id == 'p2')
+        model.tasks[task.id] = replace(task, content='Renamed')
+        _, delta = plan_incrementally(state, model.snapshot(), config, model.metadata_snapshot())
+
+        assert delta.project_ids == frozenset({'p2'})
+
+    def test_next_decision_date_covers_projects_that_were_not_replanned(self):
+        model = RandomWorkspace(random.Random(4))
+        task = next(task for task in model.tasks.values() if task.project_id == 'p1')
+        model.tasks[task.id] = replace(task, content='Task start=05-01-2027')
+        config = self._config(hide_future=0)
+        state, _ = plan_incrementally(None, model.snapshot(), config, model.metadata_snapshot())
+        previous_date = state.result.next_decision_date
+
+        task = next(task for task in model.tasks.values() if task.project_id == 'p2')
+        model.tasks[task.id] = replace(task, content='Task start=04-01-2027')
+        state, delta = plan_incrementally(state, model.snapshot(), config, model.metadata_snapshot())
+        assert delta.project_ids == frozenset({'p2'})
+        assert state.result.next_decision_date == min(previous_date, date(2027, 1, 4))
+
+        model.tasks[task.id] = replace(task, content='Renamed')
+        state, _ = plan_incrementally(state, model.snapshot(), config, model.metadata_snapshot())
+        assert state.result.next_decision_date == previous_date
+
+    def test_config_change_replans_everything(self):
+        model = RandomWorkspace(random.Random(3))
+        workspace = model.snapshot()
+        metadata = model.metadata_snapshot()
+        state, _ = plan_incrementally(None, workspace, self._config(), metadata)
+
+        _, delta = plan_incrementally(state, workspace, self._config(hide_future=0), metadata)
+
+        assert delta.replans_everything
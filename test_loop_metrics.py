@@ -0,0 +1,104 @@
+"""Tests for per-loop timings and API traffic counting.
+
+Run with: python -m pytest test_loop_metrics.py -v
+"""
+
+import requests
+from requests.adapters import BaseAdapter
+
+from loop_metrics import ApiTrafficCounter, LoopTimings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class StaticAdapter(BaseAdapter):
+    """Answers every request with the same body, without any network access."""
+
+    def __init__(self, body):
+        super().__init__()
+        self.body = body
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.body
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+class TestLoopTimings:
+    def test_laps_split_the_loop_into_consecutive_phases(self):
+        clock = FakeClock()
+        timings = LoopTimings(clock=clock)
+
+        clock.now += 1.5
+        timings.lap('fetch')
+        clock.now += 0.25
+        timings.lap('planning')
+        clock.now += 0.5
+        timings.lap('fetch')
+
+        assert timings.phase_seconds == {'fetch': 2.0, 'planning': 0.25}
+        assert timings.total_seconds == 2.25
+
+    def test_log_fields_are_flat_seconds(self):
+        clock = FakeClock()
+        timings = LoopTimings(clock=clock)
+        clock.now += 0.125
+        timings.lap('status_ping')
+
+        assert timings.as_log_fields() == {
+            'phase_status_ping_seconds': 0.125,
+            'loop_seconds': 0.125,
+        }
+
+
+class TestApiTrafficCounter:
+    def _session(self, body=b'{"ok": true}'):
+        session = requests.Session()
+        session.mount('https://', StaticAdapter(body))
+        return session
+
+    def test_counts_requests_and_body_bytes_of_a_session(self):
+        session = self._session()
+        counter = ApiTrafficCounter(session)
+
+        session.get('https://api.todoist.com/api/v1/tasks')
+        session.post('https://api.todoist.com/api/v1/sync', data={'commands': '[]'})
+
+        assert counter.totals() == (2, len('commands=%5B%5D'), 2 * len(b'{"ok": true}'))
+
+    def test_log_fields_cover_traffic_since_earlier_totals(self):
+        session = self._session(body=b'12345')
+        counter = ApiTrafficCounter(session)
+        session.get('https://api.todoist.com/api/v1/projects')
+        before = counter.totals()
+
+        session.post('https://api.todoist.com/api/v1/tasks/1', json={'labels': ['next_action']})
+
+        assert counter.log_fields_since(before) == {
+            'api_calls': 1,
+            'api_request_bytes': len(b'{"labels": ["next_action"]}'),
+            'api_response_bytes': 5,
+        }
+
+    def test_existing_response_hooks_are_kept(self):
+        session = self._session()
+        seen = []
+        session.hooks['response'].append(lambda response, *args, **kwargs: seen.append(response.url))
+        counter = ApiTrafficCounter(session)
+
+        session.get('https://api.todoist.com/api/v1/labels')
+
+        assert seen == ['https://api.todoist.com/api/v1/labels']
+        assert counter.totals()[0] == 1
@@ -0,0 +1,200 @@
+"""Tests for the Prometheus metrics registry and endpoint.
+
+Run with: python -m pytest test_metrics.py -v
+"""
+
+import urllib.error
+import urllib.request
+
+import pytest
+import requests
+
+from loop_metrics import LoopTimings
+from metrics import (
+    CONTENT_TYPE,
+    MetricsRegistry,
+    SyncLoopMetrics,
+    endpoint_of,
+    start_metrics_server,
+)
+from next_action_planner import PlannerStats
+from test_loop_metrics import FakeClock, StaticAdapter
+
+
+class StatusAdapter(StaticAdapter):
+    def __init__(self, status_code):
+        super().__init__(b'')
+        self.status_code = status_code
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        response.status_code = self.status_code
+        return response
+
+
+class TestMetricsRegistry:
+    def test_counter_and_gauge_render_in_text_format(self):
+        registry = MetricsRegistry()
+        requests_total = registry.counter('requests_total', 'Requests.', ('status',))
+        temperature = registry.gauge('temperature', 'Current temperature.')
+
+        requests_total.inc(status=200)
+        requests_total.inc(2, status=200)
+        requests_total.inc(status='429')
+        temperature.set(21.5)
+
+        assert registry.render() == (
+            '# HELP requests_total Requests.\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{status="200"} 3\n'
+            'requests_total{status="429"} 1\n'
+            '# HELP temperature Current temperature.\n'
+            '# TYPE temperature gauge\n'
+            'temperature 21.5\n'
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        duration = registry.histogram('duration_seconds', 'Duration.', buckets=(0.1, 1))
+
+        for value in (0.05, 0.5, 3):
+            duration.observe(value)
+
+        assert registry.render().splitlines()[2:] == [
+            'duration_seconds_bucket{le="0.1"} 1',
+            'duration_seconds_bucket{le="1"} 2',
+            'duration_seconds_bucket{le="+Inf"} 3',
+            'duration_seconds_sum 3.55',
+            'duration_seconds_count 3',
+        ]
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('events_total', 'Events.', ('name',))
+
+        counter.inc(name='a "quoted"\nname\\')
+
+        assert 'events_total{name="a \\"quoted\\"\\nname\\\\"} 1' in registry.render()
+
+    def test_labels_must_match_the_declared_names(self):
+        counter = MetricsRegistry().counter('events_total', 'Events.', ('name',))
+
+        with pytest.raises(ValueError):
+            counter.inc(other='x')
+
+    def test_counters_cannot_decrease(self):
+        counter = MetricsRegistry().counter('events_total', 'Events.')
+
+        with pytest.raises(ValueError):
+            counter.inc(-1)
+
+    def test_metric_names_are_unique(self):
+        registry = MetricsRegistry()
+        registry.counter('events_total', 'Events.')
+
+        with pytest.raises(ValueError):
+            registry.gauge('events_total', 'Events.')
+
+
+class TestSyncLoopMetrics:
+    def test_endpoints_replace_id_segments(self):
+        assert endpoint_of('https://api.todoist.com/api/v1/tasks/6X4Vw2cPvJhqmQRx/close') == \
+            '/api/v1/tasks/{id}/close'
+        assert endpoint_of('https://api.todoist.com/api/v1/tasks?cursor=abc1') == '/api/v1/tasks'
+        assert endpoint_of('https://api.todoist.com/api/v1/sync') == '/api/v1/sync'
+
+    def test_endpoints_replace_ids_without_digits(self):
+        assert endpoint_of('https://api.todoist.com/api/v1/tasks/abcdEFGHijkLMNop') == \
+            '/api/v1/tasks/{id}'
+        assert endpoint_of('https://api.todoist.com/api/v1/projects/abcdEFGHijkLMNop/collaborators') == \
+            '/api/v1/projects/{id}/collaborators'
+        assert endpoint_of('https://api.todoist.com/api/v1/tasks/completed/by_due_date') == \
+            '/api/v1/tasks/completed/by_due_date'
+
+    def test_loop_observation_covers_phases_planner_and_writes(self):
+        clock = FakeClock()
+        metrics = SyncLoopMetrics(clock=lambda: 1_700_000_000)
+        timings = LoopTimings(clock=clock)
+        for phase, seconds in (('fetch', 1.0), ('metadata_load', 0.25), ('metadata_write', 0.5)):
+            clock.now += seconds
+            timings.lap(phase)
+        timings.planner_stats = PlannerStats(phase_seconds={'index': 0.125})
+
+        metrics.observe_loop(timings, changes=3)
+
+        text = metrics.registry.render()
+        assert 'autodoist_sync_loops_total 1' in text
+        assert 'autodoist_sync_loop_duration_seconds_sum 1.75' in text
+        assert 'autodoist_sync_loop_phase_duration_seconds_sum{phase="fetch"} 1' in text
+        assert 'autodoist_metadata_db_duration_seconds_sum 0.75' in text
+        assert 'autodoist_planner_phase_duration_seconds_sum{phase="index"} 0.125' in text
+        assert 'autodoist_writes_per_loop_bucket{le="5"} 1' in text
+        assert 'autodoist_last_successful_loop_timestamp_seconds 1700000000' in text
+
+    def test_skipped_loop_is_counted_and_not_successful(self):
+        now = [1_700_000_000]
+        metrics = SyncLoopMetrics(clock=lambda: now[0])
+        metrics.observe_loop(LoopTimings(), changes=0)
+        skipped = LoopTimings()
+        skipped.skipped = True
+        now[0] += 60
+
+        metrics.observe_loop(skipped, changes=0)
+
+        text = metrics.registry.render()
+        assert 'autodoist_sync_loops_total 2' in text
+        assert 'autodoist_skipped_sync_loops_total 1' in text
+        assert 'autodoist_last_successful_loop_timestamp_seconds 1700000000' in text
+
+    def test_api_responses_are_counted_by_endpoint_and_status(self):
+        metrics = SyncLoopMetrics()
+        session = requests.Session()
+        session.mount('https://', StatusAdapter(429))
+        metrics.attach(session)
+
+        session.post('https://api.todoist.com/api/v1/tasks/123abc', json={})
+        session.post('https://api.todoist.com/api/v1/tasks/456def', json={})
+
+        text = metrics.registry.render()
+        assert ('autodoist_api_requests_total{method="POST",endpoint="/api/v1/tasks/{id}",status="429"} 2'
+                in text)
+        assert 'autodoist_api_rate_limited_total 2' in text
+
+    def test_rate_limiter_waits_and_retried_429s_are_counted(self):
+        metrics = SyncLoopMetrics()
+
+        metrics.observe_rate_limit(2.5, retries=1)
+        metrics.observe_rate_limit(0.5, retries=0)
+
+        text = metrics.registry.render()
+        assert 'autodoist_rate_limit_wait_seconds_total 3' in text
+        assert 'autodoist_api_rate_limited_total 1' in text
+
+    def test_retry_queue_depth_is_a_gauge(self):
+        metrics = SyncLoopMetrics()
+
+        metrics.observe_retry_queue(4)
+        metrics.observe_retry_queue(1)
+
+        assert 'autodoist_write_retry_queue_depth 1' in metrics.registry.render()
+
+
+class TestMetricsServer:
+    def test_serves_metrics_from_a_background_thread(self):
+        metrics = SyncLoopMetrics()
+        metrics.loops.inc()
+        server = start_metrics_server(metrics.registry, 0)
+        try:
+            url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode('utf-8')
+                content_type = response.headers['Content-Type']
+
+            with pytest.raises(urllib.error.HTTPError):
+                urllib.request.urlopen(url.replace('/metrics', '/other'), timeout=5)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert content_type == CONTENT_TYPE
+        assert 'autodoist_sync_loops_total 1' in body
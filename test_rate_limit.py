@@ -0,0 +1,196 @@
+"""Tests for the client-side Todoist rate limiter.
+
+Run with: python -m pytest test_rate_limit.py -v
+"""
+
+import io
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import (
+    DEFAULT_RETRY_AFTER_SECONDS,
+    TODOIST_BURST_REQUESTS,
+    TODOIST_RATE_LIMIT_WINDOW_SECONDS,
+    TODOIST_REQUESTS_PER_WINDOW,
+    RateLimitingAdapter,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the bucket sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket:
+    def _bucket(self, rate=2, capacity=3):
+        clock = FakeClock()
+        return TokenBucket(rate, capacity, clock=clock, sleep=clock.sleep), clock
+
+    def test_burst_up_to_capacity_does_not_wait(self):
+        bucket, clock = self._bucket()
+
+        waits = [bucket.acquire() for _ in range(3)]
+
+        assert waits == [0, 0, 0]
+        assert clock.sleeps == []
+
+    def test_waits_for_refill_once_empty(self):
+        bucket, clock = self._bucket(rate=2, capacity=1)
+
+        bucket.acquire()
+        waited = bucket.acquire()
+
+        assert waited == pytest.approx(0.5)
+        assert clock.now == pytest.approx(0.5)
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket, clock = self._bucket(rate=1, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+
+        clock.now += 100
+        waits = [bucket.acquire() for _ in range(3)]
+
+        assert waits[:2] == [0, 0]
+        assert waits[2] == pytest.approx(1)
+
+    def test_todoist_quota_bucket(self):
+        bucket = TokenBucket.for_todoist_quota()
+
+        assert bucket.capacity == TODOIST_BURST_REQUESTS
+        assert bucket.rate == pytest.approx(
+            (TODOIST_REQUESTS_PER_WINDOW - TODOIST_BURST_REQUESTS) / TODOIST_RATE_LIMIT_WINDOW_SECONDS)
+
+    def test_todoist_quota_is_never_exceeded_in_any_window(self):
+        clock = FakeClock()
+        bucket = TokenBucket.for_todoist_quota(clock=clock, sleep=clock.sleep)
+
+        granted_at = []
+        for _ in range(3 * TODOIST_REQUESTS_PER_WINDOW):
+            bucket.acquire()
+            granted_at.append(clock.now)
+
+        # The fullest windows start at a grant, so checking those covers every window
+        end = 0
+        for start, started_at in enumerate(granted_at):
+            while end < len(granted_at) and (
+                    granted_at[end] < started_at + TODOIST_RATE_LIMIT_WINDOW_SECONDS):
+                end += 1
+            assert end - start <= TODOIST_REQUESTS_PER_WINDOW
+
+    @pytest.mark.parametrize('rate, capacity', [(0, 1), (1, 0)])
+    def test_rejects_unusable_settings(self, rate, capacity):
+        with pytest.raises(ValueError):
+            TokenBucket(rate, capacity)
+
+    def test_pause_empties_the_bucket_and_delays_the_refill(self):
+        bucket, clock = self._bucket(rate=2, capacity=3)
+
+        bucket.pause(10)
+        waited = bucket.acquire()
+
+        assert waited == pytest.approx(10.5)
+
+    def test_lower_rate_slows_the_refill(self):
+        bucket, clock = self._bucket(rate=2, capacity=1)
+        bucket.acquire()
+
+        bucket.set_rate(0.5)
+
+        assert bucket.acquire() == pytest.approx(2)
+
+
+class ScriptedTransport(HTTPAdapter):
+    """Answers requests with the next scripted status, without any network access."""
+
+    def send(self, request, **kwargs):
+        status_code, retry_after = self.script.pop(0)
+        self.sent.append(request.url)
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = b''
+        response.raw = io.BytesIO()
+        if retry_after is not None:
+            response.headers['Retry-After'] = retry_after
+        response.request = request
+        response.url = request.url
+        return response
+
+
+class ScriptedRateLimitingAdapter(RateLimitingAdapter, ScriptedTransport):
+    pass
+
+
+class TestRateLimitingAdapter:
+    URL = 'https://api.todoist.com/api/v1/tasks'
+
+    def _session(self, script, rate=2, capacity=3):
+        clock = FakeClock()
+        bucket = TokenBucket(rate, capacity, clock=clock, sleep=clock.sleep)
+        adapter = ScriptedRateLimitingAdapter(bucket)
+        adapter.script = list(script)
+        adapter.sent = []
+        session = adapter.attach(requests.Session())
+        return session, adapter, clock
+
+    def test_only_todoist_requests_are_limited(self):
+        session, adapter, clock = self._session([])
+
+        assert session.get_adapter(self.URL) is adapter
+        assert session.get_adapter('https://status.example.com/ping') is not adapter
+
+    def test_all_requests_share_one_bucket(self):
+        session, adapter, clock = self._session([(200, None)] * 4, rate=1, capacity=2)
+        totals = adapter.totals()
+
+        for _ in range(4):
+            session.get(self.URL)
+
+        assert clock.now == pytest.approx(2)
+        assert adapter.log_fields_since(totals) == {
+            'rate_limit_wait_seconds': 2,
+            'rate_limit_waited_requests': 2,
+            'rate_limit_retries': 0,
+        }
+
+    def test_429_waits_out_retry_after_and_retries_once(self):
+        session, adapter, clock = self._session([(429, '30'), (200, None)])
+
+        response = session.post(self.URL, json={'content': 'Task'})
+
+        assert response.status_code == 200
+        assert len(adapter.sent) == 2
+        assert clock.now == pytest.approx(31)
+        assert adapter.totals() == (pytest.approx(31), 1, 1)
+
+    def test_second_429_is_returned_to_the_caller(self):
+        session, adapter, clock = self._session([(429, 'soon'), (429, '1'), (200, None)])
+
+        response = session.get(self.URL)
+
+        assert response.status_code == 429
+        assert len(adapter.sent) == 2
+        assert clock.now >= DEFAULT_RETRY_AFTER_SECONDS
+
+    def test_rate_drops_on_429_and_recovers_with_successes(self):
+        session, adapter, clock = self._session([(429, '0')] + [(200, None)] * 30, rate=2)
+
+        session.get(self.URL)
+        assert adapter.bucket.rate == pytest.approx(1.1)
+
+        for _ in range(29):
+            session.get(self.URL)
+        assert adapter.bucket.rate == pytest.approx(2)
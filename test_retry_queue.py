@@ -0,0 +1,260 @@
+"""Tests for the retry queue of failed task writes.
+
+Run with: python -m pytest test_retry_queue.py -v
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from retry_queue import (
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY_SECONDS,
+    RetryingTaskWriter,
+    RetryPending,
+    retry_delay,
+)
+from task_writer import TaskUpdate, TaskWriteResult
+from test_autodoist import create_test_db
+from test_loop_metrics import FakeClock
+
+
+class FlakyWriter:
+    """Records every batch it is asked to write and fails the tasks in `failing`."""
+
+    def __init__(self):
+        self.batches = []
+        self.failing = set()
+
+    def write(self, updates):
+        updates = list(updates)
+        self.batches.append(updates)
+        return [
+            TaskWriteResult(update.task_id, RuntimeError('503') if update.task_id in self.failing else None)
+            for update in updates
+        ]
+
+
+def labels(task_id, *names):
+    return TaskUpdate(task_id, {'labels': list(names)})
+
+
+def task(task_id, content='Task', labels=(), is_completed=False):
+    return SimpleNamespace(
+        id=task_id, content=content, description='', labels=list(labels), is_completed=is_completed)
+
+
+class TestRetryDelay:
+    def test_delay_doubles_up_to_the_cap_with_jitter(self):
+        assert retry_delay(1, random=lambda: 1.0) == RETRY_BASE_DELAY_SECONDS
+        assert retry_delay(3, random=lambda: 1.0) == RETRY_BASE_DELAY_SECONDS * 4
+        assert retry_delay(3, random=lambda: 0.0) == RETRY_BASE_DELAY_SECONDS * 2
+        assert retry_delay(30, random=lambda: 1.0) == RETRY_MAX_DELAY_SECONDS
+
+
+class TestRetryingTaskWriter:
+    @pytest.fixture
+    def queue(self):
+        connection = create_test_db()
+        inner = FlakyWriter()
+        clock = FakeClock()
+        writer = RetryingTaskWriter(inner, connection, clock=clock, random=lambda: 1.0)
+        yield writer, inner, clock, connection
+        connection.close()
+
+    def test_failed_write_is_reported_and_queued(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+
+        results = writer.write([labels('t1', 'next_action'), labels('t2')])
+
+        assert [result.ok for result in results] == [False, True]
+        assert writer.depth() == 1
+        assert connection.execute(
+            "SELECT task_id, field_names, payload, attempts, next_attempt_at, last_error "
+            "FROM write_retry_queue").fetchall() == [
+            ('t1', 'labels', '{"labels": ["next_action"]}', 1, 100.0 + RETRY_BASE_DELAY_SECONDS, '503')]
+
+    def drain(self, writer, *tasks):
+        writer.observe(tasks)
+        return writer.drain()
+
+    def test_queued_write_is_only_sent_by_drain_once_due(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1', 'next_action')])
+        inner.failing.clear()
+
+        clock.now += RETRY_BASE_DELAY_SECONDS - 1
+        writer.write([labels('t2')])
+        assert self.drain(writer, task('t1'), task('t2')) == 0
+        clock.now += 1
+        writer.write([labels('t3')])
+        assert self.drain(writer, task('t1'), task('t2')) == 1
+
+        assert [[update.task_id for update in batch] for batch in inner.batches] == [
+            ['t1'], ['t2'], ['t3'], ['t1']]
+        assert inner.batches[3] == [labels('t1', 'next_action')]
+        assert writer.depth() == 0
+
+    def test_drain_needs_the_tasks_of_this_loop(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1', 'next_action')])
+        inner.failing.clear()
+        clock.now += RETRY_BASE_DELAY_SECONDS
+        self.drain(writer, task('t2'))
+
+        inner.failing.add('t2')
+        writer.write([labels('t2', 'next_action')])
+        clock.now += RETRY_MAX_DELAY_SECONDS
+
+        assert writer.drain() == 0
+        assert len(inner.batches) == 2
+        assert writer.depth() == 1
+
+    def test_repeated_failures_back_off_exponentially(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1')])
+
+        next_attempts = []
+        for _ in range(3):
+            clock.now = connection.execute(
+                "SELECT next_attempt_at FROM write_retry_queue").fetchone()[0]
+            self.drain(writer, task('t1', labels=['next_action']))
+            next_attempts.append(connection.execute(
+                "SELECT attempts, next_attempt_at - ? FROM write_retry_queue", (clock.now,)).fetchone())
+
+        assert next_attempts == [
+            (2, RETRY_BASE_DELAY_SECONDS * 2),
+            (3, RETRY_BASE_DELAY_SECONDS * 4),
+            (4, RETRY_BASE_DELAY_SECONDS * 8),
+        ]
+
+    def test_write_is_dropped_after_the_last_attempt(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1')])
+
+        for _ in range(RETRY_MAX_ATTEMPTS - 1):
+            clock.now += RETRY_MAX_DELAY_SECONDS
+            self.drain(writer, task('t1', labels=['next_action']))
+
+        assert sum(batch == [labels('t1')] for batch in inner.batches) == RETRY_MAX_ATTEMPTS
+        assert writer.depth() == 0
+
+    def test_newer_write_for_the_same_task_and_fields_replaces_the_queued_one(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1', 'next_action'), TaskUpdate('t1', {'content': 'Task'})])
+        inner.failing.clear()
+
+        clock.now += RETRY_MAX_DELAY_SECONDS
+        writer.write([labels('t1')])
+        self.drain(writer, task('t1', content='Old'))
+
+        assert inner.batches[1:] == [[labels('t1')], [TaskUpdate('t1', {'content': 'Task'})]]
+        assert writer.depth() == 0
+
+    def loop(self, writer, update, *tasks):
+        """Run one sync loop that plans `update` again, like the planner does until it is applied."""
+        writer.observe(tasks)
+        result, = writer.write([update])
+        writer.drain()
+        return result
+
+    def test_write_the_loop_keeps_planning_backs_off_until_it_is_dropped(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        start = clock.now
+
+        sent_at = []
+        for _ in range(2000):
+            batches = len(inner.batches)
+            result = self.loop(writer, labels('t1', 'next_action'), task('t1'))
+            assert not result.ok
+            if len(inner.batches) > batches:
+                sent_at.append(clock.now - start)
+            else:
+                assert isinstance(result.error, RetryPending)
+            if writer.depth() == 0:
+                break
+            clock.now += 5
+
+        assert len(sent_at) == RETRY_MAX_ATTEMPTS
+        assert sent_at[:5] == [0, 10, 30, 70, 150]
+        assert all(batch == [labels('t1', 'next_action')] for batch in inner.batches)
+        assert writer.depth() == 0
+
+    def test_repeated_write_that_is_due_counts_as_the_next_attempt(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        self.loop(writer, labels('t1', 'next_action'), task('t1'))
+        clock.now += RETRY_BASE_DELAY_SECONDS
+
+        self.loop(writer, labels('t1', 'next_action'), task('t1'))
+        assert connection.execute("SELECT attempts FROM write_retry_queue").fetchall() == [(2,)]
+        assert len(inner.batches) == 2
+
+        inner.failing.clear()
+        clock.now += RETRY_BASE_DELAY_SECONDS * 2
+        assert self.loop(writer, labels('t1', 'next_action'), task('t1')).ok
+        assert writer.depth() == 0
+
+    def test_different_write_replaces_the_queued_one_and_starts_over(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        self.loop(writer, labels('t1', 'next_action'), task('t1'))
+        clock.now += RETRY_BASE_DELAY_SECONDS
+        self.loop(writer, labels('t1', 'next_action'), task('t1'))
+
+        self.loop(writer, labels('t1'), task('t1', labels=['someday']))
+
+        assert inner.batches[-1] == [labels('t1')]
+        assert connection.execute("SELECT payload, attempts FROM write_retry_queue").fetchall() == [
+            ('{"labels": []}', 1)]
+
+    @pytest.mark.parametrize('current', [
+        None,
+        task('t1', is_completed=True),
+        task('t1', labels=['next_action']),
+        task('t1', labels=['someday']),
+    ], ids=['deleted', 'completed', 'already applied', 'edited since'])
+    def test_write_that_is_no_longer_wanted_is_dropped(self, queue, current):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.observe([task('t1')])
+        writer.write([labels('t1', 'next_action')])
+        inner.failing.clear()
+
+        clock.now += RETRY_BASE_DELAY_SECONDS
+        retried = self.drain(writer, *([current] if current is not None else []))
+
+        assert retried == 0
+        assert len(inner.batches) == 1
+        assert writer.depth() == 0
+
+    def test_write_remembers_the_task_before_the_loop_changed_it(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        local = task('t1')
+        writer.observe([local])
+        local.labels = ['next_action']
+        writer.write([labels('t1', 'next_action')])
+
+        assert connection.execute("SELECT base FROM write_retry_queue").fetchall() == [
+            ('{"labels": []}',)]
+
+    def test_queue_survives_a_new_writer_on_the_same_database(self, queue):
+        writer, inner, clock, connection = queue
+        inner.failing.add('t1')
+        writer.write([labels('t1', 'next_action')])
+
+        restarted = FlakyWriter()
+        clock.now += RETRY_BASE_DELAY_SECONDS
+        retried = self.drain(RetryingTaskWriter(restarted, connection, clock=clock), task('t1'))
+
+        assert retried == 1
+        assert restarted.batches == [[labels('t1', 'next_action')]]
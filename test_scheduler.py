@@ -0,0 +1,211 @@
+"""Tests for the adaptive sync loop scheduler.
+
+Run with: python -m pytest test_scheduler.py -v
+"""
+
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+import requests
+
+from scheduler import (
+    WAKEUP_SLACK_SECONDS,
+    AdaptivePollScheduler,
+    parse_retry_after,
+    seconds_until_wakeup,
+)
+from test_loop_metrics import StaticAdapter
+from webhooks import WebhookEvents
+
+
+class SimulatedClock:
+    """Clock that only moves when the scheduler sleeps or a loop runs."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RateLimitedAdapter(StaticAdapter):
+    def __init__(self, retry_after):
+        super().__init__(b'')
+        self.retry_after = retry_after
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        response.status_code = 429
+        response.headers['Retry-After'] = self.retry_after
+        return response
+
+
+def run_loops(scheduler, clock, loops):
+    """Run (duration, changes) loops and return the time each loop started."""
+    starts = []
+    for duration, changes in loops:
+        starts.append(clock.now)
+        clock.now += duration
+        scheduler.wait(duration, changes)
+    return starts
+
+
+class TestAdaptivePollScheduler:
+    def _scheduler(self, min_interval=5, max_interval=60, **kwargs):
+        clock = SimulatedClock()
+        return AdaptivePollScheduler(
+            min_interval, max_interval, sleep=clock.sleep, retry_sleep=clock.sleep, **kwargs), clock
+
+    def test_idle_loops_back_off_exponentially_up_to_the_cap(self):
+        scheduler, clock = self._scheduler()
+
+        intervals = [scheduler.next_interval(changes=0) for _ in range(6)]
+
+        assert intervals == [10, 20, 40, 60, 60, 60]
+
+    def test_changes_reset_the_interval_to_the_minimum(self):
+        scheduler, clock = self._scheduler()
+
+        intervals = [scheduler.next_interval(changes) for changes in (0, 0, 3, 0, 1)]
+
+        assert intervals == [10, 20, 5, 10, 5]
+
+    def test_loop_start_times_follow_the_interval_sequence(self):
+        scheduler, clock = self._scheduler()
+
+        starts = run_loops(scheduler, clock, [(1, 0), (2, 0), (1, 0), (1, 4), (12, 0), (1, 0)])
+
+        assert starts == [0, 10, 30, 70, 75, 87]
+        assert clock.sleeps == [9, 18, 39, 4, 19]
+
+    def test_fixed_interval_when_minimum_equals_maximum(self):
+        scheduler, clock = self._scheduler(min_interval=5, max_interval=5)
+
+        starts = run_loops(scheduler, clock, [(1, 0), (1, 0), (1, 2), (1, 0)])
+
+        assert starts == [0, 5, 10, 15]
+
+    def test_zero_minimum_backs_off_from_one_second(self):
+        scheduler, clock = self._scheduler(min_interval=0, max_interval=8)
+
+        intervals = [scheduler.next_interval(changes=0) for _ in range(5)]
+
+        assert intervals == [1, 2, 4, 8, 8]
+        assert scheduler.next_interval(changes=1) == 0
+
+    def test_retry_after_delays_the_next_loop_once(self):
+        scheduler, clock = self._scheduler()
+
+        scheduler.observe_retry_after(30)
+        scheduler.observe_retry_after(12)
+        first = scheduler.wait(1, changes=1)
+        second = scheduler.wait(1, changes=1)
+
+        assert (first, second) == (30, 4)
+
+    def test_retry_after_is_read_from_429_responses(self):
+        scheduler, clock = self._scheduler()
+        session = requests.Session()
+        session.mount('https://', RateLimitedAdapter('45'))
+        scheduler.attach(session)
+
+        session.get('https://api.todoist.com/api/v1/tasks')
+
+        assert scheduler.wait(1, changes=0) == 45
+
+    def test_wakeup_cuts_a_long_backoff_short(self):
+        scheduler, clock = self._scheduler(min_interval=5, max_interval=3600)
+        for _ in range(10):
+            scheduler.next_interval(changes=0)
+
+        assert scheduler.wait(1, changes=0, wake_in=90) == 90
+        assert scheduler.wait(1, changes=0, wake_in=-5) == 0
+        assert scheduler.wait(1, changes=1, wake_in=90) == 4
+
+    def test_retry_after_outlasts_a_wakeup(self):
+        scheduler, clock = self._scheduler()
+
+        scheduler.observe_retry_after(30)
+
+        assert scheduler.wait(1, changes=0, wake_in=2) == 30
+
+    def test_rest_of_the_interval_follows_the_retry_after_wait(self):
+        clock = SimulatedClock()
+        retry_clock = SimulatedClock()
+        scheduler = AdaptivePollScheduler(60, 60, sleep=clock.sleep, retry_sleep=retry_clock.sleep)
+
+        scheduler.observe_retry_after(10)
+
+        assert scheduler.wait(1, changes=0) == 59
+        assert (retry_clock.sleeps, clock.sleeps) == ([10], [49])
+
+    def test_webhook_does_not_cut_a_retry_after_wait_short(self):
+        events = WebhookEvents(debounce=0)
+        clock = SimulatedClock()
+
+        def retry_sleep(seconds):
+            events.add({'p1'})
+            clock.sleep(seconds)
+
+        scheduler = AdaptivePollScheduler(900, 900, sleep=events.sleep, retry_sleep=retry_sleep)
+        scheduler.observe_retry_after(30)
+
+        started = time.monotonic()
+        scheduler.wait(1, changes=0)
+
+        assert clock.sleeps == [30]
+        # The webhook still ends the rest of the interval
+        assert time.monotonic() - started < 5
+        assert events.take() == {'p1'}
+
+    def test_invalid_settings_are_rejected(self):
+        with pytest.raises(ValueError):
+            AdaptivePollScheduler(10, 5)
+        with pytest.raises(ValueError):
+            AdaptivePollScheduler(-1, 5)
+        with pytest.raises(ValueError):
+            AdaptivePollScheduler(1, 5, backoff_factor=0.5)
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after(' 1.5 ') == 1.5
+        assert parse_retry_after('-3') == 0
+
+    def test_http_date(self):
+        now = datetime(2026, 3, 14, 12, 0, 0, tzinfo=timezone.utc)
+
+        assert parse_retry_after('Sat, 14 Mar 2026 12:01:30 GMT', now=now) == 90
+
+    def test_unreadable_values(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('soon') is None
+
+
+class TestSecondsUntilWakeup:
+    NOW = datetime(2026, 7, 2, 22, 30)
+
+    def test_no_wakeup_without_dates_or_end_of_day(self):
+        assert seconds_until_wakeup(self.NOW) is None
+
+    def test_wakes_at_local_midnight_of_the_decision_date(self):
+        seconds = seconds_until_wakeup(self.NOW, decision_date=date(2026, 7, 4))
+
+        assert seconds == (24 + 1.5) * 3600 + WAKEUP_SLACK_SECONDS
+
+    def test_end_of_day_wakes_at_the_end_hour_and_midnight(self):
+        morning = datetime(2026, 7, 2, 1, 15)
+
+        assert seconds_until_wakeup(morning, end_hour=3) == 105 * 60 + WAKEUP_SLACK_SECONDS
+        assert seconds_until_wakeup(self.NOW, end_hour=3) == 90 * 60 + WAKEUP_SLACK_SECONDS
+        assert seconds_until_wakeup(self.NOW, end_hour=24) == 90 * 60 + WAKEUP_SLACK_SECONDS
+
+    def test_earliest_wakeup_wins(self):
+        seconds = seconds_until_wakeup(
+            datetime(2026, 7, 2, 1, 15), decision_date=date(2026, 7, 3), end_hour=2)
+
+        assert seconds == 45 * 60 + WAKEUP_SLACK_SECONDS
@@ -0,0 +1,160 @@
+"""Tests for the task writers used by the sync loop.
+
+Run with: python -m pytest test_task_writer.py -v
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from task_writer import (
+    RestTaskWriter,
+    SyncCommandTaskWriter,
+    TaskUpdate,
+)
+from todoist_sync import SyncCommandError
+
+
+class FakeSyncClient:
+    """Accepts command batches and answers with a scripted status per task id."""
+
+    def __init__(self, failing_task_ids=(), batch_error=None):
+        self.batches = []
+        self.failing_task_ids = set(failing_task_ids)
+        self.batch_error = batch_error
+
+    def run_commands(self, commands):
+        self.batches.append(commands)
+        if self.batch_error is not None:
+            raise self.batch_error
+        return {
+            command['uuid']: (
+                {'error': 'Item not found', 'error_code': 22, 'http_code': 404}
+                if command['args']['id'] in self.failing_task_ids
+                else 'ok'
+            )
+            for command in commands
+        }
+
+
+class TestRestTaskWriter:
+    def test_sends_one_update_task_call_per_update(self):
+        api = MagicMock()
+        writer = RestTaskWriter(api)
+
+        results = writer.write([
+            TaskUpdate('t1', {'labels': ['next_action']}),
+            TaskUpdate('t2', {'description': 'Details'}),
+        ])
+
+        assert [call.kwargs for call in api.update_task.call_args_list] == [
+            {'task_id': 't1', 'labels': ['next_action']},
+            {'task_id': 't2', 'description': 'Details'},
+        ]
+        assert [result.ok for result in results] == [True, True]
+
+    def test_failure_is_reported_for_that_task_only(self):
+        api = MagicMock()
+        error = RuntimeError('boom')
+        api.update_task.side_effect = [None, error, None]
+        writer = RestTaskWriter(api)
+
+        results = writer.write([
+            TaskUpdate('t1', {'labels': []}),
+            TaskUpdate('t2', {'labels': []}),
+            TaskUpdate('t3', {'labels': []}),
+        ])
+
+        assert [(result.task_id, result.error) for result in results] == [
+            ('t1', None),
+            ('t2', error),
+            ('t3', None),
+        ]
+
+
+    def test_concurrent_writes_overlap_and_keep_update_order(self):
+        # All four requests must be in flight together to pass the barrier.
+        barrier = threading.Barrier(4, timeout=5)
+        api = MagicMock()
+        api.update_task.side_effect = lambda **kwargs: barrier.wait()
+        writer = RestTaskWriter(api, concurrency=4)
+
+        results = writer.write(
+            [TaskUpdate(f't{index}', {'labels': []}) for index in range(4)])
+
+        assert [result.task_id for result in results] == ['t0', 't1', 't2', 't3']
+        assert all(result.ok for result in results)
+
+    def test_rejects_concurrency_below_one(self):
+        with pytest.raises(ValueError):
+            RestTaskWriter(MagicMock(), concurrency=0)
+
+
+class TestSyncCommandTaskWriter:
+    def test_packs_updates_into_item_update_commands(self):
+        client = FakeSyncClient()
+        writer = SyncCommandTaskWriter(client)
+
+        writer.write([
+            TaskUpdate('t1', {'labels': ['next_action']}),
+            TaskUpdate('t2', {'content': '* Header', 'description': ''}),
+        ])
+
+        [batch] = client.batches
+        assert [command['type'] for command in batch] == ['item_update', 'item_update']
+        assert [command['args'] for command in batch] == [
+            {'id': 't1', 'labels': ['next_action']},
+            {'id': 't2', 'content': '* Header', 'description': ''},
+        ]
+        assert len({command['uuid'] for command in batch}) == 2
+
+    def test_splits_updates_into_batches_of_one_hundred(self):
+        client = FakeSyncClient()
+        writer = SyncCommandTaskWriter(client)
+
+        results = writer.write(
+            [TaskUpdate(f't{index}', {'labels': []}) for index in range(250)])
+
+        assert [len(batch) for batch in client.batches] == [100, 100, 50]
+        assert len(results) == 250
+        assert all(result.ok for result in results)
+
+    def test_maps_command_errors_back_to_their_task(self):
+        client = FakeSyncClient(failing_task_ids={'t2'})
+        writer = SyncCommandTaskWriter(client)
+
+        results = writer.write([
+            TaskUpdate('t1', {'labels': []}),
+            TaskUpdate('t2', {'labels': []}),
+        ])
+
+        assert results[0].ok
+        assert results[1].task_id == 't2'
+        assert isinstance(results[1].error, SyncCommandError)
+        assert results[1].error.http_code == 404
+        assert str(results[1].error) == 'Item not found'
+
+    def test_failed_batch_request_fails_every_update_in_that_batch(self):
+        error = RuntimeError('429')
+        client = FakeSyncClient(batch_error=error)
+        writer = SyncCommandTaskWriter(client, batch_size=2)
+
+        results = writer.write([
+            TaskUpdate('t1', {'labels': []}),
+            TaskUpdate('t2', {'labels': []}),
+        ])
+
+        assert [(result.task_id, result.error) for result in results] == [
+            ('t1', error),
+            ('t2', error),
+        ]
+
+    def test_missing_command_status_is_a_failure(self):
+        client = MagicMock()
+        client.run_commands.return_value = {}
+        writer = SyncCommandTaskWriter(client)
+
+        [result] = writer.write([TaskUpdate('t1', {'labels': []})])
+
+        assert isinstance(result.error, SyncCommandError)
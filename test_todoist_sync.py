@@ -0,0 +1,233 @@
+"""Tests for the Todoist Sync API workspace mirror.
+
+The mirror is exercised against a local fake client that hands out deltas, so
+no network access is needed.
+
+Run with: python -m pytest test_todoist_sync.py -v
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from todoist_sync import (
+    FULL_SYNC_TOKEN,
+    TodoistSyncClient,
+    WorkspaceDelta,
+    WorkspaceMirror,
+)
+
+
+@dataclass
+class SyncProject:
+    id: str
+    name: str
+    order: int = 0
+    is_inbox_project: bool = False
+
+
+@dataclass
+class SyncSection:
+    id: str
+    name: str
+    project_id: str
+    order: int = 0
+    is_collapsed: bool = False
+
+
+@dataclass
+class SyncTask:
+    id: str
+    content: str
+    project_id: str
+    section_id: Optional[str] = None
+    parent_id: Optional[str] = None
+    labels: list = field(default_factory=list)
+    order: int = 0
+
+
+class FakeSyncClient:
+    """Returns queued deltas and records the sync tokens it was given."""
+
+    def __init__(self, *deltas):
+        self.deltas = list(deltas)
+        self.sync_tokens = []
+
+    def read_workspace_delta(self, sync_token):
+        self.sync_tokens.append(sync_token)
+        return self.deltas.pop(0)
+
+
+def full_sync(**overrides):
+    defaults = dict(
+        sync_token='token-1',
+        full_sync=True,
+        projects=(SyncProject('p1', 'Work -'),),
+        sections=(SyncSection('s1', 'Next', 'p1'),),
+        tasks=(
+            SyncTask('t1', 'First', 'p1', order=1),
+            SyncTask('t2', 'Second', 'p1', order=2),
+        ),
+    )
+    defaults.update(overrides)
+    return WorkspaceDelta(**defaults)
+
+
+class TestWorkspaceMirror:
+    def test_first_refresh_requests_full_sync(self):
+        client = FakeSyncClient(full_sync())
+        mirror = WorkspaceMirror(client)
+
+        mirror.refresh()
+        projects, sections, tasks = mirror.workspace()
+
+        assert client.sync_tokens == [FULL_SYNC_TOKEN]
+        assert [project.id for project in projects] == ['p1']
+        assert [section.id for section in sections] == ['s1']
+        assert [task.id for task in tasks] == ['t1', 't2']
+
+    def test_incremental_refresh_passes_previous_token_and_merges_changes(self):
+        client = FakeSyncClient(
+            full_sync(),
+            WorkspaceDelta(
+                sync_token='token-2',
+                tasks=(
+                    SyncTask('t2', 'Second renamed', 'p1', order=2),
+                    SyncTask('t3', 'Third', 'p1', order=3),
+                ),
+            ),
+        )
+        mirror = WorkspaceMirror(client)
+
+        mirror.refresh()
+        mirror.refresh()
+        _, _, tasks = mirror.workspace()
+
+        assert client.sync_tokens == [FULL_SYNC_TOKEN, 'token-1']
+        assert [(task.id, task.content) for task in tasks] == [
+            ('t1', 'First'),
+            ('t2', 'Second renamed'),
+            ('t3', 'Third'),
+        ]
+        assert mirror.sync_token == 'token-2'
+
+    def test_removed_items_are_dropped(self):
+        client = FakeSyncClient(
+            full_sync(),
+            WorkspaceDelta(
+                sync_token='token-2',
+                removed_section_ids=frozenset({'s1'}),
+                removed_task_ids=frozenset({'t1'}),
+            ),
+        )
+        mirror = WorkspaceMirror(client)
+
+        mirror.refresh()
+        mirror.refresh()
+        _, sections, tasks = mirror.workspace()
+
+        assert sections == []
+        assert [task.id for task in tasks] == ['t2']
+
+    def test_removed_project_drops_its_sections_and_tasks(self):
+        client = FakeSyncClient(
+            full_sync(),
+            WorkspaceDelta(
+                sync_token='token-2',
+                removed_project_ids=frozenset({'p1'}),
+            ),
+        )
+        mirror = WorkspaceMirror(client)
+
+        mirror.refresh()
+        mirror.refresh()
+
+        assert mirror.workspace() == ([], [], [])
+
+    def test_full_sync_replaces_mirror(self):
+        client = FakeSyncClient(
+            full_sync(),
+            full_sync(
+                sync_token='token-2',
+                sections=(),
+                tasks=(SyncTask('t9', 'Only', 'p1'),),
+            ),
+        )
+        mirror = WorkspaceMirror(client)
+
+        mirror.refresh()
+        mirror.refresh()
+        _, sections, tasks = mirror.workspace()
+
+        assert sections == []
+        assert [task.id for task in tasks] == ['t9']
+
+    def test_workspace_returns_copies(self):
+        client = FakeSyncClient(full_sync())
+        mirror = WorkspaceMirror(client)
+        mirror.refresh()
+
+        _, _, tasks = mirror.workspace()
+        tasks[0].labels.append('next_action')
+        tasks[0].content = 'Changed locally'
+        _, _, fresh_tasks = mirror.workspace()
+
+        assert fresh_tasks[0].labels == []
+        assert fresh_tasks[0].content == 'First'
+
+
+class TestTodoistSyncClient:
+    def _client(self, payload):
+        response = MagicMock()
+        response.json.return_value = payload
+        session = MagicMock()
+        session.post.return_value = response
+        client = TodoistSyncClient(
+            'token',
+            session=session,
+            project_factory=lambda data: SyncProject(data['id'], data['name']),
+            section_factory=lambda data: SyncSection(
+                data['id'], data['name'], data['project_id']),
+            task_factory=lambda data: SyncTask(
+                data['id'], data['content'], data['project_id']),
+        )
+        return client, session
+
+    def test_parses_changed_and_removed_items(self):
+        client, session = self._client({
+            'sync_token': 'token-2',
+            'full_sync': False,
+            'projects': [
+                {'id': 'p1', 'name': 'Work -'},
+                {'id': 'p2', 'name': 'Old', 'is_archived': True},
+            ],
+            'sections': [
+                {'id': 's1', 'name': 'Next', 'project_id': 'p1', 'is_deleted': True},
+            ],
+            'items': [
+                {'id': 't1', 'content': 'Open', 'project_id': 'p1'},
+                {'id': 't2', 'content': 'Done', 'project_id': 'p1', 'checked': True},
+                {'id': 't3', 'content': 'Gone', 'project_id': 'p1', 'is_deleted': True},
+            ],
+        })
+
+        delta = client.read_workspace_delta('token-1')
+
+        assert session.post.call_args.kwargs['data']['sync_token'] == 'token-1'
+        assert delta.sync_token == 'token-2'
+        assert not delta.full_sync
+        assert [project.id for project in delta.projects] == ['p1']
+        assert delta.removed_project_ids == frozenset({'p2'})
+        assert delta.sections == ()
+        assert delta.removed_section_ids == frozenset({'s1'})
+        assert [task.id for task in delta.tasks] == ['t1']
+        assert delta.removed_task_ids == frozenset({'t2', 't3'})
+
+    def test_http_errors_are_raised(self):
+        client, session = self._client({})
+        session.post.return_value.raise_for_status.side_effect = RuntimeError('429')
+
+        with pytest.raises(RuntimeError):
+            client.read_workspace_delta()
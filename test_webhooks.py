@@ -0,0 +1,205 @@
+"""Tests for the Todoist webhook receiver.
+
+Run with: python -m pytest test_webhooks.py -v
+"""
+
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from webhooks import (
+    SIGNATURE_HEADER,
+    WebhookEvents,
+    affected_project_ids,
+    sign_payload,
+    start_webhook_server,
+    verify_signature,
+)
+
+SECRET = 'client-secret'
+
+ITEM_ADDED = {
+    'event_name': 'item:added',
+    'user_id': '2671355',
+    'event_data': {
+        'id': '6X7rM8997g3RQmvh',
+        'project_id': '6Jf8VQXxpwv56VQ7',
+        'section_id': None,
+        'content': 'Buy Milk',
+        'labels': [],
+    },
+    'initiator': {'id': '2671355', 'full_name': 'Alex'},
+    'version': '10',
+}
+
+ITEM_MOVED = {
+    'event_name': 'item:updated',
+    'user_id': '2671355',
+    'event_data': {'id': '6X7rM8997g3RQmvh', 'project_id': '6Jf8VQXxpwv56VQ7'},
+    'event_data_extra': {
+        'old_item': {'id': '6X7rM8997g3RQmvh', 'project_id': '6Jf8fVQRvwCqVQ7x'},
+        'update_intent': 'item_updated',
+    },
+    'version': '10',
+}
+
+
+class TestSignature:
+    def test_valid_signature_is_accepted(self):
+        body = json.dumps(ITEM_ADDED).encode('utf-8')
+
+        assert verify_signature(SECRET, body, sign_payload(SECRET, body))
+
+    def test_tampered_body_missing_header_and_wrong_secret_are_rejected(self):
+        body = json.dumps(ITEM_ADDED).encode('utf-8')
+        signature = sign_payload(SECRET, body)
+
+        assert not verify_signature(SECRET, body + b' ', signature)
+        assert not verify_signature(SECRET, body, None)
+        assert not verify_signature('other-secret', body, signature)
+
+
+class TestAffectedProjectIds:
+    def test_task_events_touch_their_project(self):
+        assert affected_project_ids(ITEM_ADDED) == {'6Jf8VQXxpwv56VQ7'}
+
+    def test_moved_task_touches_old_and_new_project(self):
+        assert affected_project_ids(ITEM_MOVED) == {'6Jf8VQXxpwv56VQ7', '6Jf8fVQRvwCqVQ7x'}
+
+    def test_project_section_and_note_events(self):
+        assert affected_project_ids(
+            {'event_name': 'project:updated', 'event_data': {'id': 'p1'}}) == {'p1'}
+        assert affected_project_ids(
+            {'event_name': 'section:added', 'event_data': {'id': 's1', 'project_id': 'p2'}}) == {'p2'}
+        assert affected_project_ids(
+            {'event_name': 'note:added', 'event_data': {'item': {'project_id': 'p3'}}}) == {'p3'}
+
+    def test_label_and_unreadable_events_touch_every_project(self):
+        assert affected_project_ids({'event_name': 'label:updated', 'event_data': {'id': 'l1'}}) is None
+        assert affected_project_ids({'event_name': 'item:added', 'event_data': {}}) is None
+
+
+class TestWebhookEvents:
+    def test_take_returns_and_clears_delivered_projects(self):
+        events = WebhookEvents()
+
+        events.add({'p1'})
+        events.add({'p2'})
+
+        assert events.take() == {'p1', 'p2'}
+        assert events.take() is None
+
+    def test_event_for_every_project_takes_the_whole_workspace(self):
+        events = WebhookEvents()
+
+        events.add({'p1'})
+        events.add(None)
+
+        assert events.take() is None
+
+    def test_sleep_runs_to_the_timeout_without_deliveries(self):
+        events = WebhookEvents(debounce=0)
+
+        started = time.monotonic()
+        events.sleep(0.05)
+
+        assert time.monotonic() - started >= 0.05
+
+    def test_delivery_ends_the_sleep_after_the_debounce(self):
+        events = WebhookEvents(debounce=0.1)
+        timer = threading.Timer(0.05, events.add, args=({'p1'},))
+
+        started = time.monotonic()
+        timer.start()
+        events.sleep(30)
+        elapsed = time.monotonic() - started
+
+        assert 0.15 <= elapsed < 5
+        assert events.take() == {'p1'}
+
+    def test_pending_delivery_ends_the_next_sleep(self):
+        events = WebhookEvents(debounce=0)
+        events.add({'p1'})
+
+        started = time.monotonic()
+        events.sleep(30)
+
+        assert time.monotonic() - started < 5
+
+
+class TestWebhookServer:
+    @pytest.fixture
+    def receiver(self):
+        events = WebhookEvents(debounce=0)
+        server = start_webhook_server(events, SECRET, 0, request_timeout=0.2)
+        yield events, f'http://127.0.0.1:{server.server_address[1]}/'
+        server.shutdown()
+        server.server_close()
+
+    def _post(self, url, body, signature):
+        headers = {'Content-Type': 'application/json'}
+        if signature is not None:
+            headers[SIGNATURE_HEADER] = signature
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+    def test_signed_deliveries_are_recorded(self, receiver):
+        events, url = receiver
+        for payload in (ITEM_ADDED, ITEM_MOVED):
+            body = json.dumps(payload).encode('utf-8')
+            assert self._post(url, body, sign_payload(SECRET, body)) == 200
+
+        assert events.take() == {'6Jf8VQXxpwv56VQ7', '6Jf8fVQRvwCqVQ7x'}
+
+    def test_unsigned_and_forged_deliveries_are_rejected(self, receiver):
+        events, url = receiver
+        body = json.dumps(ITEM_ADDED).encode('utf-8')
+
+        assert self._post(url, body, None) == 401
+        assert self._post(url, body, sign_payload('other-secret', body)) == 401
+        assert events.take() is None
+
+    def test_signed_body_that_is_not_json_is_rejected(self, receiver):
+        events, url = receiver
+        body = b'not json'
+
+        assert self._post(url, body, sign_payload(SECRET, body)) == 400
+        assert events.take() is None
+
+    def _raw_request(self, url, head, body=b''):
+        port = int(url.rsplit(':', 1)[1].strip('/'))
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as connection:
+            connection.sendall(head + body)
+            started = time.monotonic()
+            response = b''
+            while chunk := connection.recv(4096):
+                response += chunk
+            return response, time.monotonic() - started
+
+    def test_negative_content_length_is_rejected(self, receiver):
+        events, url = receiver
+
+        response, _ = self._raw_request(
+            url, b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: -1\r\n\r\n')
+
+        assert response.startswith(b'HTTP/1.0 400')
+        assert events.take() is None
+
+    def test_stalled_body_is_disconnected_after_the_timeout(self, receiver):
+        events, url = receiver
+
+        response, elapsed = self._raw_request(
+            url, b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: 100\r\n\r\n', b'{"event')
+
+        assert response == b''
+        assert elapsed < 4
+        assert events.take() is None
@@ -0,0 +1,228 @@
+"""Incremental workspace reads and batched commands through the Todoist Sync API.
+
+The REST endpoints used by the sync loop always return the whole workspace.
+The Sync API instead hands out a sync token with every response and, given
+that token back, only returns projects, sections and tasks that changed since.
+`WorkspaceMirror` keeps a local copy of the workspace and applies those deltas,
+so every sync loop still sees a complete workspace at a fraction of the cost.
+
+The same endpoint accepts batches of write commands, which `TodoistSyncClient`
+exposes through `run_commands`.
+"""
+
+import copy
+import json
+from dataclasses import dataclass
+
+import requests
+from todoist_api_python.models import Project, Section, Task
+
+SYNC_API_URL = 'https://api.todoist.com/api/v1/sync'
+SYNC_API_TIMEOUT = (10, 60)
+SYNC_RESOURCE_TYPES = ('projects', 'sections', 'items')
+FULL_SYNC_TOKEN = '*'
+SYNC_COMMAND_BATCH_SIZE = 100
+
+
+class SyncCommandError(Exception):
+    """A single Sync API command that Todoist rejected."""
+
+    def __init__(self, status):
+        if isinstance(status, dict):
+            self.error_code = status.get('error_code')
+            self.http_code = status.get('http_code')
+            message = status.get('error', 'unknown error')
+        else:
+            self.error_code = None
+            self.http_code = None
+            message = f'unexpected command status {status!r}'
+        super().__init__(message)
+
+
+@dataclass(frozen=True, slots=True)
+class WorkspaceDelta:
+    """Projects, sections and tasks that changed since the previous sync token.
+
+    On a full sync the delta describes the complete workspace and replaces the
+    mirror instead of being merged into it.
+    """
+
+    sync_token: str
+    full_sync: bool = False
+    projects: tuple = ()
+    sections: tuple = ()
+    tasks: tuple = ()
+    removed_project_ids: frozenset = frozenset()
+    removed_section_ids: frozenset = frozenset()
+    removed_task_ids: frozenset = frozenset()
+
+    @property
+    def is_empty(self):
+        return not (
+            self.projects
+            or self.sections
+            or self.tasks
+            or self.removed_project_ids
+            or self.removed_section_ids
+            or self.removed_task_ids
+        )
+
+
+class TodoistSyncClient:
+    """Reads workspace deltas from, and sends command batches to, the Todoist Sync API."""
+
+    def __init__(
+            self,
+            token,
+            session=None,
+            url=SYNC_API_URL,
+            timeout=SYNC_API_TIMEOUT,
+            project_factory=None,
+            section_factory=None,
+            task_factory=None):
+        self._token = token
+        self._session = session or requests.Session()
+        self._url = url
+        self._timeout = timeout
+        self._project_factory = project_factory or Project.from_dict
+        self._section_factory = section_factory or Section.from_dict
+        self._task_factory = task_factory or Task.from_dict
+
+    def read_workspace_delta(self, sync_token=FULL_SYNC_TOKEN):
+        payload = self._post({
+            'sync_token': sync_token,
+            'resource_types': json.dumps(list(SYNC_RESOURCE_TYPES)),
+        })
+        return self.parse_workspace_delta(payload)
+
+    def run_commands(self, commands):
+        """Send one batch of commands and return the status of each command by uuid.
+
+        A status is either the string ``'ok'`` or a dict describing the error.
+        """
+        payload = self._post({'commands': json.dumps(list(commands))})
+        return payload.get('sync_status', {})
+
+    def parse_workspace_delta(self, payload):
+        projects, removed_project_ids = _split_removed(
+            payload.get('projects', ()),
+            self._project_factory,
+            ('is_deleted', 'is_archived'),
+        )
+        sections, removed_section_ids = _split_removed(
+            payload.get('sections', ()),
+            self._section_factory,
+            ('is_deleted', 'is_archived'),
+        )
+        tasks, removed_task_ids = _split_removed(
+            payload.get('items', ()),
+            self._task_factory,
+            ('is_deleted', 'checked'),
+        )
+        return WorkspaceDelta(
+            sync_token=payload['sync_token'],
+            full_sync=bool(payload.get('full_sync', False)),
+            projects=projects,
+            sections=sections,
+            tasks=tasks,
+            removed_project_ids=removed_project_ids,
+            removed_section_ids=removed_section_ids,
+            removed_task_ids=removed_task_ids,
+        )
+
+    def _post(self, data):
+        response = self._session.post(
+            self._url,
+            headers={'Authorization': f'Bearer {self._token}'},
+            data=data,
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class WorkspaceMirror:
+    """Local copy of the Todoist workspace kept current with sync deltas.
+
+    The first refresh performs a full sync. Later refreshes pass the stored
+    sync token back so Todoist only returns what changed.
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self.sync_token = FULL_SYNC_TOKEN
+        self._projects = {}
+        self._sections = {}
+        self._tasks = {}
+
+    def refresh(self):
+        delta = self._client.read_workspace_delta(self.sync_token)
+        self.apply_delta(delta)
+        return delta
+
+    def apply_delta(self, delta):
+        if delta.full_sync:
+            self._projects.clear()
+            self._sections.clear()
+            self._tasks.clear()
+
+        for project in delta.projects:
+            self._projects[project.id] = project
+        for section in delta.sections:
+            self._sections[section.id] = section
+        for task in delta.tasks:
+            self._tasks[task.id] = task
+
+        for project_id in delta.removed_project_ids:
+            self._projects.pop(project_id, None)
+        for section_id in delta.removed_section_ids:
+            self._sections.pop(section_id, None)
+        for task_id in delta.removed_task_ids:
+            self._tasks.pop(task_id, None)
+
+        if delta.removed_project_ids:
+            self._drop_orphans(delta.removed_project_ids)
+
+        self.sync_token = delta.sync_token
+
+    def workspace(self):
+        """Return copies of the mirrored projects, sections and tasks.
+
+        The sync loop updates task content and labels on the objects it is
+        given. Handing out copies keeps the mirror equal to what Todoist last
+        reported, so a failed write is not hidden from the next loop.
+        """
+        return (
+            [copy.copy(project) for project in self._projects.values()],
+            [copy.copy(section) for section in self._sections.values()],
+            [_copy_task(task) for task in self._tasks.values()],
+        )
+
+    def _drop_orphans(self, removed_project_ids):
+        self._sections = {
+            section_id: section
+            for section_id, section in self._sections.items()
+            if section.project_id not in removed_project_ids
+        }
+        self._tasks = {
+            task_id: task
+            for task_id, task in self._tasks.items()
+            if task.project_id not in removed_project_ids
+        }
+
+
+def _split_removed(records, factory, removal_flags):
+    models = []
+    removed_ids = set()
+    for record in records:
+        if any(record.get(flag) for flag in removal_flags):
+            removed_ids.add(str(record['id']))
+        else:
+            models.append(factory(record))
+    return tuple(models), frozenset(removed_ids)
+
+
+def _copy_task(task):
+    task_copy = copy.copy(task)
+    task_copy.labels = list(task.labels or [])
+    return task_copy
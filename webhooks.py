@@ -0,0 +1,177 @@
+"""Todoist webhook receiver for event-driven sync loops.
+
+Todoist POSTs a JSON event to a registered callback URL whenever something
+changes, signed with the app's client secret. The receiver verifies the
+signature, records which projects the event touched, and wakes the sync loop.
+Deliveries that arrive close together are debounced into a single loop.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIGNATURE_HEADER = 'X-Todoist-Hmac-SHA256'
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+# Todoist events are small; anything larger is not a Todoist delivery
+MAX_BODY_BYTES = 1024 * 1024
+# A client that stops sending mid-request is disconnected after this long
+REQUEST_TIMEOUT_SECONDS = 10
+
+
+def sign_payload(secret, body):
+    """Return the base64 HMAC-SHA256 signature Todoist sends for `body`."""
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def verify_signature(secret, body, signature):
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_payload(secret, body), signature.strip())
+
+
+def affected_project_ids(payload):
+    """Return the ids of the projects a webhook event touched, or None if it can touch any.
+
+    A moved task touches both its old and its new project.
+    """
+    event_name = payload.get('event_name') or ''
+    event_data = payload.get('event_data') or {}
+    kind = event_name.split(':', 1)[0]
+
+    if kind == 'project':
+        project_ids = {event_data.get('id')}
+    elif kind in ('item', 'section'):
+        project_ids = {event_data.get('project_id')}
+        old_item = (payload.get('event_data_extra') or {}).get('old_item') or {}
+        if old_item.get('project_id') is not None:
+            project_ids.add(old_item['project_id'])
+    elif kind == 'note':
+        project_ids = {event_data.get('project_id') or (event_data.get('item') or {}).get('project_id')}
+    else:
+        # Label changes and unknown events can affect every project
+        return None
+
+    if None in project_ids:
+        return None
+    return frozenset(str(project_id) for project_id in project_ids)
+
+
+class WebhookEvents:
+    """Collects the projects touched by webhook deliveries until the sync loop takes them.
+
+    `sleep` is a drop-in for `time.sleep` that returns `debounce` seconds
+    after the first delivery, so a burst of events starts one sync loop.
+    Deliveries that arrive while a loop runs end the next sleep right away.
+    """
+
+    def __init__(self, debounce=DEFAULT_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._condition = threading.Condition()
+        self._pending = False
+        self._everything = False
+        self._project_ids = set()
+
+    def add(self, project_ids):
+        """Record a delivery that touched `project_ids`, or every project if None."""
+        with self._condition:
+            if project_ids is None:
+                self._everything = True
+            else:
+                self._project_ids.update(project_ids)
+            self._pending = True
+            self._condition.notify_all()
+
+    def sleep(self, seconds):
+        deadline = time.monotonic() + seconds
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._pending, timeout=seconds):
+                return
+        # Let the rest of the burst arrive before the loop starts
+        remaining = min(deadline, time.monotonic() + self.debounce) - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def take(self):
+        """Return the project ids delivered since the last call and forget them.
+
+        Returns None when no delivery arrived, or when one could touch any
+        project, meaning the whole workspace should be processed.
+        """
+        with self._condition:
+            project_ids = None
+            if self._pending and not self._everything:
+                project_ids = frozenset(self._project_ids)
+            self._pending = False
+            self._everything = False
+            self._project_ids = set()
+            return project_ids
+
+
+def start_webhook_server(events, secret, port, host='127.0.0.1', request_timeout=REQUEST_TIMEOUT_SECONDS):
+    """Receive Todoist webhooks on http://host:port from a daemon thread and return the server."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        timeout = request_timeout
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self.send_error(400)
+                return
+            if length < 0:
+                self.send_error(400)
+                return
+            if length > MAX_BODY_BYTES:
+                self.send_error(413)
+                return
+            body = self.rfile.read(length)
+
+            if not verify_signature(secret, body, self.headers.get(SIGNATURE_HEADER)):
+                logging.warning(
+                    'Rejected webhook delivery with an invalid signature.',
+                    extra={"component": "webhook", "operation": "verify"})
+                self.send_error(401)
+                return
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self.send_error(400)
+                return
+            if not isinstance(payload, dict):
+                self.send_error(400)
+                return
+
+            project_ids = affected_project_ids(payload)
+            events.add(project_ids)
+            logging.debug(
+                'Received webhook event %s', payload.get('event_name'),
+                extra={
+                    "component": "webhook",
+                    "operation": "receive",
+                    "event_name": payload.get('event_name'),
+                    "project_ids": sorted(project_ids) if project_ids is not None else None,
+                })
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logging.debug(
+                'Webhook request: ' + format, *args,
+                extra={"component": "webhook", "operation": "request"})
+
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='webhook-server', daemon=True)
+    thread.start()
+    logging.info(
+        'Receiving Todoist webhooks on http://%s:%d', host, server.server_address[1],
+        extra={"component": "webhook", "operation": "start"})
+    return server